@@ -1,10 +1,9 @@
-from openai import OpenAI
-
+from cliente_llm import obter_cliente
 from tools import *
 
 print(".:: agents / clima ::.")
 
-client = OpenAI(base_url="http://localhost:1234/v1")
+client = obter_cliente("lmstudio")
 
 messages = [{"role": "user", "content": "Qual temperatura no CEP 88804-495?"}]
 
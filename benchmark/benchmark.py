@@ -1,35 +1,165 @@
 import time
+from typing import Dict, List
+
 from openai import OpenAI
 
+import historico
+from cliente_llm import MedidorTokens
+
 client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
+# Tokens e tempo de todas as chamadas do benchmark (também usado por sweep.py e prefill.py via medir_streaming)
+medidor = MedidorTokens()
+
+# prompt = "Gerar 25 palavas aleatórias. Retorne apenas as palavras separadas por vírgula"
+PROMPT = "Escreva um texto sobre computação quântica de até 100 palavras."
+
+MODEL = "qwen3.5:9b"
+# MODEL = "qwen2.5-coder-7b-instruct"
+QUANTIZACAO = "Q4_K_M"  # tag gravada no histórico para comparar quantizações do mesmo modelo
+
+# "simples": uma requisição stream=False (TPS = tokens / tempo total, mistura prefill e decode)
+# "streaming": mede TTFT, latência entre tokens e TPS apenas do decode
+MODO = "streaming"
+REPETICOES = 3
+
+# Grava cada execução do modo streaming no histórico (historico.sqlite3); ver `python historico.py --help`
+REGISTRAR_HISTORICO = True
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil p (0-100) com interpolação linear."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def resumo_medidor(model: str) -> Dict:
+    """Acumulado do medidor para `model`, com TPS = tokens de completion / tempo total das chamadas."""
+    acumulado = medidor.resumo()["modelos"].get(model)
+    if not acumulado:
+        return {"requisicoes": 0, "prompt": 0, "completion": 0, "segundos": 0.0, "tps": 0.0}
+    return {**acumulado, "tps": acumulado["completion"] / acumulado["segundos"] if acumulado["segundos"] else 0.0}
+
 
 def benchmark():
-    start_time = time.time()
+    response = medidor.completar(
+        client,
+        model=MODEL,
+        messages=[{"role": "user", "content": PROMPT}],
+        stream=False
+    )
+
+    print(response.choices[0].message.content)
+    print("-" * 80)
 
-    # prompt = "Gerar 25 palavas aleatórias. Retorne apenas as palavras separadas por vírgula"
-    prompt = "Escreva um texto sobre computação quântica de até 100 palavras."
+    # O medidor lê o 'usage' (números exatos) e o tempo da chamada; TPS mistura prefill e decode
+    resumo = resumo_medidor(MODEL)
+    print(f"Tokens Gerados: {resumo['completion']}")
+    print(f"Tempo Total: {resumo['segundos']:.2f}s")
+    print(f"Tokens por Segundo: {resumo['tps']:.2f} TPS")
 
-    model = "qwen3.5:9b"
-    # model = "qwen2.5-coder-7b-instruct"
 
-    response = client.chat.completions.create(
+def medir_streaming(model: str, prompt: str, **parametros) -> Dict:
+    """
+    Executa uma requisição com stream=True e separa as fases da geração.
+
+    - TTFT (time to first token): tempo até o primeiro chunk com conteúdo (texto ou raciocínio),
+      dominado pelo prefill do prompt.
+    - Latência entre tokens (ITL): intervalo entre chunks consecutivos durante o decode.
+    - TPS do decode: tokens gerados após o primeiro / tempo entre o primeiro e o último token.
+    """
+    start_time = time.perf_counter()
+    # O medidor liga stream_options.include_usage e contabiliza a chamada quando o stream termina
+    stream = medidor.completar(
+        client,
         model=model,
         messages=[{"role": "user", "content": prompt}],
-        stream=False
+        stream=True,
+        **parametros,
     )
 
-    end_time = time.time()
-    duration = end_time - start_time
-    
-    print(response.choices[0].message.content)
+    tempos_tokens: List[float] = []
+    partes: List[str] = []
+    usage = None
+    for chunk in stream:
+        if chunk.usage:
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        # Modelos com raciocínio (ex: qwen3, gpt-oss) enviam o "pensamento" em reasoning_content
+        conteudo = delta.content or getattr(delta, "reasoning_content", None)
+        if conteudo:
+            tempos_tokens.append(time.perf_counter())
+            if delta.content:
+                partes.append(delta.content)
+    end_time = time.perf_counter()
+
+    if not tempos_tokens:
+        raise RuntimeError(f"Nenhum token recebido do modelo {model}")
+
+    # Sem usage (servidor sem suporte a include_usage), cada chunk é contado como um token
+    tokens_gerados = usage.completion_tokens if usage else len(tempos_tokens)
+    ttft = tempos_tokens[0] - start_time
+    tempo_decode = tempos_tokens[-1] - tempos_tokens[0]
+    itl = [b - a for a, b in zip(tempos_tokens, tempos_tokens[1:])]
+
+    return {
+        "model": model,
+        "conteudo": "".join(partes),
+        "prompt_tokens": usage.prompt_tokens if usage else None,
+        "tokens_gerados": tokens_gerados,
+        "ttft": ttft,
+        "tempo_total": end_time - start_time,
+        "tempo_decode": tempo_decode,
+        "tps_decode": (tokens_gerados - 1) / tempo_decode if tempo_decode > 0 else 0.0,
+        "tps_total": tokens_gerados / (end_time - start_time),
+        "itl_medio": sum(itl) / len(itl) if itl else 0.0,
+        "itl_p50": percentil(itl, 50),
+        "itl_p90": percentil(itl, 90),
+        "itl_p99": percentil(itl, 99),
+        "itl_max": max(itl) if itl else 0.0,
+    }
+
+
+def benchmark_streaming():
+    resultados = [medir_streaming(MODEL, PROMPT) for _ in range(REPETICOES)]
+    resultado = resultados[-1]
+
+    print(resultado["conteudo"])
     print("-" * 80)
 
-    # O objeto 'usage' contém os números exatos para o cálculo
-    tokens_gerados = response.usage.completion_tokens
-    tps = tokens_gerados / duration
+    print(f"Tokens Gerados: {resultado['tokens_gerados']}")
+    print(f"Tempo até o Primeiro Token (TTFT): {resultado['ttft'] * 1000:.0f}ms")
+    print(f"Tempo Total: {resultado['tempo_total']:.2f}s")
+    print(f"Latência entre Tokens: média {resultado['itl_medio'] * 1000:.1f}ms | "
+          f"p50 {resultado['itl_p50'] * 1000:.1f}ms | p90 {resultado['itl_p90'] * 1000:.1f}ms | "
+          f"p99 {resultado['itl_p99'] * 1000:.1f}ms | máx {resultado['itl_max'] * 1000:.1f}ms")
+    print(f"Tokens por Segundo (decode): {resultado['tps_decode']:.2f} TPS")
+    print(f"Tokens por Segundo (total): {resultado['tps_total']:.2f} TPS")
+
+    if len(resultados) > 1:
+        print("-" * 80)
+        print(f"Média de {len(resultados)} repetições: "
+              f"TTFT {sum(r['ttft'] for r in resultados) / len(resultados) * 1000:.0f}ms | "
+              f"decode {sum(r['tps_decode'] for r in resultados) / len(resultados):.2f} TPS | "
+              f"total {sum(r['tempo_total'] for r in resultados) / len(resultados):.2f}s")
+
+    resumo = resumo_medidor(MODEL)
+    print(f"Medidor: {resumo['requisicoes']} requisições | prompt {resumo['prompt']} | "
+          f"completion {resumo['completion']} tokens | {resumo['tps']:.2f} TPS (completion / tempo das chamadas)")
+
+    if REGISTRAR_HISTORICO:
+        execucao_id = historico.registrar(MODEL, PROMPT, resultados, QUANTIZACAO, origem="benchmark")
+        print(f"Execução #{execucao_id} gravada em {historico.ARQUIVO_BANCO}")
 
-    print(f"Tokens Gerados: {tokens_gerados}")
-    print(f"Tempo Total: {duration:.2f}s")
-    print(f"Tokens por Segundo: {tps:.2f} TPS")
 
-benchmark()
\ No newline at end of file
+if __name__ == "__main__":
+    if MODO == "streaming":
+        benchmark_streaming()
+    else:
+        benchmark()
@@ -0,0 +1,176 @@
+"""
+Gerador de carga concorrente para o endpoint OpenAI-compatible (LM Studio).
+
+Mede como o throughput escala com usuários simultâneos, em dois modos:
+
+- Loop fechado: N "usuários" fazem requisições em sequência, sem pausa (concorrência fixa = 1, 2, 4, 8, 16...).
+- Loop aberto: requisições chegam por um processo de Poisson a uma taxa fixa (req/s), independente das respostas;
+  é o modo que mostra a fila se formando quando a taxa passa da capacidade do servidor.
+
+Para cada nível: tokens/s agregado, percentis de latência da requisição e do TTFT, e taxa de erro.
+Todas as requisições compartilham um único AsyncOpenAI (e pool de conexões keep-alive do httpx).
+"""
+
+import asyncio
+import random
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from benchmark import MODEL, PROMPT, percentil
+
+BASE_URL = "http://localhost:1234/v1"
+API_KEY = "lm-studio"
+
+MAX_TOKENS = 256
+TIMEOUT_SEGUNDOS = 300
+
+# Loop fechado: número de usuários simultâneos e requisições por nível
+NIVEIS_CONCORRENCIA = [1, 2, 4, 8, 16]
+REQUISICOES_POR_NIVEL = 32
+
+# Loop aberto: taxas de chegada (req/s, Poisson) e requisições por taxa
+TAXAS_CHEGADA = [0.5, 1, 2, 4]
+REQUISICOES_POR_TAXA = 32
+
+SEED = 42
+
+
+def criar_cliente(max_conexoes: int) -> AsyncOpenAI:
+    """AsyncOpenAI com pool de conexões dimensionado para a maior concorrência testada."""
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_conexoes, max_keepalive_connections=max_conexoes),
+        timeout=httpx.Timeout(TIMEOUT_SEGUNDOS, connect=10),
+    )
+    return AsyncOpenAI(base_url=BASE_URL, api_key=API_KEY, http_client=http_client, max_retries=0)
+
+
+async def requisicao(client: AsyncOpenAI, model: str, prompt: str) -> Dict:
+    """Executa uma requisição com streaming e retorna latência, TTFT, tokens e erro (se houver)."""
+    start_time = time.perf_counter()
+    ttft: Optional[float] = None
+    tokens = 0
+    chunks = 0
+    try:
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=MAX_TOKENS,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in stream:
+            if chunk.usage:
+                tokens = chunk.usage.completion_tokens
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content or getattr(delta, "reasoning_content", None):
+                chunks += 1
+                if ttft is None:
+                    ttft = time.perf_counter() - start_time
+    except Exception as e:
+        return {"ok": False, "erro": f"{type(e).__name__}: {e}", "latencia": time.perf_counter() - start_time}
+
+    return {
+        "ok": True,
+        "latencia": time.perf_counter() - start_time,
+        "ttft": ttft,
+        "tokens": tokens or chunks,
+    }
+
+
+def resumir(nivel: str, resultados: List[Dict], duracao: float) -> Dict:
+    """Agrega as requisições de um nível."""
+    sucesso = [r for r in resultados if r["ok"]]
+    latencias = [r["latencia"] for r in sucesso]
+    ttfts = [r["ttft"] for r in sucesso if r["ttft"] is not None]
+    tokens = sum(r["tokens"] for r in sucesso)
+    erros = [r["erro"] for r in resultados if not r["ok"]]
+    return {
+        "nivel": nivel,
+        "requisicoes": len(resultados),
+        "erros": len(erros),
+        "taxa_erro": len(erros) / len(resultados) if resultados else 0.0,
+        "exemplo_erro": erros[0] if erros else None,
+        "duracao": duracao,
+        "req_por_segundo": len(sucesso) / duracao if duracao > 0 else 0.0,
+        "tokens_por_segundo": tokens / duracao if duracao > 0 else 0.0,
+        "latencia_p50": percentil(latencias, 50),
+        "latencia_p90": percentil(latencias, 90),
+        "latencia_p99": percentil(latencias, 99),
+        "ttft_p50": percentil(ttfts, 50),
+        "ttft_p99": percentil(ttfts, 99),
+    }
+
+
+async def loop_fechado(client: AsyncOpenAI, concorrencia: int, total: int) -> Dict:
+    """`concorrencia` usuários disparam `total` requisições no total, cada um esperando a anterior terminar."""
+    resultados: List[Dict] = []
+    restantes = iter(range(total))
+
+    async def usuario():
+        for _ in restantes:
+            resultados.append(await requisicao(client, MODEL, PROMPT))
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(usuario() for _ in range(concorrencia)))
+    return resumir(f"{concorrencia} usuários", resultados, time.perf_counter() - start_time)
+
+
+async def loop_aberto(client: AsyncOpenAI, taxa: float, total: int, rng: random.Random) -> Dict:
+    """Dispara `total` requisições com intervalos exponenciais (Poisson com `taxa` req/s)."""
+    tarefas = []
+    start_time = time.perf_counter()
+    proxima_chegada = 0.0
+    for _ in range(total):
+        espera = start_time + proxima_chegada - time.perf_counter()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        tarefas.append(asyncio.create_task(requisicao(client, MODEL, PROMPT)))
+        proxima_chegada += rng.expovariate(taxa)
+
+    resultados = await asyncio.gather(*tarefas)
+    return resumir(f"{taxa:g} req/s", list(resultados), time.perf_counter() - start_time)
+
+
+def imprimir_tabela(titulo: str, resumos: List[Dict]):
+    print(f"\n{titulo}")
+    print("-" * 118)
+    print(f"{'Nível':<14} {'Req':>5} {'Erros':>7} {'Req/s':>7} {'Tokens/s':>9} "
+          f"{'Lat p50':>8} {'Lat p90':>8} {'Lat p99':>8} {'TTFT p50':>9} {'TTFT p99':>9}")
+    for r in resumos:
+        print(f"{r['nivel']:<14} {r['requisicoes']:>5} {r['taxa_erro']:>7.1%} {r['req_por_segundo']:>7.2f} "
+              f"{r['tokens_por_segundo']:>9.1f} {r['latencia_p50']:>7.2f}s {r['latencia_p90']:>7.2f}s "
+              f"{r['latencia_p99']:>7.2f}s {r['ttft_p50']:>8.2f}s {r['ttft_p99']:>8.2f}s")
+    for r in resumos:
+        if r["exemplo_erro"]:
+            print(f"  [{r['nivel']}] exemplo de erro: {r['exemplo_erro']}")
+
+
+async def main():
+    client = criar_cliente(max(NIVEIS_CONCORRENCIA + [REQUISICOES_POR_TAXA]))
+    rng = random.Random(SEED)
+    try:
+        print(f"Modelo: {MODEL} | max_tokens: {MAX_TOKENS}")
+
+        fechado = []
+        for concorrencia in NIVEIS_CONCORRENCIA:
+            print(f"Loop fechado: {concorrencia} usuários...")
+            fechado.append(await loop_fechado(client, concorrencia, REQUISICOES_POR_NIVEL))
+
+        aberto = []
+        for taxa in TAXAS_CHEGADA:
+            print(f"Loop aberto: {taxa:g} req/s...")
+            aberto.append(await loop_aberto(client, taxa, REQUISICOES_POR_TAXA, rng))
+
+        imprimir_tabela("Loop fechado (concorrência fixa)", fechado)
+        imprimir_tabela("Loop aberto (chegadas Poisson)", aberto)
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
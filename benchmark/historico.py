@@ -0,0 +1,287 @@
+"""
+Histórico persistente dos benchmarks de LLM (SQLite).
+
+Cada execução (uma célula do sweep ou uma rodada do benchmark.py) é gravada com data, modelo, tag de quantização,
+impressão digital do hardware, hash do prompt e parâmetros; as amostras (uma por requisição) guardam TTFT,
+TPS do decode e latência total.
+
+Comandos:
+    python historico.py listar [--modelo M]         # execuções gravadas
+    python historico.py tendencia [--modelo M]      # evolução por modelo/quantização com gráfico em texto
+    python historico.py comparar ID_A ID_B          # diferença entre duas execuções com teste t de Welch
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import sqlite3
+import statistics
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ARQUIVO_BANCO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "historico.sqlite3")
+
+METRICAS = [
+    ("ttft", "TTFT (s)", False),  # (coluna, rótulo, maior é melhor)
+    ("tps_decode", "TPS Decode", True),
+    ("tempo_total", "Latência Total (s)", False),
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    quantizacao TEXT,
+    hardware TEXT NOT NULL,
+    hardware_descricao TEXT,
+    prompt_hash TEXT NOT NULL,
+    parametros TEXT,
+    origem TEXT
+);
+CREATE TABLE IF NOT EXISTS amostras (
+    execucao_id INTEGER NOT NULL REFERENCES execucoes(id),
+    ttft REAL,
+    tps_decode REAL,
+    tempo_total REAL,
+    tokens_gerados INTEGER,
+    prompt_tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_execucoes_modelo ON execucoes(modelo, quantizacao, timestamp);
+"""
+
+
+@contextmanager
+def conectar(arquivo: str = ARQUIVO_BANCO) -> Iterator[sqlite3.Connection]:
+    """Conexão com o schema criado: confirma a transação ao sair sem erro (rollback se houver) e sempre fecha."""
+    conexao = sqlite3.connect(arquivo)
+    try:
+        conexao.row_factory = sqlite3.Row
+        conexao.executescript(_SCHEMA)
+        with conexao:
+            yield conexao
+    finally:
+        conexao.close()
+
+
+def descricao_hardware() -> str:
+    """Descrição legível do hardware (SO, arquitetura, CPU, núcleos e RAM)."""
+    memoria = ""
+    if hasattr(os, "sysconf") and "SC_PHYS_PAGES" in os.sysconf_names:
+        memoria = f"{os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 1024 ** 3:.0f} GB"
+    return " | ".join(filter(None, [
+        f"{platform.system()} {platform.release()}",
+        platform.machine(),
+        platform.processor(),
+        f"{os.cpu_count()} CPUs",
+        memoria,
+    ]))
+
+
+def impressao_digital_hardware() -> str:
+    return hashlib.sha256(descricao_hardware().encode("utf-8")).hexdigest()[:12]
+
+
+def hash_prompt(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def registrar(
+    modelo: str,
+    prompt: str,
+    amostras: List[Dict],
+    quantizacao: str = "",
+    parametros: Optional[Dict] = None,
+    origem: str = "benchmark",
+    arquivo: str = ARQUIVO_BANCO,
+) -> int:
+    """Grava uma execução e suas amostras (resultados de `medir_streaming`). Retorna o id da execução."""
+    with conectar(arquivo) as conexao:
+        cursor = conexao.execute(
+            "INSERT INTO execucoes (timestamp, modelo, quantizacao, hardware, hardware_descricao, prompt_hash, "
+            "parametros, origem) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                datetime.now().isoformat(timespec="seconds"),
+                modelo,
+                quantizacao,
+                impressao_digital_hardware(),
+                descricao_hardware(),
+                hash_prompt(prompt),
+                json.dumps(parametros or {}, sort_keys=True),
+                origem,
+            ),
+        )
+        execucao_id = cursor.lastrowid
+        conexao.executemany(
+            "INSERT INTO amostras (execucao_id, ttft, tps_decode, tempo_total, tokens_gerados, prompt_tokens) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (execucao_id, a["ttft"], a["tps_decode"], a["tempo_total"], a["tokens_gerados"], a.get("prompt_tokens"))
+                for a in amostras
+            ],
+        )
+    return execucao_id
+
+
+def listar_execucoes(modelo: Optional[str] = None, arquivo: str = ARQUIVO_BANCO) -> List[sqlite3.Row]:
+    consulta = (
+        "SELECT e.*, COUNT(a.execucao_id) AS n, AVG(a.ttft) AS ttft, AVG(a.tps_decode) AS tps_decode, "
+        "AVG(a.tempo_total) AS tempo_total FROM execucoes e LEFT JOIN amostras a ON a.execucao_id = e.id "
+    )
+    argumentos: Tuple = ()
+    if modelo:
+        consulta += "WHERE e.modelo = ? "
+        argumentos = (modelo,)
+    consulta += "GROUP BY e.id ORDER BY e.timestamp"
+    with conectar(arquivo) as conexao:
+        return conexao.execute(consulta, argumentos).fetchall()
+
+
+def amostras_da_execucao(execucao_id: int, arquivo: str = ARQUIVO_BANCO) -> List[sqlite3.Row]:
+    with conectar(arquivo) as conexao:
+        return conexao.execute("SELECT * FROM amostras WHERE execucao_id = ?", (execucao_id,)).fetchall()
+
+
+# =============================================================================
+# ESTATÍSTICA
+# =============================================================================
+
+
+def _beta_incompleta(a: float, b: float, x: float) -> float:
+    """Função beta incompleta regularizada I_x(a, b) (fração contínua de Lentz)."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - _beta_incompleta(b, a, 1 - x)
+
+    log_frente = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x)
+    minimo = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > minimo else minimo)
+    resultado = d
+    for m in range(1, 300):
+        for numerador in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1.0 + numerador * d
+            d = 1.0 / (d if abs(d) > minimo else minimo)
+            c = 1.0 + numerador / c
+            c = c if abs(c) > minimo else minimo
+            resultado *= d * c
+        if abs(d * c - 1.0) < 1e-12:
+            break
+    return math.exp(log_frente) * resultado / a
+
+
+def teste_t_welch(a: List[float], b: List[float]) -> Tuple[float, float]:
+    """Teste t de Welch (bicaudal) para duas amostras com variâncias diferentes. Retorna (t, p-valor)."""
+    if len(a) < 2 or len(b) < 2:
+        return 0.0, 1.0
+    var_a, var_b = statistics.variance(a) / len(a), statistics.variance(b) / len(b)
+    if var_a + var_b == 0:
+        return 0.0, 1.0 if statistics.mean(a) == statistics.mean(b) else 0.0
+    t = (statistics.mean(a) - statistics.mean(b)) / math.sqrt(var_a + var_b)
+    graus = (var_a + var_b) ** 2 / (var_a ** 2 / (len(a) - 1) + var_b ** 2 / (len(b) - 1))
+    p = _beta_incompleta(graus / 2, 0.5, graus / (graus + t * t))
+    return t, p
+
+
+# =============================================================================
+# RELATÓRIOS
+# =============================================================================
+
+_BARRAS = "▁▂▃▄▅▆▇█"
+
+
+def sparkline(valores: List[float]) -> str:
+    if not valores:
+        return ""
+    minimo, maximo = min(valores), max(valores)
+    if maximo == minimo:
+        return _BARRAS[len(_BARRAS) // 2] * len(valores)
+    return "".join(_BARRAS[int((v - minimo) / (maximo - minimo) * (len(_BARRAS) - 1))] for v in valores)
+
+
+def imprimir_listagem(modelo: Optional[str]):
+    print(f"{'ID':>4} {'Data':<20} {'Modelo':<32} {'Quant.':<8} {'HW':<12} {'N':>3} "
+          f"{'TTFT':>7} {'TPS':>7} {'Total':>7}")
+    for e in listar_execucoes(modelo):
+        print(f"{e['id']:>4} {e['timestamp']:<20} {e['modelo'][:32]:<32} {(e['quantizacao'] or '')[:8]:<8} "
+              f"{e['hardware']:<12} {e['n']:>3} {e['ttft'] or 0:>6.2f}s {e['tps_decode'] or 0:>7.2f} "
+              f"{e['tempo_total'] or 0:>6.2f}s")
+
+
+def imprimir_tendencia(modelo: Optional[str]):
+    """Agrupa por modelo + quantização + hardware + prompt e mostra a evolução de cada métrica."""
+    grupos: Dict[Tuple, List[sqlite3.Row]] = {}
+    for e in listar_execucoes(modelo):
+        chave = (e["modelo"], e["quantizacao"] or "", e["hardware"], e["prompt_hash"])
+        grupos.setdefault(chave, []).append(e)
+
+    for (nome, quantizacao, hardware, prompt), execucoes in grupos.items():
+        print(f"\n{nome} [{quantizacao or '-'}] hw={hardware} prompt={prompt} ({len(execucoes)} execuções, "
+              f"{execucoes[0]['timestamp'][:10]} a {execucoes[-1]['timestamp'][:10]})")
+        for coluna, rotulo, _ in METRICAS:
+            valores = [e[coluna] for e in execucoes if e[coluna] is not None]
+            if valores:
+                print(f"  {rotulo:<20} {sparkline(valores)}  último {valores[-1]:.2f} | "
+                      f"mín {min(valores):.2f} | máx {max(valores):.2f}")
+
+
+def imprimir_comparacao(id_a: int, id_b: int, alfa: float = 0.05):
+    execucoes = {e["id"]: e for e in listar_execucoes()}
+    for execucao_id in (id_a, id_b):
+        if execucao_id not in execucoes:
+            raise SystemExit(f"Execução {execucao_id} não encontrada em {ARQUIVO_BANCO}")
+        e = execucoes[execucao_id]
+        print(f"#{execucao_id}: {e['timestamp']} {e['modelo']} [{e['quantizacao'] or '-'}] "
+              f"hw={e['hardware']} prompt={e['prompt_hash']} n={e['n']}")
+    if execucoes[id_a]["prompt_hash"] != execucoes[id_b]["prompt_hash"]:
+        print("Atenção: as execuções usaram prompts diferentes.")
+    if execucoes[id_a]["hardware"] != execucoes[id_b]["hardware"]:
+        print("Atenção: as execuções rodaram em hardware diferente.")
+
+    amostras_a, amostras_b = amostras_da_execucao(id_a), amostras_da_execucao(id_b)
+    print(f"\n{'Métrica':<20} {'#' + str(id_a):>10} {'#' + str(id_b):>10} {'Diferença':>10} {'p-valor':>9}  Resultado")
+    for coluna, rotulo, maior_melhor in METRICAS:
+        a = [s[coluna] for s in amostras_a if s[coluna] is not None]
+        b = [s[coluna] for s in amostras_b if s[coluna] is not None]
+        if not a or not b:
+            continue
+        media_a, media_b = statistics.mean(a), statistics.mean(b)
+        diferenca = (media_b - media_a) / media_a if media_a else 0.0
+        _, p = teste_t_welch(a, b)
+        if p >= alfa:
+            conclusao = "sem diferença significativa"
+        else:
+            melhorou = (media_b > media_a) == maior_melhor
+            conclusao = f"#{id_b} {'melhor' if melhorou else 'pior'} (p < {alfa})"
+        print(f"{rotulo:<20} {media_a:>10.3f} {media_b:>10.3f} {diferenca:>+10.1%} {p:>9.4f}  {conclusao}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Histórico de benchmarks de LLM")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    listar = comandos.add_parser("listar")
+    listar.add_argument("--modelo")
+    tendencia = comandos.add_parser("tendencia")
+    tendencia.add_argument("--modelo")
+    comparar = comandos.add_parser("comparar")
+    comparar.add_argument("id_a", type=int)
+    comparar.add_argument("id_b", type=int)
+    comparar.add_argument("--alfa", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if args.comando == "listar":
+        imprimir_listagem(args.modelo)
+    elif args.comando == "tendencia":
+        imprimir_tendencia(args.modelo)
+    else:
+        imprimir_comparacao(args.id_a, args.id_b, args.alfa)
@@ -0,0 +1,297 @@
+"""
+Perfil do overhead do lado do cliente nas chamadas do SDK da OpenAI.
+
+Um transport do httpx (`TransporteInstrumentado` / `TransporteInstrumentadoAsync`) envolve o transport
+padrão e usa a extensão `trace` do httpcore para marcar cada fase da requisição. Junto com o contexto
+`Perfilador.chamada()`, que envolve a chamada do SDK, cada chamada é dividida em:
+
+- serializacao: do início da chamada do SDK até o request chegar ao transport
+  (merge das opções, `json.dumps` do corpo e montagem do `httpx.Request`);
+- pool: espera por uma conexão livre no pool do httpcore;
+- conexao: DNS + TCP (o httpcore resolve o nome dentro do `connect_tcp`); zero quando a conexão é reaproveitada;
+- tls: handshake TLS (apenas https em conexão nova);
+- envio: headers e corpo da requisição;
+- servidor: do fim do envio até os headers da resposta (prefill + geração, em chamadas sem streaming);
+- download: leitura do corpo da resposta;
+- parsing: do fim do download até o retorno do SDK (`json.loads` + construção dos modelos pydantic).
+
+Com `stream=True` o corpo é lido enquanto o código consome os chunks, então o parsing de cada chunk
+fica dentro de `download` e `parsing` mede apenas o fechamento do stream.
+
+O `Perfilador` agrega os tempos por fase e publica o resumo em um destino (callable que recebe um dict),
+como `destino_jsonl`, a cada `publicar_a_cada` chamadas. Com `USAR_MOCK = True` o script sobe o
+`servidor_mock` com TTFT zero e decode muito rápido, o que isola o custo do cliente ("modelo" instantâneo).
+"""
+
+import contextvars
+import json
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from benchmark import MODEL, PROMPT, percentil
+
+BASE_URL = "http://localhost:1234/v1"
+API_KEY = "lm-studio"
+
+MAX_TOKENS = 8  # respostas curtas deixam o overhead do cliente mais visível
+REPETICOES = 50
+AQUECIMENTO = 3
+
+# Sobe o servidor_mock no mesmo processo (porta abaixo) em vez de usar o LM Studio
+USAR_MOCK = False
+PORTA_MOCK = 18080
+
+# Arquivo JSON Lines onde o resumo agregado é gravado (None = apenas imprime)
+ARQUIVO_METRICAS = None
+
+FASES = ["serializacao", "pool", "conexao", "tls", "envio", "servidor", "download", "parsing"]
+
+_chamada_atual: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("chamada_atual", default=None)
+
+
+def destino_jsonl(arquivo: str) -> Callable[[Dict], None]:
+    """Destino de métricas que acrescenta cada resumo como uma linha JSON em `arquivo`."""
+
+    def publicar(resumo: Dict):
+        with open(arquivo, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.time(), **resumo}, ensure_ascii=False) + "\n")
+
+    return publicar
+
+
+class Perfilador:
+    """Coleta as fases de cada chamada e agrega os tempos para o destino de métricas."""
+
+    def __init__(self, destino: Optional[Callable[[Dict], None]] = None, publicar_a_cada: int = 0):
+        self.destino = destino
+        self.publicar_a_cada = publicar_a_cada
+        self.registros: List[Dict] = []
+
+    @contextmanager
+    def chamada(self, nome: str = "chamada"):
+        """
+        Envolve uma chamada do SDK; as requisições HTTP feitas dentro do bloco são atribuídas a ela.
+        Com streaming, consuma o stream dentro do bloco para que o download seja medido.
+        """
+        registro = {"nome": nome, "inicio": time.perf_counter(), "tentativas": []}
+        token = _chamada_atual.set(registro)
+        try:
+            yield registro
+        finally:
+            _chamada_atual.reset(token)
+            self.finalizar(registro, time.perf_counter())
+
+    def iniciar_tentativa(self) -> Dict:
+        """Chamado pelo transport a cada requisição HTTP (retries do SDK geram várias tentativas)."""
+        tentativa = {"inicio": time.perf_counter(), "eventos": {}}
+        registro = _chamada_atual.get()
+        if registro is None:
+            # Requisição fora de `chamada()`: registrada sozinha, sem serialização nem parsing
+            registro = {"nome": "http", "inicio": None, "tentativas": [], "avulsa": True}
+        registro["tentativas"].append(tentativa)
+        tentativa["registro"] = registro
+        return tentativa
+
+    def evento(self, tentativa: Dict, nome: str):
+        # O httpcore emite "<prefixo>.<etapa>.<started|complete|failed>" (ex: "http11.send_request_body.complete")
+        etapa = ".".join(nome.split(".")[-2:])
+        tentativa["eventos"][etapa] = time.perf_counter()
+        registro = tentativa["registro"]
+        if etapa == "response_closed.complete" and registro.get("avulsa"):
+            self.finalizar(registro, tentativa["eventos"][etapa])
+
+    def finalizar(self, registro: Dict, fim: float):
+        if not registro["tentativas"]:
+            return
+        self.registros.append(self.fases(registro, fim))
+        if self.destino and self.publicar_a_cada and len(self.registros) % self.publicar_a_cada == 0:
+            self.publicar()
+
+    @staticmethod
+    def fases(registro: Dict, fim: float) -> Dict:
+        """Converte os timestamps dos eventos em duração por fase (segundos)."""
+
+        def intervalo(eventos: Dict, inicio: str, final: str) -> float:
+            if inicio in eventos and final in eventos:
+                return eventos[final] - eventos[inicio]
+            return 0.0
+
+        fases = {fase: 0.0 for fase in FASES}
+        for tentativa in registro["tentativas"]:
+            eventos = tentativa["eventos"]
+            primeiro_evento = eventos.get("connect_tcp.started", eventos.get("send_request_headers.started"))
+            if primeiro_evento is not None:
+                fases["pool"] += primeiro_evento - tentativa["inicio"]
+            fases["conexao"] += intervalo(eventos, "connect_tcp.started", "connect_tcp.complete")
+            fases["tls"] += intervalo(eventos, "start_tls.started", "start_tls.complete")
+            fases["envio"] += intervalo(eventos, "send_request_headers.started", "send_request_body.complete")
+            fases["servidor"] += intervalo(eventos, "send_request_body.complete", "receive_response_headers.complete")
+            fases["download"] += intervalo(eventos, "receive_response_body.started", "receive_response_body.complete")
+
+        ultima = registro["tentativas"][-1]["eventos"]
+        fim_download = ultima.get("receive_response_body.complete")
+        if registro["inicio"] is not None:
+            fases["serializacao"] = registro["tentativas"][0]["inicio"] - registro["inicio"]
+            if fim_download is not None:
+                fases["parsing"] = fim - fim_download
+            total = fim - registro["inicio"]
+        else:
+            total = fim - registro["tentativas"][0]["inicio"]
+
+        return {
+            "nome": registro["nome"],
+            "tentativas": len(registro["tentativas"]),
+            "conexao_nova": any("connect_tcp.started" in t["eventos"] for t in registro["tentativas"]),
+            "total": total,
+            **fases,
+        }
+
+    def resumo(self) -> Dict:
+        """Média, p50 e p99 (ms) de cada fase, e a fração do tempo total gasta no próprio cliente."""
+        if not self.registros:
+            return {"chamadas": 0}
+        totais = [r["total"] for r in self.registros]
+        resumo = {
+            "chamadas": len(self.registros),
+            "conexoes_novas": sum(r["conexao_nova"] for r in self.registros),
+            "retries": sum(r["tentativas"] - 1 for r in self.registros),
+            "fases": {},
+        }
+        for fase in FASES + ["total"]:
+            valores = [r[fase] for r in self.registros]
+            resumo["fases"][fase] = {
+                "media_ms": sum(valores) / len(valores) * 1000,
+                "p50_ms": percentil(valores, 50) * 1000,
+                "p99_ms": percentil(valores, 99) * 1000,
+            }
+        overhead = sum(r["serializacao"] + r["pool"] + r["parsing"] for r in self.registros)
+        resumo["fracao_overhead_cliente"] = overhead / sum(totais) if sum(totais) > 0 else 0.0
+        return resumo
+
+    def publicar(self):
+        if self.destino:
+            self.destino(self.resumo())
+
+    def limpar(self):
+        self.registros.clear()
+
+
+class TransporteInstrumentado(httpx.BaseTransport):
+    """Envolve um transport síncrono do httpx e registra as fases de cada requisição no `Perfilador`."""
+
+    def __init__(self, perfilador: Perfilador, transporte: Optional[httpx.BaseTransport] = None):
+        self.perfilador = perfilador
+        self.transporte = transporte or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tentativa = self.perfilador.iniciar_tentativa()
+        request.extensions["trace"] = lambda nome, info: self.perfilador.evento(tentativa, nome)
+        return self.transporte.handle_request(request)
+
+    def close(self):
+        self.transporte.close()
+
+
+class TransporteInstrumentadoAsync(httpx.AsyncBaseTransport):
+    """Versão assíncrona de `TransporteInstrumentado` (o httpcore exige um trace assíncrono)."""
+
+    def __init__(self, perfilador: Perfilador, transporte: Optional[httpx.AsyncBaseTransport] = None):
+        self.perfilador = perfilador
+        self.transporte = transporte or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tentativa = self.perfilador.iniciar_tentativa()
+
+        async def trace(nome, info):
+            self.perfilador.evento(tentativa, nome)
+
+        request.extensions["trace"] = trace
+        return await self.transporte.handle_async_request(request)
+
+    async def aclose(self):
+        await self.transporte.aclose()
+
+
+def cliente_instrumentado(perfilador: Perfilador, base_url: str = BASE_URL, api_key: str = API_KEY, **kwargs) -> OpenAI:
+    http_client = httpx.Client(transport=TransporteInstrumentado(perfilador))
+    return OpenAI(base_url=base_url, api_key=api_key, http_client=http_client, **kwargs)
+
+
+def cliente_instrumentado_async(
+    perfilador: Perfilador, base_url: str = BASE_URL, api_key: str = API_KEY, **kwargs
+) -> AsyncOpenAI:
+    http_client = httpx.AsyncClient(transport=TransporteInstrumentadoAsync(perfilador))
+    return AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=http_client, **kwargs)
+
+
+def medir_sdk(client: OpenAI, perfilador: Perfilador, repeticoes: int) -> List[float]:
+    """Chamadas sem streaming pelo SDK; retorna a latência de cada uma."""
+    latencias = []
+    for _ in range(repeticoes):
+        start_time = time.perf_counter()
+        with perfilador.chamada("chat.completions"):
+            client.chat.completions.create(
+                model=MODEL, messages=[{"role": "user", "content": PROMPT}], max_tokens=MAX_TOKENS
+            )
+        latencias.append(time.perf_counter() - start_time)
+    return latencias
+
+
+def medir_httpx_puro(http_client: httpx.Client, base_url: str, repeticoes: int) -> List[float]:
+    """Mesma requisição com httpx + json.loads, sem o SDK (linha de base do overhead)."""
+    corpo = {"model": MODEL, "messages": [{"role": "user", "content": PROMPT}], "max_tokens": MAX_TOKENS}
+    latencias = []
+    for _ in range(repeticoes):
+        start_time = time.perf_counter()
+        response = http_client.post(f"{base_url}/chat/completions", json=corpo, headers={"Authorization": f"Bearer {API_KEY}"})
+        response.raise_for_status()
+        json.loads(response.content)
+        latencias.append(time.perf_counter() - start_time)
+    return latencias
+
+
+def imprimir_resumo(resumo: Dict):
+    print(f"\nFases por chamada ({resumo['chamadas']} chamadas, {resumo['conexoes_novas']} conexões novas, "
+          f"{resumo['retries']} retries)")
+    print("-" * 50)
+    print(f"{'Fase':<14} {'Média':>10} {'p50':>10} {'p99':>10}")
+    for fase, valores in resumo["fases"].items():
+        print(f"{fase:<14} {valores['media_ms']:>8.2f}ms {valores['p50_ms']:>8.2f}ms {valores['p99_ms']:>8.2f}ms")
+    print(f"Overhead do cliente (serialização + pool + parsing): {resumo['fracao_overhead_cliente']:.1%} do total")
+
+
+if __name__ == "__main__":
+    base_url = BASE_URL
+    if USAR_MOCK:
+        import servidor_mock
+
+        servidor_mock.CONFIG.ttft = 0.0
+        servidor_mock.CONFIG.tokens_por_segundo = 100000.0
+        servidor_mock.iniciar_servidor(porta=PORTA_MOCK)
+        base_url = f"http://127.0.0.1:{PORTA_MOCK}/v1"
+
+    perfilador = Perfilador(destino_jsonl(ARQUIVO_METRICAS) if ARQUIVO_METRICAS else None)
+    client = cliente_instrumentado(perfilador, base_url=base_url, max_retries=0)
+    print(f"Modelo: {MODEL} | max_tokens: {MAX_TOKENS} | {base_url}")
+
+    medir_sdk(client, perfilador, AQUECIMENTO)
+    perfilador.limpar()
+    latencias_sdk = medir_sdk(client, perfilador, REPETICOES)
+
+    with httpx.Client() as http_client:
+        medir_httpx_puro(http_client, base_url, AQUECIMENTO)
+        latencias_httpx = medir_httpx_puro(http_client, base_url, REPETICOES)
+
+    resumo = perfilador.resumo()
+    imprimir_resumo(resumo)
+    perfilador.publicar()
+
+    p50_sdk = percentil(latencias_sdk, 50)
+    p50_httpx = percentil(latencias_httpx, 50)
+    print(f"\nLatência p50: SDK {p50_sdk * 1000:.2f}ms | httpx puro {p50_httpx * 1000:.2f}ms | "
+          f"diferença {(p50_sdk - p50_httpx) * 1000:.2f}ms")
+    client.close()
@@ -0,0 +1,139 @@
+"""
+Escalonamento do prefill com o tamanho do prompt e efeito do cache de prefixo (KV cache).
+
+1. Prompts sintéticos de tamanho crescente (512 a 64k tokens) com `max_tokens=1`:
+   TTFT e tokens/s do prefill (tokens do prompt / TTFT) para cada tamanho.
+2. Cache de prefixo: um prefixo longo compartilhado seguido de sufixos diferentes.
+   A primeira requisição paga o prefill completo (fria); as seguintes podem reaproveitar o KV cache
+   do prefixo no servidor (quentes). O speedup é TTFT frio / TTFT quente.
+
+Cada prompt começa com um identificador aleatório, para que um teste não aqueça o cache do seguinte
+(um prompt maior compartilharia o prefixo com o anterior).
+"""
+
+import uuid
+from typing import Dict, List
+
+from benchmark import MODEL, medir_streaming
+
+TAMANHOS_PROMPT = [512, 1024, 2048, 4096, 8192, 16384, 32768, 65536]
+
+PREFIXO_COMPARTILHADO_TOKENS = 8192
+SUFIXOS = [
+    "Resuma o texto acima em uma frase.",
+    "Qual é o tema principal do texto acima?",
+    "Liste três palavras-chave do texto acima.",
+    "O texto acima é técnico ou informal?",
+]
+
+FRASE_BASE = (
+    "O registro {n} descreve uma conversa de suporte em que o cliente relata um problema com a conta, "
+    "o atendente confirma os dados cadastrais e sugere os próximos passos para resolver a situação. "
+)
+
+
+def texto_sintetico(n_caracteres: int) -> str:
+    """Texto com frases numeradas (evita sequências idênticas repetidas) com aproximadamente n caracteres."""
+    partes = []
+    total = 0
+    n = 0
+    while total < n_caracteres:
+        frase = FRASE_BASE.format(n=n)
+        partes.append(frase)
+        total += len(frase)
+        n += 1
+    return "".join(partes)[:n_caracteres]
+
+
+def calibrar_chars_por_token(model: str) -> float:
+    """Estima caracteres por token do tokenizer do modelo usando o `prompt_tokens` reportado pelo servidor."""
+    amostra = texto_sintetico(8000)
+    try:
+        resultado = medir_streaming(model, amostra, max_tokens=1)
+    except Exception as e:
+        # Sem calibração os tamanhos ficam aproximados, mas os testes seguintes ainda rodam
+        print(f"  Calibração falhou ({type(e).__name__}: {e}); usando 4 caracteres por token")
+        return 4.0
+    if not resultado["prompt_tokens"]:
+        return 4.0
+    return len(amostra) / resultado["prompt_tokens"]
+
+
+def prompt_com_tamanho(n_tokens: int, chars_por_token: float) -> str:
+    """Prompt único (identificador no início) com aproximadamente `n_tokens` tokens."""
+    cabecalho = f"[{uuid.uuid4()}]\n"
+    return cabecalho + texto_sintetico(int(n_tokens * chars_por_token) - len(cabecalho))
+
+
+def medir_prefill(model: str, prompt: str) -> Dict:
+    resultado = medir_streaming(model, prompt, max_tokens=1)
+    prompt_tokens = resultado["prompt_tokens"] or 0
+    return {
+        "prompt_tokens": prompt_tokens,
+        "ttft": resultado["ttft"],
+        "prefill_tps": prompt_tokens / resultado["ttft"] if resultado["ttft"] > 0 else 0.0,
+    }
+
+
+def escalonamento_prefill(model: str, chars_por_token: float) -> List[Dict]:
+    resultados = []
+    for tamanho in TAMANHOS_PROMPT:
+        print(f"  Prompt de ~{tamanho} tokens...")
+        try:
+            resultados.append({"alvo": tamanho, **medir_prefill(model, prompt_com_tamanho(tamanho, chars_por_token))})
+        except Exception as e:
+            # Tamanhos acima do contexto carregado no servidor falham; os demais continuam
+            resultados.append({"alvo": tamanho, "erro": f"{type(e).__name__}: {e}"})
+    return resultados
+
+
+def cache_prefixo(model: str, chars_por_token: float) -> List[Dict]:
+    prefixo = prompt_com_tamanho(PREFIXO_COMPARTILHADO_TOKENS, chars_por_token)
+    resultados = []
+    for i, sufixo in enumerate(SUFIXOS):
+        print(f"  Prefixo compartilhado + sufixo {i + 1}...")
+        tipo = "frio" if i == 0 else "quente"
+        try:
+            resultados.append({"tipo": tipo, **medir_prefill(model, f"{prefixo}\n\n{sufixo}")})
+        except Exception as e:
+            resultados.append({"tipo": tipo, "erro": f"{type(e).__name__}: {e}"})
+    return resultados
+
+
+def imprimir_resultados(escalonamento: List[Dict], prefixo: List[Dict]):
+    print("\nEscalonamento do prefill")
+    print("-" * 60)
+    print(f"{'Alvo':>8} {'Tokens':>8} {'TTFT':>10} {'Prefill tokens/s':>18}")
+    for r in escalonamento:
+        if "erro" in r:
+            print(f"{r['alvo']:>8} {'-':>8} {'-':>10} {'-':>18}  erro: {r['erro']}")
+            continue
+        print(f"{r['alvo']:>8} {r['prompt_tokens']:>8} {r['ttft']:>9.2f}s {r['prefill_tps']:>18.1f}")
+
+    print(f"\nCache de prefixo (~{PREFIXO_COMPARTILHADO_TOKENS} tokens compartilhados)")
+    print("-" * 60)
+    for r in prefixo:
+        if "erro" in r:
+            print(f"{r['tipo']:>8} {'-':>8} {'-':>10}  erro: {r['erro']}")
+            continue
+        print(f"{r['tipo']:>8} {r['prompt_tokens']:>8} {r['ttft']:>9.2f}s")
+
+    quentes = [r["ttft"] for r in prefixo if r["tipo"] == "quente" and "erro" not in r]
+    if quentes and prefixo and "erro" not in prefixo[0]:
+        ttft_quente = sum(quentes) / len(quentes)
+        speedup = prefixo[0]["ttft"] / ttft_quente if ttft_quente > 0 else 0.0
+        print(f"Speedup do cache de prefixo: {speedup:.1f}x "
+              f"(frio {prefixo[0]['ttft']:.2f}s, quente médio {ttft_quente:.2f}s)")
+
+
+if __name__ == "__main__":
+    print(f"Modelo: {MODEL}")
+    chars_por_token = calibrar_chars_por_token(MODEL)
+    print(f"Calibração: {chars_por_token:.2f} caracteres por token")
+
+    print("\nEscalonamento do prefill...")
+    escalonamento = escalonamento_prefill(MODEL, chars_por_token)
+    print("\nCache de prefixo...")
+    prefixo = cache_prefixo(MODEL, chars_por_token)
+
+    imprimir_resultados(escalonamento, prefixo)
@@ -0,0 +1,526 @@
+"""
+Servidor mock OpenAI-compatible para benchmarks determinísticos sem GPU.
+
+Implementa o suficiente da API para os scripts do repositório:
+- GET  /v1/models
+- POST /v1/chat/completions (stream e não-stream, tool calls, usage, stream_options.include_usage)
+- POST /v1/responses        (stream SSE com os eventos lidos pelo streamlit_chat.py, function_call e reasoning)
+
+A "geração" é sintética e determinística (mesma semente -> mesmo texto), com tempos configuráveis:
+TTFT base + prefill proporcional ao prompt, taxa de tokens por segundo do decode e injeção de falhas.
+Com isso dá para medir o overhead do cliente, concorrência e parsers sem depender do LM Studio.
+
+Com `--cache-prefixo` o servidor simula o cache de prefixo do KV cache (como o prefix caching do vLLM):
+o prompt é dividido em blocos de `--bloco-cache-tokens` tokens, cada bloco é identificado pelo hash de todo
+o texto até ele, e o prefill só é cobrado a partir do primeiro bloco que não está no cache (LRU de
+`--cache-blocos` blocos). Os tokens reaproveitados saem em `usage.prompt_tokens_details.cached_tokens`.
+
+Uso:
+    python servidor_mock.py --porta 1234 --tokens-por-segundo 50 --ttft 0.2 --taxa-falha 0.05
+
+Com `--tokens-por-segundo 0 --ttft 0` o servidor responde sem pausas, isolando o custo do lado do cliente.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PALAVRAS = (
+    "o modelo gera uma resposta sintética para medir latência throughput e comportamento do cliente "
+    "sem depender de uma GPU real cada palavra conta como um token na simulação"
+).split()
+
+
+@dataclass
+class ConfigMock:
+    tokens_por_segundo: float = 50.0  # velocidade do decode
+    ttft: float = 0.2  # tempo fixo até o primeiro token (s)
+    prefill_tokens_por_segundo: float = 0.0  # > 0 soma prompt_tokens / taxa ao TTFT
+    tokens_resposta: int = 64  # tamanho padrão da resposta (limitado por max_tokens)
+    tokens_raciocinio: int = 0  # tokens de reasoning emitidos antes da resposta
+    taxa_falha: float = 0.0  # probabilidade de HTTP 500
+    taxa_limite: float = 0.0  # probabilidade de HTTP 429
+    taxa_falha_stream: float = 0.0  # probabilidade de encerrar o stream no meio
+    cache_prefixo: bool = False  # simula o cache de prefixo do KV cache (prefill só do trecho não cacheado)
+    bloco_cache_tokens: int = 16  # granularidade do cache (blocos do KV cache paginado)
+    cache_blocos: int = 65_536  # blocos mantidos no cache (LRU)
+    seed: int = 42
+
+
+CONFIG = ConfigMock()
+_rng = random.Random(CONFIG.seed)
+_rng_lock = threading.Lock()
+
+
+def sortear(probabilidade: float) -> bool:
+    if probabilidade <= 0:
+        return False
+    with _rng_lock:
+        return _rng.random() < probabilidade
+
+
+CARACTERES_POR_TOKEN = 4
+
+
+def contar_tokens(texto: str) -> int:
+    """Aproximação simples: ~4 caracteres por token."""
+    return max(1, len(texto) // CARACTERES_POR_TOKEN)
+
+
+class CachePrefixo:
+    """Blocos de prompt já processados, identificados pelo hash encadeado do prefixo até cada bloco."""
+
+    def __init__(self):
+        self._blocos: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consultar(self, prompt: str) -> int:
+        """Tokens do maior prefixo de `prompt` já em cache; registra os blocos do prompt para as próximas requisições."""
+        tamanho_bloco = CONFIG.bloco_cache_tokens * CARACTERES_POR_TOKEN
+        hashes = []
+        anterior = ""
+        for inicio in range(0, len(prompt) - tamanho_bloco + 1, tamanho_bloco):
+            anterior = hashlib.sha1((anterior + prompt[inicio:inicio + tamanho_bloco]).encode("utf-8")).hexdigest()
+            hashes.append(anterior)
+
+        with self._lock:
+            em_cache = 0
+            while em_cache < len(hashes) and hashes[em_cache] in self._blocos:
+                em_cache += 1
+            for hash_bloco in hashes:
+                self._blocos[hash_bloco] = None
+                self._blocos.move_to_end(hash_bloco)
+            while len(self._blocos) > CONFIG.cache_blocos:
+                self._blocos.popitem(last=False)
+        return em_cache * CONFIG.bloco_cache_tokens
+
+    def limpar(self):
+        with self._lock:
+            self._blocos.clear()
+
+
+CACHE_PREFIXO = CachePrefixo()
+
+
+def tokens_em_cache(prompt: str) -> int:
+    return CACHE_PREFIXO.consultar(prompt) if CONFIG.cache_prefixo else 0
+
+
+def texto_do_conteudo(conteudo) -> str:
+    """Extrai o texto de um `content` (string ou lista de partes, nos formatos chat e responses)."""
+    if conteudo is None:
+        return ""
+    if isinstance(conteudo, str):
+        return conteudo
+    partes = []
+    for parte in conteudo:
+        if isinstance(parte, dict):
+            partes.append(parte.get("text") or parte.get("output") or "")
+        else:
+            partes.append(str(parte))
+    return " ".join(partes)
+
+
+def gerar_tokens(semente: str, quantidade: int) -> List[str]:
+    """Tokens determinísticos para uma semente (ex: o prompt)."""
+    rng = random.Random(semente)
+    return [rng.choice(PALAVRAS) + " " for _ in range(quantidade)]
+
+
+def argumentos_ficticios(ferramenta: Dict) -> str:
+    """Monta argumentos JSON com os campos obrigatórios da ferramenta preenchidos com valores fixos."""
+    parametros = ferramenta.get("parameters") or ferramenta.get("function", {}).get("parameters") or {}
+    propriedades = parametros.get("properties", {})
+    obrigatorios = parametros.get("required", list(propriedades))
+    argumentos = {}
+    for nome in obrigatorios:
+        tipo = propriedades.get(nome, {}).get("type", "string")
+        argumentos[nome] = {"integer": 1, "number": 1.0, "boolean": True}.get(tipo, "mock")
+    return json.dumps(argumentos)
+
+
+def espera_ate_primeiro_token(prompt_tokens: int, cacheados: int = 0) -> float:
+    espera = CONFIG.ttft
+    if CONFIG.prefill_tokens_por_segundo > 0:
+        espera += max(0, prompt_tokens - cacheados) / CONFIG.prefill_tokens_por_segundo
+    return espera
+
+
+def ritmo_tokens(tokens: List[str], inicio: float) -> Iterator[str]:
+    """Emite os tokens respeitando o TTFT (já aguardado) e a taxa de decode, sem acumular atraso."""
+    intervalo = 1.0 / CONFIG.tokens_por_segundo if CONFIG.tokens_por_segundo > 0 else 0.0
+    for i, token in enumerate(tokens):
+        espera = inicio + i * intervalo - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+        yield token
+
+
+class FalhaStream(Exception):
+    pass
+
+
+# =============================================================================
+# /v1/chat/completions
+# =============================================================================
+
+
+def planejar_chat(corpo: Dict) -> Tuple[int, int, List[str], List[str], Optional[Dict]]:
+    """Retorna (prompt_tokens, tokens em cache, tokens de raciocínio, tokens da resposta, tool call ou None)."""
+    mensagens = corpo.get("messages", [])
+    prompt = "\n".join(texto_do_conteudo(m.get("content")) for m in mensagens)
+    prompt_tokens = contar_tokens(prompt)
+    cacheados = min(tokens_em_cache(prompt), prompt_tokens)
+
+    ferramentas = corpo.get("tools") or []
+    ultima = mensagens[-1] if mensagens else {}
+    if ferramentas and corpo.get("tool_choice") != "none" and ultima.get("role") == "user":
+        ferramenta = ferramentas[0].get("function", ferramentas[0])
+        tool_call = {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": ferramenta.get("name"), "arguments": argumentos_ficticios(ferramenta)},
+        }
+        return prompt_tokens, cacheados, [], [], tool_call
+
+    limite = corpo.get("max_tokens") or corpo.get("max_completion_tokens") or CONFIG.tokens_resposta
+    quantidade = min(CONFIG.tokens_resposta, limite)
+    raciocinio = gerar_tokens("r" + prompt, min(CONFIG.tokens_raciocinio, limite))
+    resposta = gerar_tokens(prompt, max(0, quantidade - len(raciocinio)))
+    return prompt_tokens, cacheados, raciocinio, resposta, None
+
+
+def usage_chat(prompt_tokens: int, cacheados: int, raciocinio: List[str], resposta: List[str],
+               tool_call: Optional[Dict]) -> Dict:
+    completion = len(raciocinio) + len(resposta) + (contar_tokens(tool_call["function"]["arguments"]) if tool_call else 0)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion,
+        "total_tokens": prompt_tokens + completion,
+        "prompt_tokens_details": {"cached_tokens": cacheados},
+        "completion_tokens_details": {"reasoning_tokens": len(raciocinio)},
+    }
+
+
+def chat_completo(corpo: Dict) -> Dict:
+    prompt_tokens, cacheados, raciocinio, resposta, tool_call = planejar_chat(corpo)
+    time.sleep(espera_ate_primeiro_token(prompt_tokens, cacheados))
+    for _ in ritmo_tokens(raciocinio + resposta, time.perf_counter()):
+        pass
+
+    mensagem = {"role": "assistant", "content": None if tool_call else "".join(resposta)}
+    if raciocinio:
+        mensagem["reasoning_content"] = "".join(raciocinio)
+    if tool_call:
+        mensagem["tool_calls"] = [tool_call]
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": corpo.get("model", "mock"),
+        "choices": [{"index": 0, "message": mensagem, "finish_reason": "tool_calls" if tool_call else "stop"}],
+        "usage": usage_chat(prompt_tokens, cacheados, raciocinio, resposta, tool_call),
+    }
+
+
+def chat_stream(corpo: Dict) -> Iterator[Dict]:
+    prompt_tokens, cacheados, raciocinio, resposta, tool_call = planejar_chat(corpo)
+    id_ = f"chatcmpl-{uuid.uuid4().hex}"
+    base = {"id": id_, "object": "chat.completion.chunk", "created": int(time.time()), "model": corpo.get("model", "mock")}
+
+    def chunk(delta: Dict, finish_reason: Optional[str] = None) -> Dict:
+        return {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+    time.sleep(espera_ate_primeiro_token(prompt_tokens, cacheados))
+    yield chunk({"role": "assistant", "content": ""})
+
+    falhar_em = len(raciocinio + resposta) // 2 if sortear(CONFIG.taxa_falha_stream) else None
+    for i, token in enumerate(ritmo_tokens(raciocinio + resposta, time.perf_counter())):
+        if i == falhar_em:
+            raise FalhaStream()
+        if i < len(raciocinio):
+            yield chunk({"reasoning_content": token})
+        else:
+            yield chunk({"content": token})
+
+    if tool_call:
+        yield chunk({"tool_calls": [{"index": 0, **tool_call}]})
+    yield chunk({}, "tool_calls" if tool_call else "stop")
+
+    if (corpo.get("stream_options") or {}).get("include_usage"):
+        yield {**base, "choices": [], "usage": usage_chat(prompt_tokens, cacheados, raciocinio, resposta, tool_call)}
+
+
+# =============================================================================
+# /v1/responses
+# =============================================================================
+
+
+def planejar_responses(corpo: Dict) -> Tuple[int, int, List[str], List[str], Optional[Dict]]:
+    entrada = corpo.get("input", "")
+    if isinstance(entrada, str):
+        itens = [{"type": "message", "role": "user", "content": entrada}]
+    else:
+        itens = entrada
+    prompt = (corpo.get("instructions") or "") + "\n" + "\n".join(
+        texto_do_conteudo(item.get("content") or item.get("output")) for item in itens
+    )
+    prompt_tokens = contar_tokens(prompt)
+    cacheados = min(tokens_em_cache(prompt), prompt_tokens)
+
+    ferramentas = [f for f in (corpo.get("tools") or []) if f.get("type") == "function"]
+    ultimo = itens[-1] if itens else {}
+    if ferramentas and ultimo.get("type", "message") == "message" and ultimo.get("role") == "user":
+        ferramenta = ferramentas[0]
+        function_call = {
+            "type": "function_call",
+            "id": f"fc_{uuid.uuid4().hex[:12]}",
+            "call_id": f"call_{uuid.uuid4().hex[:12]}",
+            "name": ferramenta.get("name"),
+            "arguments": argumentos_ficticios(ferramenta),
+            "status": "completed",
+        }
+        return prompt_tokens, cacheados, [], [], function_call
+
+    limite = corpo.get("max_output_tokens") or CONFIG.tokens_resposta
+    quantidade = min(CONFIG.tokens_resposta, limite)
+    n_raciocinio = CONFIG.tokens_raciocinio if corpo.get("reasoning") else 0
+    raciocinio = gerar_tokens("r" + prompt, min(n_raciocinio, quantidade))
+    resposta = gerar_tokens(prompt, max(0, quantidade - len(raciocinio)))
+    return prompt_tokens, cacheados, raciocinio, resposta, None
+
+
+def objeto_response(corpo: Dict, id_: str, status: str, saida: List[Dict], usage: Optional[Dict]) -> Dict:
+    return {
+        "id": id_,
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": status,
+        "model": corpo.get("model", "mock"),
+        "output": saida,
+        "usage": usage,
+        "metadata": corpo.get("metadata") or {},
+    }
+
+
+def usage_responses(prompt_tokens: int, cacheados: int, raciocinio: List[str], resposta: List[str],
+                    function_call: Optional[Dict]) -> Dict:
+    output_tokens = len(raciocinio) + len(resposta) + (contar_tokens(function_call["arguments"]) if function_call else 0)
+    return {
+        "input_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": prompt_tokens + output_tokens,
+        "input_tokens_details": {"cached_tokens": cacheados},
+        "output_tokens_details": {"reasoning_tokens": len(raciocinio)},
+    }
+
+
+def itens_saida(raciocinio: List[str], resposta: List[str], function_call: Optional[Dict]) -> List[Dict]:
+    saida = []
+    if raciocinio:
+        saida.append({
+            "type": "reasoning",
+            "id": f"rs_{uuid.uuid4().hex[:12]}",
+            "content": [{"type": "reasoning_text", "text": "".join(raciocinio)}],
+            "summary": [],
+        })
+    if function_call:
+        saida.append(function_call)
+    else:
+        saida.append({
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex[:12]}",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": "".join(resposta), "annotations": []}],
+        })
+    return saida
+
+
+def responses_completo(corpo: Dict) -> Dict:
+    prompt_tokens, cacheados, raciocinio, resposta, function_call = planejar_responses(corpo)
+    time.sleep(espera_ate_primeiro_token(prompt_tokens, cacheados))
+    for _ in ritmo_tokens(raciocinio + resposta, time.perf_counter()):
+        pass
+    resposta_obj = objeto_response(
+        corpo, f"resp_{uuid.uuid4().hex}", "completed", itens_saida(raciocinio, resposta, function_call),
+        usage_responses(prompt_tokens, cacheados, raciocinio, resposta, function_call),
+    )
+    resposta_obj["output_text"] = "".join(resposta)
+    return resposta_obj
+
+
+def responses_stream(corpo: Dict) -> Iterator[Dict]:
+    prompt_tokens, cacheados, raciocinio, resposta, function_call = planejar_responses(corpo)
+    id_ = f"resp_{uuid.uuid4().hex}"
+    saida = itens_saida(raciocinio, resposta, function_call)
+    sequencia = iter(range(1_000_000))
+
+    def evento(tipo: str, **dados) -> Dict:
+        return {"type": tipo, "sequence_number": next(sequencia), **dados}
+
+    yield evento("response.created", response=objeto_response(corpo, id_, "in_progress", [], None))
+    time.sleep(espera_ate_primeiro_token(prompt_tokens, cacheados))
+
+    falhar_em = len(raciocinio + resposta) // 2 if sortear(CONFIG.taxa_falha_stream) else None
+    tokens = ritmo_tokens(raciocinio + resposta, time.perf_counter())
+    emitidos = 0
+
+    for indice, item in enumerate(saida):
+        vazio = {**item, "content": []} if item["type"] in ("reasoning", "message") else item
+        yield evento("response.output_item.added", output_index=indice, item=vazio)
+
+        if item["type"] in ("reasoning", "message"):
+            tipo_delta = "response.reasoning_text.delta" if item["type"] == "reasoning" else "response.output_text.delta"
+            quantidade = len(raciocinio) if item["type"] == "reasoning" else len(resposta)
+            for _ in range(quantidade):
+                token = next(tokens)
+                if emitidos == falhar_em:
+                    raise FalhaStream()
+                emitidos += 1
+                yield evento(tipo_delta, item_id=item["id"], output_index=indice, content_index=0, delta=token)
+
+        yield evento("response.output_item.done", output_index=indice, item=item)
+
+    yield evento(
+        "response.completed",
+        response=objeto_response(corpo, id_, "completed", saida,
+                                 usage_responses(prompt_tokens, cacheados, raciocinio, resposta, function_call)),
+    )
+
+
+# =============================================================================
+# HTTP
+# =============================================================================
+
+
+class HandlerMock(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, formato, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+        else:
+            self._erro(404, f"Rota não encontrada: {self.path}", "not_found")
+
+    def do_POST(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        try:
+            corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+        except json.JSONDecodeError:
+            self._erro(400, "JSON inválido", "invalid_request_error")
+            return
+
+        if sortear(CONFIG.taxa_limite):
+            self._erro(429, "Limite de requisições simulado", "rate_limit_exceeded")
+            return
+        if sortear(CONFIG.taxa_falha):
+            self._erro(500, "Falha simulada", "server_error")
+            return
+
+        rota = self.path.rstrip("/")
+        if rota == "/v1/chat/completions":
+            gerador_stream, completo = chat_stream, chat_completo
+            fim_stream = True
+        elif rota == "/v1/responses":
+            gerador_stream, completo = responses_stream, responses_completo
+            fim_stream = False
+        else:
+            self._erro(404, f"Rota não encontrada: {self.path}", "not_found")
+            return
+
+        if corpo.get("stream"):
+            self._sse(gerador_stream(corpo), fim_stream)
+        else:
+            self._json(200, completo(corpo))
+
+    def _json(self, status: int, dados: Dict):
+        conteudo = json.dumps(dados).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(conteudo)))
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def _erro(self, status: int, mensagem: str, tipo: str):
+        self._json(status, {"error": {"message": mensagem, "type": tipo, "code": tipo}})
+
+    def _sse(self, eventos: Iterator[Dict], enviar_done: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for dados in eventos:
+                linha = ""
+                if "type" in dados and "sequence_number" in dados:
+                    linha += f"event: {dados['type']}\n"
+                linha += f"data: {json.dumps(dados)}\n\n"
+                self._chunk(linha.encode("utf-8"))
+            if enviar_done:
+                self._chunk(b"data: [DONE]\n\n")
+            self._chunk(b"")
+        except FalhaStream:
+            # Encerra a conexão sem o chunk final: o cliente vê o stream interrompido
+            self.close_connection = True
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _chunk(self, dados: bytes):
+        self.wfile.write(f"{len(dados):X}\r\n".encode("ascii") + dados + b"\r\n")
+        self.wfile.flush()
+
+
+def iniciar_servidor(host: str = "127.0.0.1", porta: int = 1234) -> ThreadingHTTPServer:
+    """Inicia o servidor em uma thread daemon (útil para benchmarks e testes no mesmo processo)."""
+    servidor = ThreadingHTTPServer((host, porta), HandlerMock)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor mock OpenAI-compatible")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=1234)
+    parser.add_argument("--tokens-por-segundo", type=float, default=CONFIG.tokens_por_segundo)
+    parser.add_argument("--ttft", type=float, default=CONFIG.ttft)
+    parser.add_argument("--prefill-tokens-por-segundo", type=float, default=CONFIG.prefill_tokens_por_segundo)
+    parser.add_argument("--tokens-resposta", type=int, default=CONFIG.tokens_resposta)
+    parser.add_argument("--tokens-raciocinio", type=int, default=CONFIG.tokens_raciocinio)
+    parser.add_argument("--taxa-falha", type=float, default=CONFIG.taxa_falha)
+    parser.add_argument("--taxa-limite", type=float, default=CONFIG.taxa_limite)
+    parser.add_argument("--taxa-falha-stream", type=float, default=CONFIG.taxa_falha_stream)
+    parser.add_argument("--cache-prefixo", action="store_true", default=CONFIG.cache_prefixo)
+    parser.add_argument("--bloco-cache-tokens", type=int, default=CONFIG.bloco_cache_tokens)
+    parser.add_argument("--cache-blocos", type=int, default=CONFIG.cache_blocos)
+    parser.add_argument("--seed", type=int, default=CONFIG.seed)
+    args = parser.parse_args()
+
+    for campo in vars(CONFIG):
+        setattr(CONFIG, campo, getattr(args, campo))
+    _rng.seed(CONFIG.seed)
+
+    servidor = ThreadingHTTPServer((args.host, args.porta), HandlerMock)
+    servidor.daemon_threads = True
+    print(f"Servidor mock em http://{args.host}:{args.porta}/v1 | {CONFIG}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
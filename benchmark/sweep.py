@@ -0,0 +1,165 @@
+"""
+Sweep de modelos x prompts x parâmetros de geração.
+
+Lê a matriz de `sweep.json`, executa cada célula `repeticoes` vezes com streaming (ver `medir_streaming`)
+e gera `sweep_result.md` com média e desvio padrão de TTFT, TPS do decode e latência total.
+
+Formato de `sweep.json`:
+    {
+      "repeticoes": 3,
+      "aquecimento": true,               # descarta uma requisição por modelo (carga do modelo no LM Studio)
+      "modelos": [{"id": "qwen3.5:9b", "quantizacao": "Q4_K_M"}],
+      "prompts": [{"nome": "texto-curto", "texto": "..."}],
+      "parametros": {                    # produto cartesiano; null = não envia o parâmetro
+        "max_tokens": [512],
+        "temperature": [0.2, 0.7],
+        "reasoning_effort": [null, "low", "high"]
+      }
+    }
+"""
+
+import itertools
+import json
+import statistics
+import sys
+from typing import Dict, List
+
+import historico
+from benchmark import medir_streaming
+
+ARQUIVO_CONFIG = "sweep.json"
+ARQUIVO_RESULTADO = "sweep_result.md"
+
+# Grava cada célula como uma execução no histórico (historico.sqlite3)
+REGISTRAR_HISTORICO = True
+
+
+def carregar_config(arquivo: str) -> Dict:
+    with open(arquivo, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def combinacoes_parametros(parametros: Dict[str, List]) -> List[Dict]:
+    """Produto cartesiano dos parâmetros, removendo os valores `None` de cada combinação."""
+    nomes = list(parametros)
+    combinacoes = []
+    for valores in itertools.product(*(parametros[nome] for nome in nomes)):
+        combinacoes.append({nome: valor for nome, valor in zip(nomes, valores) if valor is not None})
+    return combinacoes
+
+
+def media_desvio(valores: List[float]) -> Dict[str, float]:
+    return {
+        "media": statistics.mean(valores) if valores else 0.0,
+        "desvio": statistics.stdev(valores) if len(valores) > 1 else 0.0,
+    }
+
+
+def executar_celula(modelo: Dict, prompt: Dict, parametros: Dict, repeticoes: int) -> Dict:
+    """Executa uma célula da matriz e agrega as repetições."""
+    execucoes = []
+    erros = []
+    for _ in range(repeticoes):
+        try:
+            execucoes.append(medir_streaming(modelo["id"], prompt["texto"], **parametros))
+        except Exception as e:
+            erros.append(f"{type(e).__name__}: {e}")
+
+    execucao_id = None
+    if REGISTRAR_HISTORICO and execucoes:
+        execucao_id = historico.registrar(
+            modelo["id"], prompt["texto"], execucoes, modelo.get("quantizacao", ""), parametros, origem="sweep"
+        )
+
+    return {
+        "execucao_id": execucao_id,
+        "modelo": modelo["id"],
+        "quantizacao": modelo.get("quantizacao", ""),
+        "prompt": prompt["nome"],
+        "parametros": parametros,
+        "repeticoes": len(execucoes),
+        "erros": erros,
+        "tokens_gerados": media_desvio([e["tokens_gerados"] for e in execucoes]),
+        "ttft": media_desvio([e["ttft"] for e in execucoes]),
+        "tps_decode": media_desvio([e["tps_decode"] for e in execucoes]),
+        "tempo_total": media_desvio([e["tempo_total"] for e in execucoes]),
+        "execucoes": execucoes,
+    }
+
+
+def executar_sweep(config: Dict) -> List[Dict]:
+    repeticoes = config.get("repeticoes", 3)
+    combinacoes = combinacoes_parametros(config.get("parametros", {}))
+    resultados = []
+
+    for modelo in config["modelos"]:
+        if config.get("aquecimento", True):
+            print(f"Aquecendo modelo: {modelo['id']}")
+            try:
+                medir_streaming(modelo["id"], "Olá", max_tokens=8)
+            except Exception as e:
+                print(f"  Falha no aquecimento: {e}")
+
+        for prompt in config["prompts"]:
+            for parametros in combinacoes:
+                print(f"  -> {modelo['id']} | {prompt['nome']} | {parametros}")
+                resultados.append(executar_celula(modelo, prompt, parametros, repeticoes))
+
+    return resultados
+
+
+def formatar_parametros(parametros: Dict) -> str:
+    return ", ".join(f"{k}={v}" for k, v in parametros.items()) or "padrão"
+
+
+def gerar_relatorio(config: Dict, resultados: List[Dict]) -> str:
+    linhas = []
+    linhas.append("# Sweep de Modelos\n")
+    linhas.append(f"**Repetições por célula:** {config.get('repeticoes', 3)}\n")
+    linhas.append("")
+    linhas.append("Valores no formato média ± desvio padrão. O ID é a execução no histórico (`python historico.py comparar ID_A ID_B`).")
+    linhas.append("")
+    linhas.append("| ID | Modelo | Quantização | Prompt | Parâmetros | Tokens | TTFT (s) | TPS Decode | Latência Total (s) | Erros |")
+    linhas.append("|----|--------|-------------|--------|------------|--------|----------|------------|--------------------|-------|")
+
+    for res in resultados:
+        if not res["repeticoes"]:
+            linhas.append(
+                f"| - | {res['modelo']} | {res['quantizacao']} | {res['prompt']} | "
+                f"{formatar_parametros(res['parametros'])} | - | - | - | - | {len(res['erros'])} |"
+            )
+            continue
+        linhas.append(
+            f"| {res['execucao_id'] or '-'} | {res['modelo']} | {res['quantizacao']} | {res['prompt']} | "
+            f"{formatar_parametros(res['parametros'])} | "
+            f"{res['tokens_gerados']['media']:.0f} | "
+            f"{res['ttft']['media']:.2f} ± {res['ttft']['desvio']:.2f} | "
+            f"{res['tps_decode']['media']:.2f} ± {res['tps_decode']['desvio']:.2f} | "
+            f"{res['tempo_total']['media']:.2f} ± {res['tempo_total']['desvio']:.2f} | "
+            f"{len(res['erros'])} |"
+        )
+
+    linhas.append("")
+    erros = [(res, erro) for res in resultados for erro in res["erros"]]
+    if erros:
+        linhas.append("## Erros\n")
+        linhas.append("")
+        for res, erro in erros:
+            linhas.append(f"- `{res['modelo']}` / {res['prompt']}: {erro}")
+        linhas.append("")
+
+    return "\n".join(linhas)
+
+
+if __name__ == "__main__":
+    arquivo_config = sys.argv[1] if len(sys.argv) > 1 else ARQUIVO_CONFIG
+    config = carregar_config(arquivo_config)
+
+    resultados = executar_sweep(config)
+    relatorio = gerar_relatorio(config, resultados)
+
+    print()
+    print(relatorio)
+    with open(ARQUIVO_RESULTADO, "w", encoding="utf-8") as f:
+        f.write(relatorio)
+    print(f"\nRelatório salvo em: {ARQUIVO_RESULTADO}")
@@ -0,0 +1,29 @@
+from cliente_llm.cache_respostas import CacheRespostas
+from cliente_llm.fabrica import (
+    CONFIG,
+    ConfigCliente,
+    chat_openai,
+    criar_http_client_async,
+    fechar_clientes,
+    fechar_clientes_async,
+    obter_cliente,
+    obter_cliente_async,
+)
+from cliente_llm.medidor import MedidorTokens
+from cliente_llm.provedores import PROVEDORES, Provedor, resolver_provedor
+
+__all__ = [
+    "CONFIG",
+    "CacheRespostas",
+    "ConfigCliente",
+    "MedidorTokens",
+    "PROVEDORES",
+    "Provedor",
+    "chat_openai",
+    "criar_http_client_async",
+    "fechar_clientes",
+    "fechar_clientes_async",
+    "obter_cliente",
+    "obter_cliente_async",
+    "resolver_provedor",
+]
@@ -0,0 +1,81 @@
+"""
+Adaptador do `CacheRespostas` para o cache de LLM do LangChain.
+
+    from langchain_core.globals import set_llm_cache
+    from cliente_llm.cache_langchain import CacheLangChain
+
+    set_llm_cache(CacheLangChain(CacheRespostas(limiar_semantico=0.92)))
+
+Para chat models o LangChain passa como `prompt` a lista de mensagens serializada (`langchain_core.load.dumps`)
+e como `llm_string` o modelo + parâmetros. O escopo é `llm_string` + mensagens anteriores à última, e o texto
+comparado (exato/semântico) é o conteúdo da última mensagem, como em `CacheRespostas.completar`.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+
+from cliente_llm.cache_respostas import CacheRespostas
+
+
+def separar_prompt(prompt: str, llm_string: str) -> Tuple[str, str]:
+    """(escopo, texto da última mensagem) a partir do prompt serializado pelo LangChain."""
+    try:
+        mensagens = json.loads(prompt)
+        ultima = mensagens[-1]["kwargs"]
+        texto = ultima["content"] if isinstance(ultima["content"], str) else json.dumps(ultima["content"])
+        anteriores = json.dumps(mensagens[:-1], sort_keys=True, ensure_ascii=False)
+    except (ValueError, TypeError, KeyError, IndexError):
+        # LLMs de texto (não chat) recebem o prompt puro
+        texto, anteriores = prompt, ""
+    escopo = hashlib.sha256(f"{llm_string}\n{anteriores}".encode("utf-8")).hexdigest()
+    return escopo, texto
+
+
+class CacheLangChain(BaseCache):
+    """`BaseCache` do LangChain sobre um `CacheRespostas` (camada exata + semântica, TTL e estatísticas)."""
+
+    def __init__(self, cache: Optional[CacheRespostas] = None, max_misses: int = 1_000, ttl_miss_segundos: float = 600):
+        self.cache = cache or CacheRespostas()
+        # Início de cada miss, para medir a latência da geração quando o LangChain chama `update`.
+        # Misses sem `update` (geração com erro ou cancelada) expiram pelo TTL ou saem pelo LRU.
+        self.max_misses = max_misses
+        self.ttl_miss_segundos = ttl_miss_segundos
+        self._misses: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        escopo, texto = separar_prompt(prompt, llm_string)
+        resposta = self.cache.buscar(escopo, texto)
+        if resposta is None:
+            agora = time.perf_counter()
+            with self._lock:
+                self._misses[(escopo, texto)] = agora
+                self._misses.move_to_end((escopo, texto))
+                self._podar_misses(agora)
+        return resposta
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        escopo, texto = separar_prompt(prompt, llm_string)
+        agora = time.perf_counter()
+        with self._lock:
+            inicio = self._misses.pop((escopo, texto), agora)
+        self.cache.armazenar(escopo, texto, return_val, agora - inicio)
+
+    def _podar_misses(self, agora: float):
+        """Remove misses expirados e os mais antigos acima de `max_misses` (chamar com `_lock`)."""
+        while self._misses:
+            chave, inicio = next(iter(self._misses.items()))
+            if len(self._misses) <= self.max_misses and agora - inicio <= self.ttl_miss_segundos:
+                break
+            del self._misses[chave]
+
+    def clear(self, **kwargs: Any) -> None:
+        self.cache.limpar()
+        with self._lock:
+            self._misses.clear()
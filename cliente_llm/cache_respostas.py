@@ -0,0 +1,231 @@
+"""
+Cache de respostas de chat completions, com camada exata e camada semântica opcional.
+
+- Escopo: modelo, parâmetros de geração e todas as mensagens anteriores à última (system prompt + histórico).
+  Respostas só são reaproveitadas dentro do mesmo escopo.
+- Camada exata: escopo + última mensagem normalizada (NFC, espaços colapsados, casefold).
+- Camada semântica (`limiar_semantico`): embedding da última mensagem com sentence-transformers (mesmos modelos
+  do `similarity-search`); devolve a resposta da entrada do mesmo escopo com maior similaridade de cosseno,
+  se ela passar do limiar. Ex: "Qual a capital do Brasil?" x "qual é a capital do brasil".
+- Limite de entradas com despejo LRU e expiração por TTL.
+- Estatísticas de hit rate (por camada) e da latência economizada (latência original da resposta servida
+  menos o tempo do lookup).
+
+Uso com o SDK da OpenAI: `cache.completar(client, model=..., messages=...)` no lugar de
+`client.chat.completions.create(...)`. Com LangChain, ver `cliente_llm.cache_langchain`.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MODELO_EMBEDDINGS = "paraphrase-multilingual-MiniLM-L12-v2"
+
+# Parâmetros que não mudam o conteúdo da resposta e ficam fora do escopo
+PARAMETROS_IGNORADOS = {"messages", "stream", "stream_options", "timeout", "extra_headers", "user"}
+
+
+def normalizar_texto(texto: str) -> str:
+    """Normaliza o texto para uso como chave (NFC, casefold e espaços colapsados)."""
+    texto = unicodedata.normalize("NFC", texto)
+    return re.sub(r"\s+", " ", texto).strip().casefold()
+
+
+def texto_da_mensagem(mensagem: Dict) -> str:
+    """Conteúdo textual de uma mensagem (string ou lista de partes do formato multimodal)."""
+    conteudo = mensagem.get("content") or ""
+    if isinstance(conteudo, str):
+        return conteudo
+    return " ".join(parte.get("text", "") for parte in conteudo if isinstance(parte, dict))
+
+
+def escopo_chat(parametros: Dict[str, Any]) -> str:
+    """Hash do modelo, parâmetros e mensagens anteriores à última de uma chamada de chat completions."""
+    mensagens = parametros.get("messages", [])
+    anteriores = [
+        {"role": m.get("role"), "content": normalizar_texto(texto_da_mensagem(m)), "extra": {
+            k: v for k, v in m.items() if k not in ("role", "content")
+        }}
+        for m in mensagens[:-1]
+    ]
+    base = {
+        "parametros": {k: v for k, v in parametros.items() if k not in PARAMETROS_IGNORADOS},
+        "anteriores": anteriores,
+        "ultima_role": mensagens[-1].get("role") if mensagens else None,
+    }
+    return hashlib.sha256(json.dumps(base, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+class CacheRespostas:
+    """
+    Cache LRU/TTL de respostas do LLM.
+
+    Args:
+        max_entradas: Número máximo de respostas armazenadas.
+        ttl_segundos: Tempo de vida de cada entrada. `None` desativa a expiração.
+        limiar_semantico: Similaridade de cosseno mínima para a camada semântica. `None` desativa a camada.
+        modelo_embeddings: Modelo sentence-transformers usado na camada semântica.
+        relogio: Função de tempo (injetável para testes/replay).
+    """
+
+    def __init__(
+        self,
+        max_entradas: int = 1_000,
+        ttl_segundos: Optional[float] = 3600,
+        limiar_semantico: Optional[float] = None,
+        modelo_embeddings: str = MODELO_EMBEDDINGS,
+        relogio: Callable[[], float] = time.perf_counter,
+    ):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self.limiar_semantico = limiar_semantico
+        self.modelo_embeddings = modelo_embeddings
+        self._relogio = relogio
+        self._modelo = None
+        self._lock = threading.Lock()
+        # (escopo, texto normalizado) -> {"resposta", "latencia", "criado_em", "embedding"}
+        self._entradas: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+
+        self.hits_exatos = 0
+        self.hits_semanticos = 0
+        self.misses = 0
+        self.expirados = 0
+        self.despejados = 0
+        self._tempo_economizado = 0.0
+        self._tempo_lookup = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def _embedding(self, texto: str):
+        if self._modelo is None:
+            # Carregado só quando a camada semântica é usada (sentence-transformers é opcional)
+            from sentence_transformers import SentenceTransformer
+
+            self._modelo = SentenceTransformer(self.modelo_embeddings)
+        return self._modelo.encode(texto, normalize_embeddings=True)
+
+    def buscar(self, escopo: str, texto: str) -> Optional[Any]:
+        """Retorna a resposta armazenada para o texto (exata ou semântica) ou `None` em caso de miss."""
+        inicio = self._relogio()
+        chave = (escopo, normalizar_texto(texto))
+        with self._lock:
+            entrada = self._valida(chave, inicio)
+            if entrada is not None:
+                self.hits_exatos += 1
+                return self._servir(chave, entrada, inicio)
+
+        if self.limiar_semantico is not None:
+            embedding = self._embedding(chave[1])
+            with self._lock:
+                melhor, similaridade = None, self.limiar_semantico
+                for chave_entrada in list(self._entradas):
+                    if chave_entrada[0] != escopo:
+                        continue
+                    entrada = self._valida(chave_entrada, inicio)
+                    if entrada is None or entrada["embedding"] is None:
+                        continue
+                    atual = float(embedding @ entrada["embedding"])
+                    if atual >= similaridade:
+                        melhor, similaridade = chave_entrada, atual
+                if melhor is not None:
+                    self.hits_semanticos += 1
+                    return self._servir(melhor, self._entradas[melhor], inicio)
+
+        with self._lock:
+            self.misses += 1
+            self._tempo_lookup += self._relogio() - inicio
+        return None
+
+    def armazenar(self, escopo: str, texto: str, resposta: Any, latencia: float):
+        """Guarda a resposta gerada em `latencia` segundos (usada para estimar o tempo economizado nos hits)."""
+        normalizado = normalizar_texto(texto)
+        embedding = self._embedding(normalizado) if self.limiar_semantico is not None else None
+        with self._lock:
+            chave = (escopo, normalizado)
+            self._entradas.pop(chave, None)
+            self._entradas[chave] = {
+                "resposta": resposta,
+                "latencia": latencia,
+                "criado_em": self._relogio(),
+                "embedding": embedding,
+            }
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.despejados += 1
+
+    def completar(self, client, **parametros):
+        """`client.chat.completions.create(**parametros)` passando pelo cache (chamadas com stream vão direto)."""
+        mensagens = parametros.get("messages") or []
+        if parametros.get("stream") or not mensagens:
+            return client.chat.completions.create(**parametros)
+
+        escopo = escopo_chat(parametros)
+        texto = texto_da_mensagem(mensagens[-1])
+        resposta = self.buscar(escopo, texto)
+        if resposta is not None:
+            return resposta
+
+        inicio = self._relogio()
+        resposta = client.chat.completions.create(**parametros)
+        self.armazenar(escopo, texto, resposta, self._relogio() - inicio)
+        return resposta
+
+    def limpar(self):
+        """Remove todas as entradas e zera as estatísticas."""
+        with self._lock:
+            self._entradas.clear()
+            self.hits_exatos = self.hits_semanticos = self.misses = self.expirados = self.despejados = 0
+            self._tempo_economizado = self._tempo_lookup = 0.0
+
+    def estatisticas(self) -> Dict[str, float]:
+        """Retorna hit rate por camada, ocupação, tempo médio de lookup e latência economizada."""
+        hits = self.hits_exatos + self.hits_semanticos
+        total = hits + self.misses
+        return {
+            "requisicoes": total,
+            "hits_exatos": self.hits_exatos,
+            "hits_semanticos": self.hits_semanticos,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "expirados": self.expirados,
+            "despejados": self.despejados,
+            "entradas": len(self._entradas),
+            "tempo_medio_lookup": self._tempo_lookup / total if total else 0.0,
+            "tempo_economizado": max(0.0, self._tempo_economizado),
+        }
+
+    def _valida(self, chave: Tuple[str, str], agora: float) -> Optional[Dict]:
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        if self.ttl_segundos is not None and agora - entrada["criado_em"] > self.ttl_segundos:
+            del self._entradas[chave]
+            self.expirados += 1
+            return None
+        return entrada
+
+    def _servir(self, chave: Tuple[str, str], entrada: Dict, inicio: float) -> Any:
+        self._entradas.move_to_end(chave)
+        lookup = self._relogio() - inicio
+        self._tempo_lookup += lookup
+        self._tempo_economizado += entrada["latencia"] - lookup
+        return entrada["resposta"]
+
+
+def resumo_estatisticas(estatisticas: Dict[str, float]) -> List[str]:
+    """Linhas legíveis das estatísticas do cache (para print/log)."""
+    return [
+        f"Requisições: {estatisticas['requisicoes']} | hit rate: {estatisticas['hit_rate']:.1%} "
+        f"(exatos {estatisticas['hits_exatos']}, semânticos {estatisticas['hits_semanticos']}, "
+        f"misses {estatisticas['misses']})",
+        f"Entradas: {estatisticas['entradas']} | expirados: {estatisticas['expirados']} | "
+        f"despejados: {estatisticas['despejados']}",
+        f"Lookup médio: {estatisticas['tempo_medio_lookup'] * 1000:.2f}ms | "
+        f"latência economizada: {estatisticas['tempo_economizado']:.2f}s",
+    ]
@@ -0,0 +1,265 @@
+"""
+Clientes OpenAI compartilhados pelo processo inteiro.
+
+Um cliente (e um pool de conexões keep-alive do httpx) por provedor, criado na primeira chamada e
+reaproveitado por todos os scripts: sem handshake TCP/TLS repetido a cada requisição nem um pool por script.
+
+- `obter_cliente()` / `obter_cliente_async()`: OpenAI / AsyncOpenAI singleton do provedor.
+- `chat_openai(model)`: ChatOpenAI (LangChain) usando os mesmos pools.
+- Retry com backoff exponencial e jitter completo no transport (erros de conexão, 429 e 5xx, respeitando
+  `Retry-After`); o retry do SDK fica desligado para não multiplicar tentativas. Em POST (não idempotente)
+  só se repetem falhas da fase de conexão: um erro de protocolo no meio da resposta pode vir de uma
+  requisição que o servidor já processou.
+- HTTP/2 quando o pacote `h2` estiver instalado (só é negociado em https; LM Studio local segue em HTTP/1.1).
+
+Configuração pelo ambiente (ver `ConfigCliente`): LLM_TIMEOUT, LLM_CONNECT_TIMEOUT, LLM_MAX_RETRIES,
+LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_MAX_CONEXOES, LLM_MAX_KEEPALIVE, LLM_KEEPALIVE_EXPIRY, LLM_HTTP2.
+
+O AsyncOpenAI fica preso ao event loop em que fez a primeira requisição; em scripts que chamam
+`asyncio.run` mais de uma vez, use `fechar_clientes_async()` ao final de cada loop. Componentes com event loop
+próprio (ex: uma thread de serviço) devem usar um pool exclusivo: `criar_http_client_async()`,
+passado como `chat_openai(..., http_async_client=...)`.
+"""
+
+import asyncio
+import atexit
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from cliente_llm.provedores import Provedor, resolver_provedor
+
+STATUS_RETRY = {429, 500, 502, 503, 504}
+# Falhas antes de a requisição chegar ao servidor: seguras para repetir em qualquer método
+ERROS_CONEXAO = (httpx.ConnectError, httpx.ConnectTimeout)
+# RemoteProtocolError (ex: conexão keep-alive fechada pelo servidor) só é repetido em métodos idempotentes
+ERROS_RETRY = ERROS_CONEXAO + (httpx.RemoteProtocolError,)
+METODOS_IDEMPOTENTES = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def _env_float(nome: str, padrao: float) -> float:
+    valor = os.getenv(nome)
+    return float(valor) if valor else padrao
+
+
+@dataclass
+class ConfigCliente:
+    timeout: float = 120.0  # leitura/escrita (s); gerações longas sem streaming precisam de folga
+    connect_timeout: float = 10.0
+    max_retries: int = 2
+    backoff_base: float = 0.5  # espera máxima da tentativa n: base * 2^n (s)
+    backoff_max: float = 8.0
+    max_conexoes: int = 100
+    max_keepalive: int = 20
+    keepalive_expiry: float = 30.0  # conexões ociosas por mais tempo são fechadas (s)
+    http2: bool = True
+
+    @classmethod
+    def do_ambiente(cls) -> "ConfigCliente":
+        padrao = cls()
+        return cls(
+            timeout=_env_float("LLM_TIMEOUT", padrao.timeout),
+            connect_timeout=_env_float("LLM_CONNECT_TIMEOUT", padrao.connect_timeout),
+            max_retries=int(_env_float("LLM_MAX_RETRIES", padrao.max_retries)),
+            backoff_base=_env_float("LLM_BACKOFF_BASE", padrao.backoff_base),
+            backoff_max=_env_float("LLM_BACKOFF_MAX", padrao.backoff_max),
+            max_conexoes=int(_env_float("LLM_MAX_CONEXOES", padrao.max_conexoes)),
+            max_keepalive=int(_env_float("LLM_MAX_KEEPALIVE", padrao.max_keepalive)),
+            keepalive_expiry=_env_float("LLM_KEEPALIVE_EXPIRY", padrao.keepalive_expiry),
+            http2=os.getenv("LLM_HTTP2", "1").lower() not in ("0", "false", "nao", "não"),
+        )
+
+
+CONFIG = ConfigCliente.do_ambiente()
+
+
+def http2_disponivel() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def pode_repetir(request: httpx.Request, erro: Exception) -> bool:
+    """Erros de conexão sempre; os demais de `ERROS_RETRY` só quando o método é idempotente."""
+    return isinstance(erro, ERROS_CONEXAO) or request.method in METODOS_IDEMPOTENTES
+
+
+def espera_retry(tentativa: int, response: Optional[httpx.Response], config: ConfigCliente) -> float:
+    """Backoff exponencial com jitter completo; `Retry-After` (em segundos) tem prioridade quando presente."""
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), config.backoff_max)
+            except ValueError:
+                pass
+    return random.uniform(0, min(config.backoff_max, config.backoff_base * 2 ** tentativa))
+
+
+class TransporteComRetry(httpx.BaseTransport):
+    """Repete a requisição em erros de conexão e status transitórios antes de entregar a resposta ao SDK."""
+
+    def __init__(self, transporte: httpx.BaseTransport, config: ConfigCliente):
+        self.transporte = transporte
+        self.config = config
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        for tentativa in range(self.config.max_retries + 1):
+            ultima = tentativa == self.config.max_retries
+            try:
+                response = self.transporte.handle_request(request)
+            except ERROS_RETRY as erro:
+                if ultima or not pode_repetir(request, erro):
+                    raise
+                time.sleep(espera_retry(tentativa, None, self.config))
+                continue
+            if ultima or response.status_code not in STATUS_RETRY:
+                return response
+            response.close()
+            time.sleep(espera_retry(tentativa, response, self.config))
+
+    def close(self):
+        self.transporte.close()
+
+
+class TransporteComRetryAsync(httpx.AsyncBaseTransport):
+    """Versão assíncrona de `TransporteComRetry`."""
+
+    def __init__(self, transporte: httpx.AsyncBaseTransport, config: ConfigCliente):
+        self.transporte = transporte
+        self.config = config
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        for tentativa in range(self.config.max_retries + 1):
+            ultima = tentativa == self.config.max_retries
+            try:
+                response = await self.transporte.handle_async_request(request)
+            except ERROS_RETRY as erro:
+                if ultima or not pode_repetir(request, erro):
+                    raise
+                await asyncio.sleep(espera_retry(tentativa, None, self.config))
+                continue
+            if ultima or response.status_code not in STATUS_RETRY:
+                return response
+            await response.aclose()
+            await asyncio.sleep(espera_retry(tentativa, response, self.config))
+
+    async def aclose(self):
+        await self.transporte.aclose()
+
+
+def _parametros_pool(config: ConfigCliente) -> Dict:
+    return {
+        "limits": httpx.Limits(
+            max_connections=config.max_conexoes,
+            max_keepalive_connections=config.max_keepalive,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        "http2": config.http2 and http2_disponivel(),
+    }
+
+
+def _timeout(config: ConfigCliente) -> httpx.Timeout:
+    return httpx.Timeout(config.timeout, connect=config.connect_timeout)
+
+
+_lock = threading.Lock()
+_http_clientes: Dict[str, httpx.Client] = {}
+_http_clientes_async: Dict[str, httpx.AsyncClient] = {}
+_clientes: Dict[str, OpenAI] = {}
+_clientes_async: Dict[str, AsyncOpenAI] = {}
+
+
+def obter_http_client(provedor: Provedor) -> httpx.Client:
+    with _lock:
+        if provedor.nome not in _http_clientes:
+            transporte = TransporteComRetry(httpx.HTTPTransport(**_parametros_pool(CONFIG)), CONFIG)
+            _http_clientes[provedor.nome] = httpx.Client(transport=transporte, timeout=_timeout(CONFIG))
+        return _http_clientes[provedor.nome]
+
+
+def criar_http_client_async() -> httpx.AsyncClient:
+    """Pool assíncrono novo (não compartilhado), com o mesmo retry e limites; quem cria é responsável por fechar."""
+    transporte = TransporteComRetryAsync(httpx.AsyncHTTPTransport(**_parametros_pool(CONFIG)), CONFIG)
+    return httpx.AsyncClient(transport=transporte, timeout=_timeout(CONFIG))
+
+
+def obter_http_client_async(provedor: Provedor) -> httpx.AsyncClient:
+    with _lock:
+        if provedor.nome not in _http_clientes_async:
+            _http_clientes_async[provedor.nome] = criar_http_client_async()
+        return _http_clientes_async[provedor.nome]
+
+
+def obter_cliente(provedor: Optional[str] = None) -> OpenAI:
+    """OpenAI compartilhado do provedor (padrão: `LLM_PROVIDER`)."""
+    p = resolver_provedor(provedor)
+    http_client = obter_http_client(p)
+    with _lock:
+        if p.nome not in _clientes:
+            _clientes[p.nome] = OpenAI(base_url=p.base_url, api_key=p.api_key, http_client=http_client, max_retries=0)
+        return _clientes[p.nome]
+
+
+def obter_cliente_async(provedor: Optional[str] = None) -> AsyncOpenAI:
+    """AsyncOpenAI compartilhado do provedor (padrão: `LLM_PROVIDER`)."""
+    p = resolver_provedor(provedor)
+    http_client = obter_http_client_async(p)
+    with _lock:
+        if p.nome not in _clientes_async:
+            _clientes_async[p.nome] = AsyncOpenAI(
+                base_url=p.base_url, api_key=p.api_key, http_client=http_client, max_retries=0
+            )
+        return _clientes_async[p.nome]
+
+
+def chat_openai(model: str, provedor: Optional[str] = None, **kwargs):
+    """
+    ChatOpenAI (LangChain) apontando para o provedor, usando os pools compartilhados (sync e async).
+
+    `http_client`/`http_async_client` em `kwargs` substituem os pools compartilhados.
+    """
+    from langchain_openai import ChatOpenAI
+
+    p = resolver_provedor(provedor)
+    if "http_client" not in kwargs:
+        kwargs["http_client"] = obter_http_client(p)
+    if "http_async_client" not in kwargs:
+        kwargs["http_async_client"] = obter_http_client_async(p)
+    return ChatOpenAI(
+        model=model,
+        base_url=p.base_url,
+        api_key=p.api_key,
+        max_retries=0,
+        **kwargs,
+    )
+
+
+def fechar_clientes():
+    """Fecha os pools síncronos (registrado no atexit)."""
+    with _lock:
+        for http_client in _http_clientes.values():
+            http_client.close()
+        _http_clientes.clear()
+        _clientes.clear()
+
+
+async def fechar_clientes_async():
+    """Fecha os pools assíncronos; chame antes do fim do event loop que os usou."""
+    with _lock:
+        clientes = list(_http_clientes_async.values())
+        _http_clientes_async.clear()
+        _clientes_async.clear()
+    for http_client in clientes:
+        await http_client.aclose()
+
+
+atexit.register(fechar_clientes)
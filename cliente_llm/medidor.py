@@ -0,0 +1,270 @@
+"""
+Contabilidade de tokens e throughput das chamadas de chat completions.
+
+`MedidorTokens.completar(client, sessao=..., **parametros)` (ou `acompletar` com AsyncOpenAI) substitui
+`client.chat.completions.create(...)`, com ou sem streaming, e acumula por modelo e por sessão:
+requisições, tokens de prompt, de completion e de raciocínio, tempo de geração e custo (se houver preço).
+No streaming o `usage` vem no último chunk (`stream_options.include_usage` é ligado automaticamente);
+sem ele, cada chunk com conteúdo conta como um token. `envolver(client)` devolve um objeto com a mesma
+interface `chat.completions.create`, para quem recebe o cliente (ex: `CacheRespostas.completar`): só as
+chamadas que chegam ao servidor são contabilizadas.
+
+Tokens/s em janela deslizante (`janela_segundos`) por modelo. Exposição:
+- `texto_prometheus()` / `iniciar_servidor_metricas(porta)`: formato texto do Prometheus em GET /metrics;
+- `iniciar_log_periodico(intervalo)`: uma linha de log por modelo a cada intervalo.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+TIPOS_TOKEN = ["prompt", "completion", "raciocinio"]
+
+
+def _novo_acumulado() -> Dict[str, float]:
+    return {"requisicoes": 0, "erros": 0, "prompt": 0, "completion": 0, "raciocinio": 0, "segundos": 0.0, "custo": 0.0}
+
+
+def tokens_do_usage(usage) -> Tuple[int, int, int]:
+    """(prompt, completion, raciocínio) do objeto `usage` do SDK; raciocínio está incluso em completion."""
+    if usage is None:
+        return 0, 0, 0
+    detalhes = getattr(usage, "completion_tokens_details", None)
+    raciocinio = getattr(detalhes, "reasoning_tokens", None) or 0
+    return usage.prompt_tokens or 0, usage.completion_tokens or 0, raciocinio
+
+
+class MedidorTokens:
+    """
+    Acumula tokens por modelo e por sessão e calcula o throughput em janela deslizante.
+
+    Args:
+        janela_segundos: Janela do tokens/s por modelo.
+        precos: Preço por 1M de tokens por modelo, `{modelo: (entrada, saida)}` (modelos self-hosted ficam de fora).
+        relogio: Função de tempo (injetável para testes/replay).
+    """
+
+    def __init__(
+        self,
+        janela_segundos: float = 60.0,
+        precos: Optional[Dict[str, Tuple[float, float]]] = None,
+        relogio: Callable[[], float] = time.monotonic,
+    ):
+        self.janela_segundos = janela_segundos
+        self.precos = precos or {}
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self.por_modelo: Dict[str, Dict[str, float]] = defaultdict(_novo_acumulado)
+        self.por_sessao: Dict[str, Dict[str, float]] = defaultdict(_novo_acumulado)
+        # modelo -> (timestamp do fim da chamada, tokens de completion)
+        self._janela: Dict[str, Deque[Tuple[float, int]]] = defaultdict(deque)
+
+    def registrar(
+        self,
+        modelo: str,
+        prompt: int,
+        completion: int,
+        raciocinio: int = 0,
+        segundos: float = 0.0,
+        sessao: Optional[str] = None,
+        erro: bool = False,
+    ):
+        preco_entrada, preco_saida = self.precos.get(modelo, (0.0, 0.0))
+        custo = (prompt * preco_entrada + completion * preco_saida) / 1_000_000
+        agora = self._relogio()
+        with self._lock:
+            destinos = [self.por_modelo[modelo]] + ([self.por_sessao[sessao]] if sessao else [])
+            for acumulado in destinos:
+                acumulado["requisicoes"] += 1
+                acumulado["erros"] += int(erro)
+                acumulado["prompt"] += prompt
+                acumulado["completion"] += completion
+                acumulado["raciocinio"] += raciocinio
+                acumulado["segundos"] += segundos
+                acumulado["custo"] += custo
+            self._janela[modelo].append((agora, completion))
+            self._descartar_antigos(modelo, agora)
+
+    def tokens_por_segundo(self, modelo: str) -> float:
+        """Tokens de completion por segundo na janela deslizante (soma de todas as requisições concorrentes)."""
+        agora = self._relogio()
+        with self._lock:
+            self._descartar_antigos(modelo, agora)
+            amostras = self._janela.get(modelo)
+            if not amostras:
+                return 0.0
+            return sum(tokens for _, tokens in amostras) / self.janela_segundos
+
+    def _descartar_antigos(self, modelo: str, agora: float):
+        amostras = self._janela[modelo]
+        while amostras and agora - amostras[0][0] > self.janela_segundos:
+            amostras.popleft()
+
+    def completar(self, client, sessao: Optional[str] = None, **parametros):
+        """`client.chat.completions.create(**parametros)` com contabilidade; com stream=True devolve um iterador."""
+        modelo = parametros.get("model", "")
+        if parametros.get("stream"):
+            parametros.setdefault("stream_options", {"include_usage": True})
+        inicio = time.perf_counter()
+        try:
+            resposta = client.chat.completions.create(**parametros)
+        except Exception:
+            self.registrar(modelo, 0, 0, segundos=time.perf_counter() - inicio, sessao=sessao, erro=True)
+            raise
+        if parametros.get("stream"):
+            return self._medir_stream(resposta, modelo, sessao, inicio)
+        self.registrar(modelo, *tokens_do_usage(resposta.usage), segundos=time.perf_counter() - inicio, sessao=sessao)
+        return resposta
+
+    async def acompletar(self, client, sessao: Optional[str] = None, **parametros):
+        """Versão assíncrona de `completar` (AsyncOpenAI); com stream=True devolve um iterador assíncrono."""
+        modelo = parametros.get("model", "")
+        if parametros.get("stream"):
+            parametros.setdefault("stream_options", {"include_usage": True})
+        inicio = time.perf_counter()
+        try:
+            resposta = await client.chat.completions.create(**parametros)
+        except Exception:
+            self.registrar(modelo, 0, 0, segundos=time.perf_counter() - inicio, sessao=sessao, erro=True)
+            raise
+        if parametros.get("stream"):
+            return self._medir_stream_async(resposta, modelo, sessao, inicio)
+        self.registrar(modelo, *tokens_do_usage(resposta.usage), segundos=time.perf_counter() - inicio, sessao=sessao)
+        return resposta
+
+    def envolver(self, client, sessao: Optional[str] = None):
+        """`client` com `chat.completions.create` contabilizado neste medidor (OpenAI ou AsyncOpenAI)."""
+        assincrono = inspect.iscoroutinefunction(client.chat.completions.create)
+        create = functools.partial(self.acompletar if assincrono else self.completar, client, sessao)
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    def _medir_stream(self, stream, modelo: str, sessao: Optional[str], inicio: float) -> Iterator:
+        usage, chunks, erro = None, 0, False
+        try:
+            for chunk in stream:
+                usage = chunk.usage or usage
+                chunks += self._conta_chunk(chunk)
+                yield chunk
+        except Exception:
+            erro = True
+            raise
+        finally:
+            self._registrar_stream(modelo, usage, chunks, time.perf_counter() - inicio, sessao, erro)
+
+    async def _medir_stream_async(self, stream, modelo: str, sessao: Optional[str], inicio: float):
+        usage, chunks, erro = None, 0, False
+        try:
+            async for chunk in stream:
+                usage = chunk.usage or usage
+                chunks += self._conta_chunk(chunk)
+                yield chunk
+        except Exception:
+            erro = True
+            raise
+        finally:
+            self._registrar_stream(modelo, usage, chunks, time.perf_counter() - inicio, sessao, erro)
+
+    @staticmethod
+    def _conta_chunk(chunk) -> int:
+        if not chunk.choices:
+            return 0
+        delta = chunk.choices[0].delta
+        return int(bool(delta.content or getattr(delta, "reasoning_content", None)))
+
+    def _registrar_stream(self, modelo, usage, chunks: int, segundos: float, sessao, erro: bool):
+        if usage is not None:
+            self.registrar(modelo, *tokens_do_usage(usage), segundos=segundos, sessao=sessao, erro=erro)
+        else:
+            # Servidor sem include_usage (ou stream interrompido): chunks com conteúdo como aproximação
+            self.registrar(modelo, 0, chunks, segundos=segundos, sessao=sessao, erro=erro)
+
+    def resumo(self) -> Dict[str, Dict]:
+        """Cópia dos acumulados por modelo (com tokens/s na janela) e por sessão."""
+        modelos = list(self.por_modelo)
+        tps = {modelo: self.tokens_por_segundo(modelo) for modelo in modelos}
+        with self._lock:
+            return {
+                "modelos": {m: {**self.por_modelo[m], "tokens_por_segundo": tps[m]} for m in modelos},
+                "sessoes": {s: dict(a) for s, a in self.por_sessao.items()},
+            }
+
+    def texto_prometheus(self, incluir_sessoes: bool = False) -> str:
+        """Métricas no formato texto do Prometheus (sessões desligadas por padrão: cardinalidade alta)."""
+        resumo = self.resumo()
+        linhas: List[str] = []
+
+        def metrica(nome: str, tipo: str, ajuda: str, valores: List[Tuple[str, float]]):
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for rotulos, valor in valores:
+                linhas.append(f"{nome}{{{rotulos}}} {valor}")
+
+        def rotulo(valor: str) -> str:
+            return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        modelos = resumo["modelos"]
+        metrica("llm_requisicoes_total", "counter", "Chamadas de chat completions",
+                [(f'modelo="{rotulo(m)}"', a["requisicoes"]) for m, a in modelos.items()])
+        metrica("llm_erros_total", "counter", "Chamadas que terminaram em erro",
+                [(f'modelo="{rotulo(m)}"', a["erros"]) for m, a in modelos.items()])
+        metrica("llm_tokens_total", "counter", "Tokens por tipo (raciocinio esta incluso em completion)",
+                [(f'modelo="{rotulo(m)}",tipo="{t}"', a[t]) for m, a in modelos.items() for t in TIPOS_TOKEN])
+        metrica("llm_segundos_total", "counter", "Tempo total das chamadas",
+                [(f'modelo="{rotulo(m)}"', a["segundos"]) for m, a in modelos.items()])
+        metrica("llm_custo_total", "counter", "Custo estimado pelos precos configurados",
+                [(f'modelo="{rotulo(m)}"', a["custo"]) for m, a in modelos.items()])
+        metrica("llm_tokens_por_segundo", "gauge", f"Tokens de completion por segundo (janela de {self.janela_segundos:g}s)",
+                [(f'modelo="{rotulo(m)}"', a["tokens_por_segundo"]) for m, a in modelos.items()])
+        if incluir_sessoes:
+            metrica("llm_sessao_tokens_total", "counter", "Tokens por sessao e tipo",
+                    [(f'sessao="{rotulo(s)}",tipo="{t}"', a[t]) for s, a in resumo["sessoes"].items() for t in TIPOS_TOKEN])
+        return "\n".join(linhas) + "\n"
+
+    def linhas_log(self) -> List[str]:
+        return [
+            f"[medidor] {m}: {a['requisicoes']} req ({a['erros']} erros) | prompt {a['prompt']} | "
+            f"completion {a['completion']} (raciocínio {a['raciocinio']}) | {a['tokens_por_segundo']:.1f} tokens/s"
+            + (f" | custo ${a['custo']:.6f}" if a["custo"] else "")
+            for m, a in self.resumo()["modelos"].items()
+        ]
+
+    def iniciar_servidor_metricas(self, host: str = "127.0.0.1", porta: int = 9464, incluir_sessoes: bool = False):
+        """Serve GET /metrics em uma thread daemon; retorna o servidor (use `shutdown()` para parar)."""
+        medidor = self
+
+        class HandlerMetricas(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                corpo = medidor.texto_prometheus(incluir_sessoes).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, format, *args):
+                pass
+
+        servidor = ThreadingHTTPServer((host, porta), HandlerMetricas)
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        return servidor
+
+    def iniciar_log_periodico(self, intervalo: float = 60.0, log: Callable[[str], None] = print) -> threading.Event:
+        """Escreve `linhas_log()` a cada `intervalo` segundos em uma thread daemon; `set()` no evento retornado para."""
+        parar = threading.Event()
+
+        def loop():
+            while not parar.wait(intervalo):
+                for linha in self.linhas_log():
+                    log(linha)
+
+        threading.Thread(target=loop, daemon=True).start()
+        return parar
@@ -0,0 +1,48 @@
+"""
+Provedores OpenAI-compatible e seleção pelo ambiente.
+
+`LLM_PROVIDER` escolhe o provedor (padrão: lmstudio). `LLM_BASE_URL` e `LLM_API_KEY`, se definidas,
+sobrescrevem a URL e a chave do provedor escolhido.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class Provedor:
+    nome: str
+    base_url: Optional[str]  # None = api.openai.com
+    api_key: str
+
+
+# nome -> (variável da URL, URL padrão, variável da chave, chave padrão)
+PROVEDORES: Dict[str, tuple] = {
+    "lmstudio": ("LMSTUDIO_BASE_URL", "http://localhost:1234/v1", "LMSTUDIO_API_KEY", "lm-studio"),
+    "openai": (None, None, "OPENAI_API_KEY", None),
+    # AWS Bedrock (ex: https://bedrock-runtime.us-east-1.api.aws/v1)
+    "bedrock": ("AWS_BEDROCK_BASE_URL", None, "AWS_BEARER_TOKEN_BEDROCK", None),
+    # Microsoft Foundry (o modelo é o nome do deployment)
+    "foundry": ("AZURE_FOUNDRY_BASE_URL", None, "AZURE_FOUNDRY_API_KEY", None),
+    # Lite LLM (proxy local)
+    "litellm": ("LITELLM_BASE_URL", "http://0.0.0.0:4000", "LITELLM_API_KEY", "litellm"),
+}
+
+PROVEDOR_PADRAO = "lmstudio"
+
+
+def resolver_provedor(nome: Optional[str] = None) -> Provedor:
+    """Monta o provedor `nome` (ou `LLM_PROVIDER`) a partir das variáveis de ambiente."""
+    nome = (nome or os.getenv("LLM_PROVIDER") or PROVEDOR_PADRAO).lower()
+    if nome not in PROVEDORES:
+        raise ValueError(f"Provedor desconhecido: {nome}. Opções: {', '.join(PROVEDORES)}")
+
+    var_url, url_padrao, var_chave, chave_padrao = PROVEDORES[nome]
+    base_url = os.getenv("LLM_BASE_URL") or (os.getenv(var_url) if var_url else None) or url_padrao
+    api_key = os.getenv("LLM_API_KEY") or os.getenv(var_chave) or chave_padrao
+    if nome in ("bedrock", "foundry") and not base_url:
+        raise ValueError(f"Defina {var_url} (ou LLM_BASE_URL) para usar o provedor {nome}")
+    if not api_key:
+        raise ValueError(f"Defina {var_chave} (ou LLM_API_KEY) para usar o provedor {nome}")
+    return Provedor(nome=nome, base_url=base_url, api_key=api_key)
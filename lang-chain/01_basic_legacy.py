@@ -27,7 +27,8 @@ import os
 from dotenv import load_dotenv
 from langchain_classic.chains.conversation.base import ConversationChain
 from langchain_classic.memory import ConversationSummaryMemory, ConversationBufferWindowMemory, ConversationBufferMemory
-from langchain_openai import ChatOpenAI
+
+from cliente_llm import chat_openai
 
 # Carrega variável OPENAI_API_KEY do .env (se existir)
 load_dotenv()
@@ -50,10 +51,7 @@ def criar_conversation_chain(
     """
 
     # Inicializa o LLM
-    if model_name:
-        llm = ChatOpenAI(model=model_name, temperature=temperature, base_url="http://localhost:1234/v1")
-    else:
-        llm = ChatOpenAI(temperature=temperature, base_url="http://localhost:1234/v1")
+    llm = chat_openai(model_name or "gpt-3.5-turbo", "lmstudio", temperature=temperature)
 
     # Seleciona tipo de memória
     if memory_type == "summary":
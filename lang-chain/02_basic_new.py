@@ -1,30 +1,39 @@
 """
 Exemplo mínimo de uso de RunnableWithMessageHistory (LangChain) em Python.
-- Usa InMemoryChatMessageHistory para persistir histórico por `session_id`.
+- Persiste o histórico por `session_id` no SessionStore (memória com LRU/TTL + SQLite, ver session_store.py).
 - Envia mensagens para ChatOpenAI (requere `OPENAI_API_KEY`).
+- Com STREAMING, a resposta é impressa token a token (`with_history.stream`/`astream`) e gravada no histórico
+  uma vez, ao fim do stream; o exemplo imprime o TTFT e a latência da resposta completa de cada turno.
+- `asend_message` é a versão assíncrona (`ainvoke`): várias conversas no mesmo processo/event loop.
+  Com SIMULAR_SESSOES_CONCORRENTES, o exemplo simula SESSOES_SIMULADAS usuários (session_driver.py) e
+  compara sessões/s e latência por turno com uma conversa por vez e com todas em paralelo.
 
 Como usar:
 1) pip install -U langchain-core langchain-openai openai
 2) export OPENAI_API_KEY="sua_chave"
 3) python exemplo_langchain_runnable_with_history.py
 
-Observação: este é um exemplo didático. Em produção troque InMemoryChatMessageHistory
-por uma implementação persistente (Redis, Postgres, etc.).
+Observação: este é um exemplo didático. O SessionStore grava em um arquivo SQLite local; com vários
+processos/servidores, troque por um backend compartilhado (Redis, Postgres, etc.).
 """
 
+import asyncio
 import os
-from typing import Dict
+import time
 
 from langchain_core.runnables import RunnableConfig
-# Model / integração OpenAI
-from langchain_openai import ChatOpenAI
+# Model / integração OpenAI (cliente compartilhado, ver cliente_llm)
+from cliente_llm import chat_openai, fechar_clientes_async
 
 # Prompts e mensagens
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 
-# Histórico de chat (in-memory para exemplo)
-from langchain_core.chat_history import InMemoryChatMessageHistory
+# Histórico de chat: sessões quentes em memória, persistidas em SQLite
+from counted_history import CountedChatMessageHistory
+from session_store import SessionStore, print_stats
+from session_driver import print_results, run_sessions
+from streaming import aconsume_stream, consume_stream
 
 # Runnable com suporte a histórico
 from langchain_core.runnables.history import RunnableWithMessageHistory
@@ -32,6 +41,13 @@ from langchain_core.runnables.history import RunnableWithMessageHistory
 # ---------- Configurações ----------
 MODEL_NAME = "openai/gpt-oss-20b" # os.environ.get("LLM_MODEL", "gpt-4o-mini")
 
+# Imprime a resposta à medida que os tokens chegam (em vez de esperar a resposta completa)
+STREAMING = True
+
+# Ao final, simula usuários concorrentes com a versão assíncrona
+SIMULAR_SESSOES_CONCORRENTES = True
+SESSOES_SIMULADAS = 8
+
 # ---------- Prompt (inclui placeholder para histórico) ----------
 prompt = ChatPromptTemplate.from_messages(
     [
@@ -43,17 +59,16 @@ prompt = ChatPromptTemplate.from_messages(
 
 # ---------- Runnable (prompt |> modelo) ----------
 # O operador '|' compõe runnables (prompt -> modelo)
-llm = ChatOpenAI(model=MODEL_NAME, temperature=0.0, base_url="http://localhost:1234/v1")
+llm = chat_openai(MODEL_NAME, "lmstudio", temperature=0.0)
 chain = prompt | llm
 
 # ---------- Fábrica de histórico baseada em session_id (store simples) ----------
-_store: Dict[str, InMemoryChatMessageHistory] = {}
+ARQUIVO_SESSOES = "sessoes.sqlite3"
+_store = SessionStore(ARQUIVO_SESSOES, max_sessions=1_000, idle_ttl=1800)
 
-def get_history_by_session_id(session_id: str) -> InMemoryChatMessageHistory:
+def get_history_by_session_id(session_id: str) -> CountedChatMessageHistory:
     """Retorna (ou cria) um histórico para a session_id informada."""
-    if session_id not in _store:
-        _store[session_id] = InMemoryChatMessageHistory()
-    return _store[session_id]
+    return _store.get(session_id)
 
 # ---------- Envolvendo a chain com RunnableWithMessageHistory ----------
 with_history = RunnableWithMessageHistory(
@@ -67,19 +82,53 @@ with_history = RunnableWithMessageHistory(
 
 # ---------- Função utilitária para conversar por sessão ----------
 
-def send_message(session_id: str, user_text: str):
+def send_message(session_id: str, user_text: str, stream: bool = STREAMING):
     """Envia uma mensagem para a chain com histórico e retorna a resposta."""
     print("============= SEND MESSAGE =============")
     print(f"[session_id={session_id}] Você: {user_text}")
-    response = with_history.invoke(
-        {"input": user_text},
-        config=RunnableConfig(configurable={"session_id": session_id}),
-    )
-    # A resposta pode vir como string ou BaseMessage dependendo do runnable
-    # Normalmente ChatOpenAI retorna uma string tratável como AI message
-    print("Resposta crua do Runnable:", response)
-
-    # Para inspecionar o histórico salvo:
+    config = RunnableConfig(configurable={"session_id": session_id})
+    if stream:
+        start_time = time.perf_counter()
+        print("Assistente: ", end="", flush=True)
+        # O histórico recebe a resposta completa (soma dos chunks) quando o stream termina
+        response, ttft = consume_stream(with_history.stream({"input": user_text}, config=config), start_time)
+        print(f"(TTFT {ttft:.2f}s | resposta completa {time.perf_counter() - start_time:.2f}s)")
+    else:
+        response = with_history.invoke({"input": user_text}, config=config)
+        # A resposta pode vir como string ou BaseMessage dependendo do runnable
+        # Normalmente ChatOpenAI retorna uma string tratável como AI message
+        print("Resposta crua do Runnable:", response)
+
+    print_history(session_id)
+    return response
+
+
+async def asend_message(session_id: str, user_text: str, verbose: bool = True, stream: bool = STREAMING):
+    """Versão assíncrona de `send_message`: não bloqueia o event loop enquanto o modelo responde."""
+    if verbose:
+        print("============= SEND MESSAGE =============")
+        print(f"[session_id={session_id}] Você: {user_text}")
+    # Sessão fria carregada do SQLite fora do event loop; a fábrica de histórico (síncrona) só encontra sessão quente
+    await _store.aget(session_id)
+    config = RunnableConfig(configurable={"session_id": session_id})
+    if stream:
+        start_time = time.perf_counter()
+        if verbose:
+            print("Assistente: ", end="", flush=True)
+        response, ttft = await aconsume_stream(with_history.astream({"input": user_text}, config=config), start_time, verbose)
+        if verbose:
+            print(f"(TTFT {ttft:.2f}s | resposta completa {time.perf_counter() - start_time:.2f}s)")
+    else:
+        response = await with_history.ainvoke({"input": user_text}, config=config)
+        if verbose:
+            print("Resposta crua do Runnable:", response)
+    if verbose:
+        print_history(session_id)
+    return response
+
+
+def print_history(session_id: str):
+    """Para inspecionar o histórico salvo."""
     history = get_history_by_session_id(session_id)
     print("--- Histórico armazenado (mensagens) ---")
     for m in history.messages:
@@ -87,7 +136,32 @@ def send_message(session_id: str, user_text: str):
         print(f"[{who}] {m.content}")
     print("---------------------------------------\n")
 
-    return response
+
+# ---------- Simulação de sessões concorrentes ----------
+
+LOAD_QUESTIONS = [
+    "Olá, qual é a capital do Brasil?",
+    "e de Santa Catarina?",
+    "e do Paraná?",
+    "Resuma em uma frase as respostas anteriores.",
+]
+
+
+async def simulate_concurrent_sessions(n_sessions: int = SESSOES_SIMULADAS):
+    """Mesmas conversas com uma sessão por vez (linha de base) e com todas em paralelo."""
+    results = []
+    for concurrency in (1, n_sessions):
+        results.append(await run_sessions(
+            lambda session_id, text: asend_message(session_id, text, verbose=False),
+            LOAD_QUESTIONS,
+            n_sessions=n_sessions,
+            max_concurrency=concurrency,
+            session_prefix=f"carga-c{concurrency}",
+            reset=lambda session_id: get_history_by_session_id(session_id).clear(),
+        ))
+    print_results(results)
+    # O pool assíncrono fica preso a este event loop
+    await fechar_clientes_async()
 
 
 # ---------- Pequeno loop de demonstração ----------
@@ -104,4 +178,10 @@ if __name__ == "__main__":
     sess2 = "outra-sessao"
     send_message(sess2, "Me diga uma curiosidade sobre cachorros.")
 
-    print("Fim do exemplo. \nPara produção: troque InMemoryChatMessageHistory por um backend persistente.")
+    if SIMULAR_SESSOES_CONCORRENTES:
+        print()
+        asyncio.run(simulate_concurrent_sessions())
+
+    print_stats(_store.stats())
+    _store.close()
+    print("Fim do exemplo. \nAs sessões ficam em", ARQUIVO_SESSOES, "e são recarregadas na próxima execução.")
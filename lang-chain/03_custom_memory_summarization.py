@@ -1,49 +1,150 @@
 """
 Exemplo com RunnableWithMessageHistory e sumarização recursiva do histórico.
-- A cada 20 mensagens, sumariza as 10 mais antigas e substitui por um resumo (5 do usuário + 5 do assistente).
-- Mantém as outras 10 mensagens mais recentes do histórico para detalhes.
+- Quando o histórico passa de ORCAMENTO_TOKENS_HISTORICO tokens, sumariza as mensagens mais antigas e substitui
+  por um resumo, escolhendo quantas resumir para voltar a ALVO_TOKENS_HISTORICO (o tamanho do prompt é o que
+  define o custo e a latência do prefill, não o número de mensagens).
+- Mantém as mensagens mais recentes do histórico (no mínimo MIN_MENSAGENS_RECENTES) para detalhes.
+- Os tokens de cada sessão são contados localmente (tiktoken, ver token_counter.py). O histórico
+  (CountedChatMessageHistory) mantém contadores e tokens incrementalmente, e a compactação é uma única
+  substituição do prefixo resumido: o trabalho por turno não cresce com o tamanho da conversa.
+- Com SUMARIZACAO_EM_BACKGROUND, a sumarização roda depois que a resposta é entregue e o resumo é trocado
+  no histórico de forma atômica; o turno seguinte já usa o histórico compactado, sem esperar as chamadas de
+  sumarização. Os pedidos de todas as sessões passam por um serviço único (summarization_service.py): chain
+  montada uma vez, fila com prioridade para quem tem mais tokens acima do alvo e no máximo
+  SUMARIZACOES_SIMULTANEAS chamadas simultâneas (cada vaga que abre pega o próximo job da fila).
+- Com MEMORIA_HIERARQUICA, cada trecho compactado vira uma folha de uma árvore de resumos (summary_tree.py),
+  fundida em níveis acima só quando um nível enche (custo de sumarização logarítmico no tamanho da conversa).
+  A cada turno entram no prompt só os nós mais relevantes para a pergunta (embeddings), em vez de um resumo
+  único que cresce e é reenviado a cada compactação. A árvore é gravada no mesmo SQLite das sessões e
+  carregada/despejada junto do histórico (que, compactado, não guarda mais os resumos).
+- Com ARQUIVO_LONGO_PRAZO, as mensagens originais compactadas são arquivadas em um índice FAISS por sessão
+  (message_archive.py, cosseno como em similarity-search/similarity_faiss_cosine.py) e os RAG_TOP_K turnos
+  antigos mais relevantes para a pergunta voltam ao prompt junto da janela recente: prompt curto sem perder
+  detalhes antigos. O embedding da pergunta é calculado uma vez por turno e serve à árvore e ao índice.
+  Turnos e vetores são gravados no SQLite das sessões; na carga fria o índice é refeito dos vetores gravados.
+- POLITICA_COMPACTACAO = "prefixo_estavel" preserva o cache de prefixo (KV cache) do servidor: o system prompt
+  e os resumos já gravados não mudam entre turnos; cada compactação acrescenta um novo segmento de resumo
+  depois dos anteriores (em vez de reescrever o resumo do início) e desce até ALVO_TOKENS_PREFIXO_ESTAVEL,
+  passos maiores e menos frequentes. Os segmentos só são fundidos ao passar de ORCAMENTO_TOKENS_RESUMOS.
+  A política vale para os resumos que ficam no histórico (com MEMORIA_HIERARQUICA eles vão para a árvore).
+  Com COMPARAR_POLITICAS_COMPACTACAO, o exemplo mede o TTFT por turno nas duas políticas, com os resumos no
+  histórico; para ver o efeito sem GPU, use o servidor mock no lugar do LM Studio:
+      python ../benchmark/servidor_mock.py --porta 1234 --cache-prefixo --prefill-tokens-por-segundo 500
+- Com STREAMING, a resposta é impressa token a token (`with_history.stream`/`astream`); o histórico recebe a
+  resposta completa uma única vez, ao fim do stream. TTFT (primeiro token visível) e latência da resposta
+  completa são medidos separadamente.
+- `asend_message` é a versão assíncrona do turno (`ainvoke`, histórico com `aget_messages`/`aadd_messages` em
+  memória, carga fria do SQLite e embeddings fora do event loop): um processo atende várias conversas.
 
 Como usar:
 1) pip install -U langchain-core langchain-openai openai
+   (com MEMORIA_HIERARQUICA ou ARQUIVO_LONGO_PRAZO: pip install -U numpy sentence-transformers faiss-cpu)
 2) export OPENAI_API_KEY="sua_chave"
 3) python exemplo_langchain_runnable_with_history.py
 """
 
+import asyncio
 import os
-from typing import Dict, List
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Dict, List, Tuple
 
 from langchain_core.runnables import RunnableConfig
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage, SystemMessage
-from langchain_core.chat_history import InMemoryChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
 
+from cliente_llm import chat_openai, criar_http_client_async, fechar_clientes_async
+from counted_history import CountedChatMessageHistory
+from session_driver import print_results, run_sessions
+from session_store import SessionStore, print_stats
+from streaming import aconsume_stream, consume_stream
+from latency_stats import percentile
+from summarization_service import SummarizationService, print_stats as print_summarization_stats
+
 # ---------- Configurações ----------
 MODEL_NAME = "openai/gpt-oss-20b"  # os.environ.get("LLM_MODEL", "gpt-4o-mini")
 
-SUMARIZE_AFTER_MESSAGES = 20  # número total de mensagens (10 usuário + 10 assistente) para acionar sumarização
-MESSAGES_TO_SUMMARIZE = 10  # número de mensagens mais antigas a serem resumidas (5 usuário + 5 assistente)
+ORCAMENTO_TOKENS_HISTORICO = 600  # tokens do histórico que acionam a sumarização
+ALVO_TOKENS_HISTORICO = 300  # tamanho aproximado do histórico depois da compactação (resumo incluso)
+TOKENS_RESUMO_ESTIMADOS = 120  # estimativa do tamanho do resumo, usada para escolher quanto resumir
+MIN_MENSAGENS_RECENTES = 4  # mensagens mais recentes que nunca entram no resumo
+
+# "reescrita": o resumo do início é refeito a cada compactação (invalida o cache de prefixo do servidor)
+# "prefixo_estavel": novos resumos são acrescentados após os anteriores, com compactações maiores e mais raras
+POLITICA_COMPACTACAO = "prefixo_estavel"
+ALVO_TOKENS_PREFIXO_ESTAVEL = 150  # alvo depois da compactação no prefixo estável (sem contar os resumos)
+ORCAMENTO_TOKENS_RESUMOS = 400  # acima disso, os segmentos de resumo são fundidos em um só
+# Ao final do exemplo, repete a conversa nas duas políticas (sumarização síncrona, resumos no histórico) e compara o TTFT
+COMPARAR_POLITICAS_COMPACTACAO = True
+# Ao final do exemplo, simula SESSOES_SIMULADAS usuários concorrentes com `asend_message` (session_driver.py)
+SIMULAR_SESSOES_CONCORRENTES = True
+SESSOES_SIMULADAS = 8
+
+# Sumariza fora do caminho da requisição (após a resposta), em vez de antes do invoke do turno
+SUMARIZACAO_EM_BACKGROUND = True
+SUMARIZACOES_SIMULTANEAS = 4  # chamadas de sumarização em paralelo no servidor (todas as sessões)
+# Ao final do exemplo, repete a conversa nos dois modos (sem imprimir o histórico) e compara a latência por turno
+COMPARAR_MODOS_SUMARIZACAO = True
+
+# Imprime a resposta à medida que os tokens chegam (em vez de esperar a resposta completa)
+STREAMING = True
+
+# Sessões: até MAX_SESSOES_EM_MEMORIA quentes (LRU + TTL de ociosidade), todas persistidas em SQLite
+ARQUIVO_SESSOES = "sessoes.sqlite3"
+MAX_SESSOES_EM_MEMORIA = 1_000
+TTL_OCIOSO_SEGUNDOS = 1800
+
+# Memória hierárquica: resumos por trecho em árvore (fusão a cada FANOUT_MEMORIA nós por nível);
+# MEMORIA_TOP_K nós recuperados por turno. Desligada: um único resumo acumulado no início do histórico.
+MEMORIA_HIERARQUICA = True
+FANOUT_MEMORIA = 4
+MEMORIA_TOP_K = 3
+
+# Mensagens originais compactadas arquivadas em índice vetorial; RAG_TOP_K turnos recuperados por turno
+ARQUIVO_LONGO_PRAZO = True
+RAG_TOP_K = 3
+RAG_SCORE_MINIMO = 0.35  # similaridade de cosseno mínima para um turno antigo entrar no prompt
+
+# numpy, sentence-transformers e faiss só são necessários (e importados) com a memória de longo prazo ligada
+if MEMORIA_HIERARQUICA or ARQUIVO_LONGO_PRAZO:
+    from embeddings import encode
+if MEMORIA_HIERARQUICA:
+    from summary_tree import SummaryTree, SummaryTreeExtra
+if ARQUIVO_LONGO_PRAZO:
+    from message_archive import MessageArchive, MessageArchiveExtra
 
 # ---------- Prompt base ----------
 prompt = ChatPromptTemplate.from_messages(
     [
         ("system", "Você é um assistente de conversa para uma aplicação que simula em chat com Gen AI."),
         MessagesPlaceholder("history"),
-        ("human", "{input}"),
+        # Resumos e turnos antigos recuperados da memória variam por turno: entram como contexto dentro do turno do
+        # usuário (depois do histórico, sem quebrar o cache de prefixo). Uma mensagem de sistema no meio da conversa
+        # é rejeitada pelo chat template de vários modelos locais (ex: Qwen e Llama no LM Studio).
+        ("human", "{memoria}{input}"),
     ]
-)
+).partial(memoria="")
 
-llm = ChatOpenAI(model=MODEL_NAME, temperature=0.0, base_url="http://localhost:1234/v1")
+llm = chat_openai(MODEL_NAME, "lmstudio", temperature=0.0)
 chain = prompt | llm
 
-_store: Dict[str, InMemoryChatMessageHistory] = {}
+# A árvore de resumos e o arquivo de mensagens de cada sessão ficam no mesmo SQLite e no mesmo ciclo de vida
+# do histórico (a fusão de resumos só é resolvida na carga, quando `merge_summaries` já existe)
+_extras = []
+if MEMORIA_HIERARQUICA:
+    _extras.append(SummaryTreeExtra(lambda: SummaryTree(merge_summaries, fanout=FANOUT_MEMORIA)))
+if ARQUIVO_LONGO_PRAZO:
+    _extras.append(MessageArchiveExtra())
+_store = SessionStore(ARQUIVO_SESSOES, max_sessions=MAX_SESSOES_EM_MEMORIA, idle_ttl=TTL_OCIOSO_SEGUNDOS,
+                      extras=_extras)
 
 
-def get_history_by_session_id(session_id: str) -> InMemoryChatMessageHistory:
-    if session_id not in _store:
-        _store[session_id] = InMemoryChatMessageHistory()
-    return _store[session_id]
+def get_history_by_session_id(session_id: str) -> CountedChatMessageHistory:
+    return _store.get(session_id)
 
 
 with_history = RunnableWithMessageHistory(
@@ -56,8 +157,45 @@ with_history = RunnableWithMessageHistory(
 
 # ---------- Função de sumarização ----------
 
-def summarize_messages(messages: List[BaseMessage]) -> str:
-    """Gera um resumo textual das mensagens fornecidas."""
+# Chains de sumarização montadas uma vez (o texto a resumir entra como variável, não no template)
+summary_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", "Você está sendo utilizado para comprimir a parte inicial das mensagens de um chat.\n"
+                   "Você deve resumir o texto, mas preservar detalhes importantes, como nomes, datas, fatos.\n"
+                   "O objetivo é utilizar esse resumo para manter o contexto da conversa, mas economizar tokens.\n\n"
+                   "**Regras**:\n" \
+                   "- Preserve o idioma original do texto.\n"
+                   f"- Quando o histórico passa de {ORCAMENTO_TOKENS_HISTORICO} tokens, as mensagens mais antigas são compactadas em um resumo.\n"
+                   f"- Você pode estar resumindo novas mensagens, e um resumo anterior já existente. O resultado deve agregar ambos em um novo resumo.\n"
+                   f"- Sua resposta não precisa citar que é um resumo, apenas gere o conteúdo."),
+        ("human", "{conversa}"),
+    ]
+)
+# O serviço de sumarização roda as chains no event loop da própria thread: pool assíncrono exclusivo,
+# separado do pool compartilhado usado pelos turnos (ex: `asend_message` no event loop principal)
+summary_llm = chat_openai(MODEL_NAME, "lmstudio", temperature=0.0, http_async_client=criar_http_client_async())
+summary_chain = summary_prompt | summary_llm
+
+merge_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", "Você recebe resumos de partes consecutivas de um chat, do mais antigo ao mais recente.\n"
+                   "Junte todos em um único resumo, preservando detalhes importantes, como nomes, datas, fatos.\n\n"
+                   "**Regras**:\n"
+                   "- Preserve o idioma original do texto.\n"
+                   "- Mantenha a ordem cronológica e não repita informações.\n"
+                   "- Sua resposta não precisa citar que é um resumo, apenas gere o conteúdo."),
+        ("human", "{resumos}"),
+    ]
+)
+merge_chain = merge_prompt | summary_llm
+
+
+def _summary_text(summary) -> str:
+    return summary.content if isinstance(summary, AIMessage) else str(summary)
+
+
+def summary_inputs(messages: List[BaseMessage]) -> Dict[str, str]:
+    """Entrada da `summary_chain` para as mensagens fornecidas."""
     text_parts = []
     for m in messages:
         if hasattr(m, "is_resume") and m.is_resume:
@@ -69,116 +207,640 @@ def summarize_messages(messages: List[BaseMessage]) -> str:
             who = "user" if isinstance(m, HumanMessage) else "assistant"
             text_parts.append(f"{who}: {m.content}")
 
-    join_text = "\n".join(text_parts)
-    summary_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", "Você está sendo utilizado para comprimir a parte inicial das mensagens de um chat.\n"
-                       "Você deve resumir o texto, mas preservar detalhes importantes, como nomes, datas, fatos.\n"
-                       "O objetivo é utilizar esse resumo para manter o contexto da conversa, mas economizar tokens.\n\n"
-                       "**Regras**:\n" \
-                       "- Preserve o idioma original do texto.\n"
-                       f"- A cada {SUMARIZE_AFTER_MESSAGES} mensagens, são compactadas as {MESSAGES_TO_SUMMARIZE} mais antigas em um resumo.\n"
-                       f"- Você pode estar resumindo novas mensagens, e um resumo anterior já existente. O resultado deve agregar ambos em um novo resumo.\n"
-                       f"- Sua resposta não precisa citar que é um resumo, apenas gere o conteúdo."),
-            ("human", join_text),
-        ]
-    )
-    summary_chain = summary_prompt | llm
-    summary = summary_chain.invoke({})
-    return summary.content if isinstance(summary, AIMessage) else str(summary)
+    return {"conversa": "\n".join(text_parts)}
+
+
+def summarize_messages(messages: List[BaseMessage]) -> str:
+    """Gera um resumo textual das mensagens fornecidas."""
+    return _summary_text(summary_chain.invoke(summary_inputs(messages)))
+
+
+def merge_inputs(texts: List[str]) -> Dict[str, str]:
+    """Entrada da `merge_chain` para resumos consecutivos (do mais antigo ao mais recente)."""
+    return {"resumos": "\n\n".join(f"### Resumo {i}\n\n{text}" for i, text in enumerate(texts, start=1))}
+
+
+def merge_summaries(texts: List[str]) -> str:
+    """Funde resumos consecutivos (do mais antigo ao mais recente) em um único resumo."""
+    return _summary_text(merge_chain.invoke(merge_inputs(texts)))
+
+
+# ---------- Memória hierárquica ----------
+
+# Tempo de montagem do bloco de memória por turno (embedding da pergunta + buscas)
+_memory_latencies: List[float] = []
+
+
+def get_summary_tree(session_id: str) -> "SummaryTree":
+    return _store.get_extra(session_id, SummaryTreeExtra.name)
+
+
+def get_archive(session_id: str) -> "MessageArchive":
+    return _store.get_extra(session_id, MessageArchiveExtra.name)
+
+
+def _memory_context(session_id: str, user_text: str) -> str:
+    """
+    Resumos e turnos antigos mais relevantes para a pergunta, como prefixo do turno do usuário.
+
+    Vazio até a primeira compactação; senão termina em "Pergunta atual: ", seguido pela pergunta no template.
+    """
+    tree = get_summary_tree(session_id) if MEMORIA_HIERARQUICA else None
+    archive = get_archive(session_id) if ARQUIVO_LONGO_PRAZO else None
+    if not (tree and tree.chunks) and not (archive and len(archive)):
+        return ""
+
+    start_time = time.perf_counter()
+    query_embedding = encode([user_text])[0]
+    blocks: List[str] = []
+    if tree:
+        nodes = tree.retrieve(user_text, top_k=MEMORIA_TOP_K, query_embedding=query_embedding)
+        if nodes:
+            lines = [f"- (trechos {n.first_chunk + 1}-{n.last_chunk + 1}) {n.text}" for n in nodes]
+            blocks.append("Resumos de partes anteriores da conversa, do mais antigo ao mais recente:\n" + "\n".join(lines))
+    if archive:
+        turns = archive.search(query_embedding, top_k=RAG_TOP_K, min_score=RAG_SCORE_MINIMO)
+        if turns:
+            lines = [f"[turno arquivado {number + 1}]\n{text}" for number, _, text in turns]
+            blocks.append("Mensagens originais de partes antigas da conversa, relevantes para a pergunta atual:\n"
+                          + "\n\n".join(lines))
+    _memory_latencies.append(time.perf_counter() - start_time)
+    if not blocks:
+        return ""
+    return ("Contexto recuperado da memória desta conversa (use se for relevante):\n\n" + "\n\n".join(blocks)
+            + "\n\n---\nPergunta atual: ")
+
+
+def reset_session(session_id: str):
+    get_history_by_session_id(session_id).clear()
+    if MEMORIA_HIERARQUICA:
+        get_summary_tree(session_id).clear()
+    if ARQUIVO_LONGO_PRAZO:
+        get_archive(session_id).clear()
 
 
 # ---------- Controle recursivo de histórico ----------
 
-def _count_user_or_ai_messages(messages: List[BaseMessage]) -> int:
-    count = 0
-    for m in messages:
-        if isinstance(m, (HumanMessage, AIMessage)):
-            count += 1
-    return count
+@dataclass(frozen=True)
+class CompactionPolicy:
+    """
+    Como o histórico é compactado. Passada explicitamente a cada turno e gravada no job de sumarização:
+    a troca do resumo usa a política de quem pediu, mesmo que outro turno use outra.
+    """
 
-def _count_start_ai_messages(messages: List[BaseMessage]) -> int:
-    count = 0
-    for m in messages:
-        if isinstance(m, AIMessage):
-            count += 1
-        else:
-            break
-    return count
+    name: str
+    stable_prefix: bool  # resumos novos depois dos anteriores, com orçamento próprio (ORCAMENTO_TOKENS_RESUMOS)
+    target_tokens: int  # alvo depois da compactação (no prefixo estável, sem contar os resumos)
+    # Resumos como folhas da árvore de memória, fora do histórico; desligado: mensagens de resumo no histórico
+    hierarchical: bool = MEMORIA_HIERARQUICA
 
-def maybe_summarize_history(session_id: str):
-    history = get_history_by_session_id(session_id)
+
+COMPACTION_POLICIES: Dict[str, CompactionPolicy] = {
+    "reescrita": CompactionPolicy("reescrita", stable_prefix=False, target_tokens=ALVO_TOKENS_HISTORICO),
+    "prefixo_estavel": CompactionPolicy("prefixo_estavel", stable_prefix=True, target_tokens=ALVO_TOKENS_PREFIXO_ESTAVEL),
+}
+DEFAULT_POLICY = COMPACTION_POLICIES[POLITICA_COMPACTACAO]
+
+_compactions: Dict[str, int] = {name: 0 for name in COMPACTION_POLICIES}
+
+
+def _compactable_tokens(history: CountedChatMessageHistory, policy: CompactionPolicy) -> int:
+    """Tokens que contam para o orçamento: no prefixo estável, os resumos têm orçamento próprio."""
+    return history.total_tokens - (history.summary_tokens if policy.stable_prefix else 0)
+
+
+def _messages_to_summarize(history: CountedChatMessageHistory, policy: CompactionPolicy) -> Tuple[int, int]:
+    """
+    Intervalo `[start, end)` de mensagens a resumir para o histórico voltar ao alvo; `end == start` se não houver corte.
+
+    O corte só cai antes de uma mensagem do usuário (pares pergunta/resposta ficam juntos) e preserva ao menos
+    MIN_MENSAGENS_RECENTES mensagens. Na reescrita o intervalo começa no resumo anterior (que é refeito junto);
+    no prefixo estável começa depois dos resumos, que ficam intactos. O alvo é o da política.
+    """
     messages = history.messages
+    start = history.summary_count if policy.stable_prefix else 0
+    target = policy.target_tokens
+    limit = len(messages) - MIN_MENSAGENS_RECENTES
+    remaining = _compactable_tokens(history, policy)
+    if not policy.stable_prefix and not policy.hierarchical:
+        # Só na reescrita com resumo no histórico o novo resumo conta para o alvo
+        remaining += TOKENS_RESUMO_ESTIMADOS
+    cut = start
+    for i in range(start, limit):
+        remaining -= history.token_count(i)
+        if isinstance(messages[i + 1], HumanMessage):
+            cut = i + 1
+            if remaining <= target:
+                break
+    return start, cut
+
+
+def _resume_message(summary_text: str) -> AIMessage:
+    return AIMessage(content=f"Essa mensagem é um resumo para compactar mensagens anteriores e economizar tokens, "
+                             f"mas preservar contexto da conversa:\n{summary_text}", is_resume=True)
+
+
+def _encode_long_term(session_id: str, to_summarize: List[BaseMessage], summary_text: str, policy: CompactionPolicy):
+    """Embeddings dos turnos a arquivar e da folha (CPU), calculados antes de pegar o lock da sessão."""
+    turns = get_archive(session_id).encode_turns(to_summarize) if ARQUIVO_LONGO_PRAZO else None
+    leaf_embedding = encode([summary_text])[0] if policy.hierarchical else None
+    return turns, leaf_embedding
+
+
+def _keep_long_term(session_id: str, to_summarize: List[BaseMessage], summary_text: str, policy: CompactionPolicy,
+                    encoded):
+    """
+    Arquiva os originais e, na memória hierárquica, põe o resumo como folha da árvore.
+
+    Só inserções em memória (embeddings de `_encode_long_term`, fusões da árvore depois): roda sob o lock da
+    sessão junto da troca no histórico, e nenhum turno vê o trecho na memória e no histórico ao mesmo tempo.
+    """
+    turns, leaf_embedding = encoded
+    if ARQUIVO_LONGO_PRAZO:
+        # Originais arquivados antes de saírem do histórico (o índice só recebe os turnos novos)
+        get_archive(session_id).add(to_summarize, turns)
+    if policy.hierarchical:
+        get_summary_tree(session_id).add_leaf(summary_text, leaf_embedding)
+
+
+def _replace_with_summary(session_id: str, start: int, end: int, summary_text: str, policy: CompactionPolicy):
+    """Troca as mensagens `[start:end]` pelo resumo (o chamador segura o lock da sessão)."""
+    history = get_history_by_session_id(session_id)
+    _compactions[policy.name] += 1
+    if policy.hierarchical:
+        # O resumo já está na árvore: o histórico fica só com a janela recente
+        history.replace_range(start, end, [])
+    else:
+        history.replace_range(start, end, [_resume_message(summary_text)])
 
-    if _count_user_or_ai_messages(messages) >= SUMARIZE_AFTER_MESSAGES:
-        start_ai_messages_count = _count_start_ai_messages(messages)
-        
-        # Pega as 10 mais antigas para resumir (5 do usuário + 5 do assistente)
-        to_summarize = messages[:(start_ai_messages_count + MESSAGES_TO_SUMMARIZE)]
-        summary_text = summarize_messages(to_summarize)
 
-        # Substitui por uma mensagem "resumo"
-        new_messages: list[BaseMessage] = [
-            AIMessage(content=f"Essa mensagem é um resumo para compactar mensagens anteriores e economizar tokens, "
-                              f"mas preservar contexto da conversa:\n{summary_text}", is_resume=True)]
-        new_messages.extend(messages[(start_ai_messages_count + MESSAGES_TO_SUMMARIZE):])  # mantém as 10 mais recentes
+def _summaries_to_merge(history: CountedChatMessageHistory, policy: CompactionPolicy) -> List[BaseMessage]:
+    """
+    No prefixo estável, os segmentos de resumo a fundir quando passam de ORCAMENTO_TOKENS_RESUMOS (senão vazio).
 
-        # Atualiza histórico
-        history.clear()
-        for m in new_messages:
-            history.add_message(m)
+    É a única reescrita do início do histórico nessa política, e rara.
+    """
+    if not policy.stable_prefix or history.summary_tokens <= ORCAMENTO_TOKENS_RESUMOS:
+        return []
+    return history.messages[:history.summary_count]
 
 
-# ---------- Função utilitária de envio ----------
+def _summary_texts(summaries: List[BaseMessage]) -> List[str]:
+    return [m.content.split("\n", 1)[-1] for m in summaries]  # sem a primeira linha (aviso de resumo)
 
-def send_message(session_id: str, user_text: str):
-    print("============= SEND MESSAGE =============")
-    print(f"[session_id={session_id}] Você: {user_text}")
 
-    # Antes de cada interação, checa se é hora de resumir
-    maybe_summarize_history(session_id)
+def maybe_summarize_history(session_id: str, policy: CompactionPolicy = DEFAULT_POLICY):
+    history = get_history_by_session_id(session_id)
 
-    # Envia a mensagem e obtém a resposta
-    response = with_history.invoke(
-        {"input": user_text},
-        config=RunnableConfig(configurable={"session_id": session_id}),
+    if _compactable_tokens(history, policy) > ORCAMENTO_TOKENS_HISTORICO:
+        start, end = _messages_to_summarize(history, policy)
+        if end > start:
+            to_summarize = history.messages[start:end]
+            summary_text = summarize_messages(to_summarize)
+            encoded = _encode_long_term(session_id, to_summarize, summary_text, policy)
+            _keep_long_term(session_id, to_summarize, summary_text, policy, encoded)
+            _replace_with_summary(session_id, start, end, summary_text, policy)
+
+    if policy.hierarchical:
+        get_summary_tree(session_id).merge_overflow()
+    summaries = _summaries_to_merge(history, policy)
+    if summaries:
+        history.replace_prefix(len(summaries), [_resume_message(merge_summaries(_summary_texts(summaries)))])
+
+
+# ---------- Sumarização em background ----------
+
+# Fila única para todas as sessões, atendida por SUMARIZACOES_SIMULTANEAS chamadas `summary_chain.ainvoke`
+# (ou `merge_chain.ainvoke`, nas fusões de resumos)
+_summarizer = SummarizationService(summary_chain, max_concurrency=SUMARIZACOES_SIMULTANEAS)
+# Job em andamento por sessão; sai do dicionário quando termina (o Future guarda o resultado)
+_pending: Dict[str, Future] = {}
+_pending_guard = threading.Lock()
+
+
+class _SessionLock:
+    """`threading.Lock` que aceita referência fraca (o lock nativo não aceita)."""
+
+    __slots__ = ("_lock", "__weakref__")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        return self._lock.acquire(blocking, timeout)
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+# Um lock por sessão: o turno (invoke + gravação da resposta) e a troca do resumo não se intercalam.
+# Referências fracas: o lock some quando nenhum turno ou job o segura (sessões ociosas não acumulam locks).
+_session_locks: "weakref.WeakValueDictionary[str, _SessionLock]" = weakref.WeakValueDictionary()
+_locks_guard = threading.Lock()
+
+
+def _session_lock(session_id: str) -> _SessionLock:
+    with _locks_guard:
+        lock = _session_locks.get(session_id)
+        if lock is None:
+            lock = _session_locks[session_id] = _SessionLock()
+        return lock
+
+
+# Espera pelo lock nos turnos assíncronos: pool próprio, para não ocupar as threads do executor padrão
+# (carga fria do SQLite, embeddings da pergunta)
+_lock_waiters = ThreadPoolExecutor(max_workers=32, thread_name_prefix="sessao-lock")
+
+
+async def _acquire_session_lock(lock: _SessionLock):
+    """
+    Adquire o lock de thread da sessão sem bloquear o event loop.
+
+    Caso comum (lock livre) sem trocar de thread. Se o turno for cancelado durante a espera, a thread que ainda
+    pode adquirir o lock o libera assim que conseguir: a sessão não fica travada.
+    """
+    if lock.acquire(blocking=False):
+        return
+    waiter = _lock_waiters.submit(lock.acquire)
+    try:
+        await asyncio.wrap_future(waiter)
+    except asyncio.CancelledError:
+        waiter.add_done_callback(lambda future: future.cancelled() or lock.release())
+        raise
+
+
+def _apply_summary(session_id: str, start: int, to_summarize: List[BaseMessage], summary, policy: CompactionPolicy):
+    """Chamado pelo serviço de sumarização quando o resumo do trecho fica pronto."""
+    summary_text = _summary_text(summary)
+    encoded = _encode_long_term(session_id, to_summarize, summary_text, policy)
+
+    # Enquanto o resumo era gerado, novos turnos só acrescentaram mensagens no fim: o trecho resumido
+    # continua na mesma posição e é trocado pelo resumo em uma única substituição de slice, sob o lock da sessão,
+    # junto da entrada do trecho no arquivo e na árvore
+    with _session_lock(session_id):
+        _keep_long_term(session_id, to_summarize, summary_text, policy, encoded)
+        _replace_with_summary(session_id, start, start + len(to_summarize), summary_text, policy)
+
+    # Fusões (árvore ou segmentos de resumo) entram como novos jobs do serviço, depois da troca
+    _schedule_merge(session_id, policy)
+
+
+def _schedule_merge(session_id: str, policy: CompactionPolicy):
+    """
+    Agenda no serviço a próxima fusão da sessão, se houver: na árvore, um nível que passou do fanout; no prefixo
+    estável, os segmentos de resumo acima do orçamento. Uma por vez: cada fusão agenda a seguinte ao terminar.
+    """
+    if policy.hierarchical:
+        tree = get_summary_tree(session_id)
+        group = tree.next_merge()
+        if group is None:
+            return
+        texts = [node.text for node in group]
+        # A árvore fica fora do prompt (só os top-k nós entram): a fusão não economiza prefill, vai para o fim da fila
+        priority = 0.0
+        on_result = lambda merged: _apply_tree_merge(session_id, tree, group, merged, policy)
+    else:
+        history = get_history_by_session_id(session_id)
+        summaries = _summaries_to_merge(history, policy)
+        if not summaries:
+            return
+        texts = _summary_texts(summaries)
+        # Tokens de resumo acima do orçamento, reenviados a cada turno até a fusão
+        priority = history.summary_tokens - ORCAMENTO_TOKENS_RESUMOS
+        on_result = lambda merged: _apply_prefix_merge(session_id, summaries, merged)
+    future = _summarizer.submit(session_id, merge_inputs(texts), priority=priority, on_result=on_result,
+                                chain=merge_chain)
+    # Registrado antes de o job anterior terminar: a sessão não agenda outra compactação no meio das fusões
+    _track_pending(session_id, future)
+
+
+def _apply_tree_merge(session_id: str, tree: "SummaryTree", group, merged, policy: CompactionPolicy):
+    tree.apply_merge(group, _summary_text(merged))
+    _schedule_merge(session_id, policy)  # o nível de cima pode ter passado do fanout
+
+
+def _apply_prefix_merge(session_id: str, summaries: List[BaseMessage], merged):
+    history = get_history_by_session_id(session_id)
+    with _session_lock(session_id):
+        # Descarta a fusão se os resumos mudaram enquanto ela era gerada (ex: `reset_session`)
+        current = history.messages[:len(summaries)]
+        if len(current) == len(summaries) and all(a is b for a, b in zip(current, summaries)):
+            history.replace_prefix(len(summaries), [_resume_message(_summary_text(merged))])
+
+
+def schedule_summarization(session_id: str, policy: CompactionPolicy = DEFAULT_POLICY):
+    """Agenda a compactação do histórico se o limite foi atingido e não há outra em andamento para a sessão."""
+    with _pending_guard:
+        if session_id in _pending:
+            return
+
+    history = get_history_by_session_id(session_id)
+    compactable = _compactable_tokens(history, policy)
+    if compactable <= ORCAMENTO_TOKENS_HISTORICO:
+        return
+
+    start, end = _messages_to_summarize(history, policy)
+    if end == start:
+        return
+    to_summarize = history.messages[start:end]
+    # Prioridade: tokens acima do alvo da política, que cada turno da sessão reenvia até a compactação.
+    # A política vai junto do job: a troca do resumo segue a política de quem pediu.
+    future = _summarizer.submit(
+        session_id,
+        summary_inputs(to_summarize),
+        priority=compactable - policy.target_tokens,
+        on_result=lambda summary: _apply_summary(session_id, start, to_summarize, summary, policy),
     )
+    _track_pending(session_id, future)
+
+
+def _track_pending(session_id: str, future: Future):
+    """Registra o job da sessão; um done-callback o retira de `_pending` quando termina."""
+    with _pending_guard:
+        _pending[session_id] = future
+    future.add_done_callback(lambda done: _forget_pending(session_id, done))
+
+
+def _forget_pending(session_id: str, future: Future):
+    with _pending_guard:
+        if _pending.get(session_id) is future:
+            del _pending[session_id]
 
+
+def wait_pending_summarizations():
+    """Espera as compactações pendentes, incluindo as fusões que elas agendam ao terminar."""
+    waited = set()
+    while True:
+        with _pending_guard:
+            futures = [future for future in _pending.values() if future not in waited]
+        if not futures:
+            return
+        for future in futures:
+            waited.add(future)
+            future.result()
+
+
+# ---------- Função utilitária de envio ----------
+
+_turn_latencies: Dict[str, List[float]] = {"background": [], "sincrono": []}
+# (TTFT, latência da resposta completa) dos turnos com streaming, medidos desde o início do turno
+_stream_latencies: List[Tuple[float, float]] = []
+
+
+def send_message(session_id: str, user_text: str, background: bool = SUMARIZACAO_EM_BACKGROUND, verbose: bool = True,
+                 stream: bool = STREAMING, policy: CompactionPolicy = DEFAULT_POLICY):
+    if verbose:
+        print("============= SEND MESSAGE =============")
+        print(f"[session_id={session_id}] Você: {user_text}")
+
+    start_time = time.perf_counter()
+    with _session_lock(session_id):
+        if not background:
+            # Antes de cada interação, checa se é hora de resumir
+            maybe_summarize_history(session_id, policy)
+
+        # Envia a mensagem e obtém a resposta
+        inputs = {"input": user_text, "memoria": _memory_context(session_id, user_text)}
+        config = RunnableConfig(configurable={"session_id": session_id})
+        if stream:
+            if verbose:
+                print("Assistente: ", end="", flush=True)
+            # O RunnableWithMessageHistory grava a resposta agregada no histórico ao fim do stream (uma vez)
+            response, ttft = consume_stream(with_history.stream(inputs, config=config), start_time, verbose)
+        else:
+            response = with_history.invoke(inputs, config=config)
+    total = time.perf_counter() - start_time
+    _turn_latencies["background" if background else "sincrono"].append(total)
+    if stream:
+        _stream_latencies.append((ttft, total))
+
+    if background:
+        # Resposta já entregue: a compactação roda fora do caminho do próximo turno
+        schedule_summarization(session_id, policy)
+
+    if verbose:
+        print_history(session_id)
+
+    return response
+
+
+async def asend_message(session_id: str, user_text: str, background: bool = SUMARIZACAO_EM_BACKGROUND,
+                        verbose: bool = True, stream: bool = STREAMING, policy: CompactionPolicy = DEFAULT_POLICY):
+    """Versão assíncrona de `send_message` (`ainvoke`): o event loop segue atendendo outras sessões."""
+    if verbose:
+        print("============= SEND MESSAGE =============")
+        print(f"[session_id={session_id}] Você: {user_text}")
+
+    start_time = time.perf_counter()
+    lock = _session_lock(session_id)
+    # Lock de thread, compartilhado com `send_message` e com a troca do resumo no serviço de sumarização
+    await _acquire_session_lock(lock)
+    try:
+        if not background:
+            await asyncio.to_thread(maybe_summarize_history, session_id, policy)
+        # Carga fria do SQLite e embeddings da pergunta (CPU) fora do event loop
+        await _store.aget(session_id)
+        memory = await asyncio.to_thread(_memory_context, session_id, user_text)
+        inputs = {"input": user_text, "memoria": memory}
+        config = RunnableConfig(configurable={"session_id": session_id})
+        if stream:
+            if verbose:
+                print("Assistente: ", end="", flush=True)
+            response, ttft = await aconsume_stream(with_history.astream(inputs, config=config), start_time, verbose)
+        else:
+            response = await with_history.ainvoke(inputs, config=config)
+    finally:
+        lock.release()
+    total = time.perf_counter() - start_time
+    _turn_latencies["background" if background else "sincrono"].append(total)
+    if stream:
+        _stream_latencies.append((ttft, total))
+
+    if background:
+        schedule_summarization(session_id, policy)
+
+    if verbose:
+        print_history(session_id)
+
+    return response
+
+
+def print_history(session_id: str):
     history = get_history_by_session_id(session_id)
-    print("--- Histórico armazenado ---")
+    print(f"--- Histórico armazenado ({history.total_tokens} tokens, {history.human_count} do usuário, "
+          f"{history.ai_count} do assistente, {history.summary_count} resumo) ---")
     for m in history.messages:
         who = m.type
         print(f"[{who}] {m.content}")
+    if MEMORIA_HIERARQUICA:
+        for level, nodes in enumerate(get_summary_tree(session_id).levels):
+            for node in nodes:
+                print(f"[memória nível {level}, trechos {node.first_chunk + 1}-{node.last_chunk + 1}] {node.text}")
     print("----------------------------\n")
 
-    return response
+
+# ---------- Métricas de latência por turno ----------
+
+def print_stream_latencies():
+    """TTFT (o que o usuário espera até ver a resposta começar) x latência da resposta completa."""
+    if not _stream_latencies:
+        return
+    ttfts = [ttft for ttft, _ in _stream_latencies]
+    totals = [total for _, total in _stream_latencies]
+    print(f"Streaming ({len(_stream_latencies)} turnos, s)")
+    print(f"{'':<18} {'p50':>7} {'p90':>7} {'p99':>7} {'máx':>7}")
+    for label, values in (("TTFT", ttfts), ("Resposta completa", totals)):
+        print(f"{label:<18} {percentile(values, 50):>7.2f} {percentile(values, 90):>7.2f} "
+              f"{percentile(values, 99):>7.2f} {max(values):>7.2f}")
+
+
+def compare_summarization_modes(questions: List[str]):
+    """Repete a conversa em uma sessão nova para cada modo e imprime a latência por turno vista pelo usuário."""
+    for latencias in _turn_latencies.values():
+        latencias.clear()
+
+    for mode, background in (("sincrono", False), ("background", True)):
+        session_id = f"comparacao-{mode}"
+        reset_session(session_id)
+        for question in questions:
+            send_message(session_id, question, background=background, verbose=False)
+        wait_pending_summarizations()
+
+    print("Latência por turno (s)")
+    print(f"{'Modo':<12} {'Turnos':>6} {'p50':>7} {'p90':>7} {'p99':>7} {'máx':>7}")
+    for mode, latencias in _turn_latencies.items():
+        print(f"{mode:<12} {len(latencias):>6} {percentile(latencias, 50):>7.2f} {percentile(latencias, 90):>7.2f} "
+              f"{percentile(latencias, 99):>7.2f} {max(latencias, default=0.0):>7.2f}")
+
+
+def _timed_stream_turn(session_id: str, user_text: str, policy: CompactionPolicy) -> Tuple[float, float]:
+    """Turno com compactação síncrona (fora da medição) e streaming; retorna (TTFT, latência total) em segundos."""
+    with _session_lock(session_id):
+        maybe_summarize_history(session_id, policy)
+        # Entradas montadas antes do cronômetro (embedding da pergunta e buscas na memória): mede só o servidor
+        inputs = {"input": user_text, "memoria": _memory_context(session_id, user_text)}
+        config = RunnableConfig(configurable={"session_id": session_id})
+        start_time = time.perf_counter()
+        _, ttft = consume_stream(with_history.stream(inputs, config=config), start_time, verbose=False)
+        total = time.perf_counter() - start_time
+    return ttft, total
+
+
+def compare_compaction_policies(questions: List[str]):
+    """
+    Repete a conversa em cada política de compactação e imprime o TTFT por turno.
+
+    As duas rodam com os resumos no histórico (sem a memória hierárquica, que os tira do prompt fixo): é o bloco
+    de resumos no início do prompt que a reescrita refaz e o prefixo estável preserva.
+    """
+    results: Dict[str, List[float]] = {}
+    summary_tokens: Dict[str, int] = {}
+    for name, policy in COMPACTION_POLICIES.items():
+        policy = replace(policy, hierarchical=False)
+        _compactions[name] = 0
+        session_id = f"comparacao-{name}-{int(time.time())}"
+        reset_session(session_id)
+        # Identificador na primeira pergunta: uma execução não aquece o cache de prefixo da outra
+        # (só o system prompt, compartilhado por todas as sessões, continua em comum)
+        turns = [f"[{session_id}] {questions[0]}"] + questions[1:]
+        results[name] = [_timed_stream_turn(session_id, question, policy)[0] for question in turns]
+        summary_tokens[name] = get_history_by_session_id(session_id).summary_tokens
+
+    print("TTFT por turno (s), sumarização síncrona fora da medição, resumos no histórico")
+    print(f"{'Política':<16} {'Compactações':>12} {'Resumos':>8} {'p50':>7} {'p90':>7} {'média':>7} {'máx':>7}")
+    for policy, ttfts in results.items():
+        print(f"{policy:<16} {_compactions[policy]:>12} {summary_tokens[policy]:>8} {percentile(ttfts, 50):>7.3f} "
+              f"{percentile(ttfts, 90):>7.3f} {sum(ttfts) / len(ttfts):>7.3f} {max(ttfts):>7.3f}")
+    print("Turno a turno (reescrita/prefixo_estavel): " + " | ".join(
+        f"{i + 1}: {a:.2f}/{b:.2f}" for i, (a, b) in enumerate(zip(results["reescrita"], results["prefixo_estavel"]))
+    ))
+
+
+async def simulate_concurrent_sessions(questions: List[str], n_sessions: int = 8):
+    """Conversas completas (com compactação) para uma sessão por vez e para todas em paralelo."""
+    results = []
+    for concurrency in (1, n_sessions):
+        results.append(await run_sessions(
+            lambda session_id, text: asend_message(session_id, text, verbose=False),
+            questions,
+            n_sessions=n_sessions,
+            max_concurrency=concurrency,
+            session_prefix=f"carga-c{concurrency}",
+            reset=reset_session,
+        ))
+        await asyncio.to_thread(wait_pending_summarizations)
+    print_results(results)
+    # O pool assíncrono compartilhado fica preso a este event loop
+    await fechar_clientes_async()
+
+
+DEMO_QUESTIONS = [
+    "Qual capital do Brasil?",  # 1
+    "e de Santa Catarina?",  # 2
+    "e do Paraná?",  # 3
+    "e do Rio Grande do Sul?",  # 4
+    "e de São Paulo?",  # 5
+    "e do Rio de Janeiro?",  # 6
+    "e de Minas Gerais?",  # 7
+    "e do Espírito Santo?",  # 8
+    "e do Mato Grosso?",  # 9
+    "e do Mato Grosso do Sul?",  # 10
+    "e do Goiás?",  # 11 - por volta daqui o histórico passa do orçamento de tokens e é resumido
+    "e da Bahia?",  # 12
+    "e de Pernambuco?",  # 13
+    "e do Ceará?",  # 14
+    "e do Rio Grande do Norte?",  # 15
+    "e da Paraíba?",  # 16
+    "e do Amazonas?",  # 17
+    "Quantas capitais você me falou até agora?",  # 18 - 17 capitais (1 nacional + 16 estaduais)
+    "Resuma em uma frase as respostas anteriores.",  # 19
+]
 
 
 if __name__ == "__main__":
     sess = "demo-session-1"
     print("Exemplo com sumarização recursiva do histórico:", sess)
+    reset_session(sess)  # a sessão persiste entre execuções; o exemplo começa do zero
 
-    send_message(sess, "Qual capital do Brasil?")  # 1
-    send_message(sess, "e de Santa Catarina?")  # 2
-    send_message(sess, "e do Paraná?")  # 3
-    send_message(sess, "e do Rio Grande do Sul?")  # 4
-    send_message(sess, "e de São Paulo?")  # 5 - Ao enviar a mensagem #11, será resumido o histórico até aqui.
-    send_message(sess, "e do Rio de Janeiro?")  # 6
-    send_message(sess, "e de Minas Gerais?")  # 7
-    send_message(sess, "e do Espírito Santo?")  # 8
-    send_message(sess, "e do Mato Grosso?")  # 9
-    send_message(sess, "e do Mato Grosso do Sul?")  # 10 - Ao enviar a mensagem #16, será resumido o histórico até aqui.
-    send_message(sess, "e do Goiás?")  # 11 - aqui deve resumir as 10 primeiras mensagens (pergunta e resposta até passo #5).
-    send_message(sess, "e da Bahia?")  # 12
-    send_message(sess, "e de Pernambuco?")  # 13
-    send_message(sess, "e do Ceará?")  # 14
-    send_message(sess, "e do Rio Grande do Norte?")  # 15
-    send_message(sess, "e da Paraíba?")  # 16 - aqui deve resumir
-    send_message(sess, "e do Amazonas?")  # 17
-    send_message(sess, "Quantas capitais você me falou até agora?")  # 18 - 17 capitais (1 nacional + 16 estaduais)
-    send_message(sess, "Resuma em uma frase as respostas anteriores.")  # 19
+    for question in DEMO_QUESTIONS:
+        send_message(sess, question)
+    wait_pending_summarizations()
 
     print("Fim do exemplo.")
+    print()
+    print_stream_latencies()
+
+    if COMPARAR_MODOS_SUMARIZACAO:
+        print()
+        compare_summarization_modes(DEMO_QUESTIONS)
+
+    if COMPARAR_POLITICAS_COMPACTACAO:
+        print()
+        compare_compaction_policies(DEMO_QUESTIONS)
+
+    if SIMULAR_SESSOES_CONCORRENTES:
+        print()
+        asyncio.run(simulate_concurrent_sessions(DEMO_QUESTIONS, SESSOES_SIMULADAS))
+
+    print()
+    print_stats(_store.stats())
+    print_summarization_stats(_summarizer.stats())
+    _summarizer.close()
+    if MEMORIA_HIERARQUICA:
+        print(f"Memória hierárquica ({sess}): {get_summary_tree(sess).stats()}")
+    if ARQUIVO_LONGO_PRAZO:
+        print(f"Arquivo de longo prazo ({sess}): {get_archive(sess).stats()}")
+    if _memory_latencies:
+        print(f"Recuperação de memória por turno: p50 {percentile(_memory_latencies, 50) * 1000:.2f}ms, "
+              f"p99 {percentile(_memory_latencies, 99) * 1000:.2f}ms ({len(_memory_latencies)} turnos)")
+    _store.close()
 
     ### ULTIMA RESPOSTA ###
     # --- Histórico armazenado ---
@@ -0,0 +1,116 @@
+"""
+Histórico de chat com contadores incrementais.
+
+Mantém, junto da lista de mensagens, o número de mensagens por tipo, os resumos no início do histórico
+e os tokens de cada mensagem e do total. Tudo é atualizado ao acrescentar (O(mensagens novas)) e na compactação,
+que troca o prefixo resumido em uma única substituição de slice; nenhum turno percorre o histórico inteiro.
+"""
+
+import threading
+from typing import Callable, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, message_chunk_to_message
+
+from token_counter import count_message_tokens
+
+
+def is_summary(message: BaseMessage) -> bool:
+    return bool(getattr(message, "is_resume", False))
+
+
+class CountedChatMessageHistory(BaseChatMessageHistory):
+    """Histórico em memória com contagem de mensagens e tokens mantida incrementalmente."""
+
+    def __init__(self, on_change: Optional[Callable[[], None]] = None):
+        # Chamado após cada alteração (ex: o SessionStore marca a sessão para gravação)
+        self.on_change = on_change
+        self._messages: List[BaseMessage] = []
+        self._tokens: List[int] = []
+        self._lock = threading.RLock()
+        self.human_count = 0
+        self.ai_count = 0
+        self.summary_count = 0  # resumos no início do histórico
+        self.total_tokens = 0
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        # Cópia rasa: quem lê (ex: o prompt do turno) não vê a lista mudar durante uma compactação
+        with self._lock:
+            return list(self._messages)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def token_count(self, index: int) -> int:
+        return self._tokens[index]
+
+    def _count(self, messages: Sequence[BaseMessage], tokens: Sequence[int], sign: int):
+        for message, message_tokens in zip(messages, tokens):
+            if isinstance(message, HumanMessage):
+                self.human_count += sign
+            elif isinstance(message, AIMessage):
+                self.ai_count += sign
+            self.total_tokens += sign * message_tokens
+
+    def _leading_summaries(self) -> int:
+        count = 0
+        while count < len(self._messages) and is_summary(self._messages[count]):
+            count += 1
+        return count
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        # Com streaming a resposta chega como a soma dos chunks (AIMessageChunk): grava como mensagem comum
+        messages = [message_chunk_to_message(m) for m in messages]
+        tokens = [count_message_tokens(m) for m in messages]
+        with self._lock:
+            self._messages.extend(messages)
+            self._tokens.extend(tokens)
+            self._count(messages, tokens, +1)
+            if self.summary_count == len(self._messages) - len(messages):
+                # Histórico só tinha resumos: os novos resumos (se houver) continuam o prefixo
+                self.summary_count = self._leading_summaries()
+        self._changed()
+
+    def replace_prefix(self, count: int, messages: Sequence[BaseMessage]) -> None:
+        """Substitui as `count` primeiras mensagens por `messages` (ex: o resumo delas)."""
+        self.replace_range(0, count, messages)
+
+    def replace_range(self, start: int, end: int, messages: Sequence[BaseMessage]) -> None:
+        """Substitui as mensagens `[start:end]` por `messages` (ex: um novo resumo depois dos resumos anteriores)."""
+        tokens = [count_message_tokens(m) for m in messages]
+        with self._lock:
+            self._count(self._messages[start:end], self._tokens[start:end], -1)
+            self._messages[start:end] = messages
+            self._tokens[start:end] = tokens
+            self._count(messages, tokens, +1)
+            self.summary_count = self._leading_summaries()
+        self._changed()
+
+    @property
+    def summary_tokens(self) -> int:
+        """Tokens dos resumos no início do histórico (poucas mensagens)."""
+        with self._lock:
+            return sum(self._tokens[:self.summary_count])
+
+    # Versões assíncronas: o padrão do BaseChatMessageHistory roda a versão síncrona em um executor (um salto de
+    # thread por leitura/gravação); aqui tudo é memória e o lock é curto, então roda direto no event loop.
+    async def aget_messages(self) -> List[BaseMessage]:
+        return self.messages
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.add_messages(messages)
+
+    async def aclear(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._messages.clear()
+            self._tokens.clear()
+            self.human_count = self.ai_count = self.summary_count = self.total_tokens = 0
+        self._changed()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
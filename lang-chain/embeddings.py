@@ -0,0 +1,32 @@
+"""
+Embeddings locais para a memória de longo prazo das conversas.
+
+Mesmo modelo multilíngue usado na camada semântica do cache de respostas (bom em PT-BR e leve para CPU).
+Os vetores saem normalizados (norma L2 = 1): o produto interno é a similaridade de cosseno.
+"""
+
+import threading
+from typing import List
+
+import numpy as np
+
+MODELO_EMBEDDINGS = "paraphrase-multilingual-MiniLM-L12-v2"
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            # Import tardio: carregar o sentence-transformers/torch custa alguns segundos
+            from sentence_transformers import SentenceTransformer
+
+            _model = SentenceTransformer(MODELO_EMBEDDINGS)
+        return _model
+
+
+def encode(texts: List[str]) -> np.ndarray:
+    """Matriz (len(texts), dimensão) float32 com os embeddings normalizados."""
+    return _get_model().encode(texts, normalize_embeddings=True).astype("float32")
@@ -0,0 +1,16 @@
+"""
+Estatísticas de latência compartilhadas pelos scripts e componentes do lang-chain.
+"""
+
+from typing import List
+
+
+def percentile(valores: List[float], p: float) -> float:
+    """Percentil p (0-100) com interpolação linear."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
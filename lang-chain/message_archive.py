@@ -0,0 +1,217 @@
+"""
+Arquivo de longo prazo das mensagens originais de uma sessão, com busca vetorial.
+
+Quando o histórico é compactado, as mensagens resumidas (perdidas no resumo) são arquivadas aqui, agrupadas
+em turnos (pergunta do usuário + resposta). Cada turno vira um vetor em um índice FAISS de produto interno
+sobre embeddings normalizados, a mesma abordagem de similarity-search/similarity_faiss_cosine.py
+(score = similaridade de cosseno).
+
+- `add(messages)`: só os turnos novos são codificados e adicionados ao índice (IndexFlatIP aceita `add` incremental).
+- `search(query_embedding)`: top-k turnos acima de `min_score`. O embedding da pergunta é calculado uma vez
+  por turno pelo chamador e reaproveitado pela árvore de resumos.
+- `stats()`: latência p50/p99 da busca no índice.
+- `MessageArchiveExtra` grava turnos e vetores no SQLite do SessionStore (tabela `turnos_arquivados`, só os
+  turnos novos a cada gravação); na carga fria o índice é refeito a partir dos vetores gravados, sem recalcular
+  embeddings, e o arquivo sai da memória junto da sessão.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from counted_history import is_summary
+from embeddings import encode
+from latency_stats import percentile
+from session_store import SessionExtra
+from token_counter import message_text
+
+
+def group_turns(messages: Sequence[BaseMessage]) -> List[str]:
+    """Agrupa as mensagens em turnos (`user: ...` + `assistant: ...`), ignorando resumos."""
+    turns: List[List[str]] = []
+    for message in messages:
+        if is_summary(message):
+            continue
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        who = "user" if isinstance(message, HumanMessage) else "assistant"
+        turns[-1].append(f"{who}: {message_text(message)}")
+    return ["\n".join(turn) for turn in turns]
+
+
+def _faiss():
+    # Import tardio: o faiss só é necessário quando o arquivo de longo prazo está em uso
+    import faiss
+
+    return faiss
+
+
+class MessageArchive:
+    """
+    Turnos arquivados de uma sessão em um índice FAISS de similaridade de cosseno.
+
+    Args:
+        encode_fn: Gera os embeddings normalizados de uma lista de textos.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray] = encode):
+        self.encode_fn = encode_fn
+        self.turns: List[str] = []
+        self._index = None  # criado no primeiro `add`, quando a dimensão do embedding é conhecida
+        self._lock = threading.Lock()
+        self._search_latencies: Deque[float] = deque(maxlen=10_000)
+        # Chamado após cada alteração (ex: o SessionStore marca o arquivo para gravação)
+        self.on_change: Optional[Callable[[], None]] = None
+        self._saved = 0  # turnos já gravados (só avança depois do commit, em `mark_saved`)
+        self._reset = False  # `clear` desde a última gravação: os turnos gravados devem ser apagados
+        self._epoch = 0  # incrementado a cada `clear`: invalida marcas tiradas antes dele
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def encode_turns(self, messages: Sequence[BaseMessage]) -> Tuple[List[str], Optional[np.ndarray]]:
+        """(turnos, vetores normalizados) das mensagens, sem alterar o arquivo: a parte cara de `add`."""
+        texts = group_turns(messages)
+        if not texts:
+            return texts, None
+        embeddings = np.ascontiguousarray(self.encode_fn(texts), dtype="float32")
+        _faiss().normalize_L2(embeddings)
+        return texts, embeddings
+
+    def add(self, messages: Sequence[BaseMessage],
+            encoded: Optional[Tuple[List[str], Optional[np.ndarray]]] = None) -> int:
+        """
+        Arquiva as mensagens (um vetor por turno); retorna quantos turnos entraram.
+
+        `encoded` (de `encode_turns`) permite calcular os embeddings antes, fora do lock do chamador.
+        """
+        # Embedding fora do lock: as buscas dos turnos seguem usando o índice atual
+        texts, embeddings = encoded if encoded is not None else self.encode_turns(messages)
+        if not texts:
+            return 0
+        faiss = _faiss()
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.IndexFlatIP(embeddings.shape[1])
+            self._index.add(embeddings)
+            self.turns.extend(texts)
+        self._changed()
+        return len(texts)
+
+    def restore(self, texts: List[str], embeddings: np.ndarray):
+        """Recoloca turnos gravados com os seus vetores (carga fria da sessão), sem recalcular embeddings."""
+        with self._lock:
+            self._index = _faiss().IndexFlatIP(embeddings.shape[1])
+            self._index.add(np.ascontiguousarray(embeddings, dtype="float32"))
+            self.turns = list(texts)
+            self._saved = len(texts)
+
+    def take_unsaved(self) -> Tuple[bool, int, List[str], Optional[np.ndarray], Tuple[int, int]]:
+        """
+        (apagar os gravados, número do primeiro turno novo, textos, vetores, marca) ainda não gravados.
+
+        Nada muda aqui: depois do commit o chamador passa a marca para `mark_saved`. Se a transação falhar,
+        os mesmos turnos voltam na próxima gravação.
+        """
+        with self._lock:
+            reset, start = self._reset, self._saved
+            texts = self.turns[start:]
+            vectors = self._index.reconstruct_n(start, len(texts)) if texts else None
+            watermark = (self._epoch, len(self.turns))
+        return reset, start, texts, vectors, watermark
+
+    def mark_saved(self, watermark: Tuple[int, int]):
+        """Marca como gravados os turnos até `watermark` (de `take_unsaved`), se não houve `clear` desde então."""
+        epoch, saved = watermark
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._reset = False
+            self._saved = max(self._saved, saved)
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 3, min_score: float = 0.0) -> List[Tuple[int, float, str]]:
+        """(número do turno, score, texto) dos turnos mais similares, em ordem cronológica."""
+        start_time = time.perf_counter()
+        query = np.ascontiguousarray(query_embedding.reshape(1, -1), dtype="float32")
+        _faiss().normalize_L2(query)
+        with self._lock:
+            if self._index is None or not self.turns:
+                return []
+            scores, indices = self._index.search(query, min(top_k, len(self.turns)))
+            results = [
+                (int(i), float(score), self.turns[i])
+                for score, i in zip(scores[0], indices[0])
+                if i >= 0 and score >= min_score
+            ]
+        self._search_latencies.append(time.perf_counter() - start_time)
+        return sorted(results)
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+            self.turns.clear()
+            self._search_latencies.clear()
+            self._reset, self._saved = True, 0
+            self._epoch += 1
+        self._changed()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def stats(self) -> Dict[str, float]:
+        latencies = list(self._search_latencies)
+        return {
+            "turnos_arquivados": len(self.turns),
+            "buscas": len(latencies),
+            "busca_p50_ms": percentile(latencies, 50) * 1000,
+            "busca_p99_ms": percentile(latencies, 99) * 1000,
+        }
+
+
+class MessageArchiveExtra(SessionExtra):
+    """
+    Persistência do arquivo de cada sessão no SessionStore: uma linha por turno (texto + vetor float32).
+
+    Args:
+        archive_factory: Cria um arquivo vazio.
+    """
+
+    name = "arquivo_mensagens"
+
+    def __init__(self, archive_factory: Callable[[], MessageArchive] = MessageArchive):
+        self.archive_factory = archive_factory
+
+    def create_tables(self, db: sqlite3.Connection):
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS turnos_arquivados (session_id TEXT NOT NULL, numero INTEGER NOT NULL, "
+            "texto TEXT NOT NULL, embedding BLOB NOT NULL, PRIMARY KEY (session_id, numero))"
+        )
+
+    def load(self, db: sqlite3.Connection, session_id: str) -> MessageArchive:
+        archive = self.archive_factory()
+        rows = db.execute(
+            "SELECT texto, embedding FROM turnos_arquivados WHERE session_id = ? ORDER BY numero", (session_id,)
+        ).fetchall()
+        if rows:
+            archive.restore([text for text, _ in rows], np.stack([np.frombuffer(blob, dtype="float32") for _, blob in rows]))
+        return archive
+
+    def save(self, db: sqlite3.Connection, session_id: str, archive: MessageArchive) -> Tuple[int, int]:
+        reset, start, texts, vectors, watermark = archive.take_unsaved()
+        if reset:
+            db.execute("DELETE FROM turnos_arquivados WHERE session_id = ?", (session_id,))
+        if texts:
+            db.executemany(
+                "INSERT OR REPLACE INTO turnos_arquivados (session_id, numero, texto, embedding) VALUES (?, ?, ?, ?)",
+                [(session_id, start + i, text, vector.tobytes()) for i, (text, vector) in enumerate(zip(texts, vectors))],
+            )
+        return watermark
+
+    def saved(self, session_id: str, archive: MessageArchive, token: Tuple[int, int]):
+        archive.mark_saved(token)
@@ -0,0 +1,81 @@
+"""
+Simulação de N sessões de chat concorrentes contra o endpoint local.
+
+Cada sessão simulada é um usuário que envia as perguntas em sequência (um turno espera a resposta do anterior),
+e as sessões rodam em paralelo no mesmo event loop, como em um worker web atendendo vários usuários.
+`max_concurrency=1` serve de linha de base (uma conversa por vez).
+
+Mede sessões atendidas por segundo, turnos por segundo e a latência por turno (p50/p90/p99).
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from latency_stats import percentile
+
+
+async def run_sessions(
+    send: Callable[[str, str], Awaitable],
+    questions: List[str],
+    n_sessions: int = 8,
+    max_concurrency: Optional[int] = None,
+    session_prefix: str = "carga",
+    reset: Optional[Callable[[str], None]] = None,
+) -> Dict[str, float]:
+    """
+    Roda `n_sessions` conversas com `questions` chamando `await send(session_id, pergunta)` a cada turno.
+
+    Args:
+        max_concurrency: Sessões ativas ao mesmo tempo (padrão: todas).
+        reset: Limpa a sessão antes de começar (as sessões persistem entre execuções).
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or n_sessions)
+    latencies: List[float] = []
+    errors = 0
+
+    async def conversation(index: int):
+        nonlocal errors
+        session_id = f"{session_prefix}-{index}"
+        async with semaphore:
+            for question in questions:
+                start_time = time.perf_counter()
+                try:
+                    await send(session_id, question)
+                except Exception as exc:
+                    # Uma falha encerra só esta conversa; as demais seguem
+                    errors += 1
+                    print(f"[{session_id}] erro: {exc!r}")
+                    return
+                latencies.append(time.perf_counter() - start_time)
+
+    if reset is not None:
+        # Fora da medição
+        for index in range(n_sessions):
+            reset(f"{session_prefix}-{index}")
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(conversation(i) for i in range(n_sessions)))
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "sessoes": n_sessions,
+        "concorrencia": max_concurrency or n_sessions,
+        "turnos": len(latencies),
+        "erros": errors,
+        "segundos": elapsed,
+        "sessoes_por_segundo": (n_sessions - errors) / elapsed if elapsed else 0.0,
+        "turnos_por_segundo": len(latencies) / elapsed if elapsed else 0.0,
+        "turno_p50_s": percentile(latencies, 50),
+        "turno_p90_s": percentile(latencies, 90),
+        "turno_p99_s": percentile(latencies, 99),
+    }
+
+
+def print_results(results: List[Dict[str, float]]):
+    print(f"{'Concorrência':>12} {'Sessões':>8} {'Turnos':>7} {'Erros':>6} {'Tempo(s)':>9} {'Sessões/s':>10} "
+          f"{'Turnos/s':>9} {'p50':>6} {'p90':>6} {'p99':>6}")
+    for r in results:
+        print(f"{r['concorrencia']:>12} {r['sessoes']:>8} {r['turnos']:>7} {r['erros']:>6} {r['segundos']:>9.2f} "
+              f"{r['sessoes_por_segundo']:>10.3f} {r['turnos_por_segundo']:>9.2f} {r['turno_p50_s']:>6.2f} "
+              f"{r['turno_p90_s']:>6.2f} {r['turno_p99_s']:>6.2f}")
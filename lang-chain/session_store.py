@@ -0,0 +1,337 @@
+"""
+Armazém de sessões de chat: camada quente em memória (LRU + TTL de ociosidade) sobre SQLite (WAL).
+
+- `get(session_id)` devolve o histórico da sessão: da memória (quente) ou recarregado do SQLite (fria);
+  sessões novas começam vazias. `aget` é a versão para asyncio: a carga fria roda em uma thread.
+- `extras`: dados de longo prazo da sessão (ex: árvore de resumos) com tabelas próprias no mesmo banco, ver
+  `SessionExtra`. São carregados, gravados e despejados junto do histórico; `get_extra(session_id, nome)`.
+- Alterações marcam a sessão (e a parte alterada) como suja; uma thread grava as sessões sujas em lote, em uma
+  transação, a cada `flush_interval` segundos ou quando o lote chega a `flush_batch` sessões.
+- Sessões além de `max_sessions` ou ociosas há mais de `idle_ttl` segundos saem da memória. Enquanto ainda
+  estão em uso (ex: um turno em andamento) ou na fila de gravação, voltam como o mesmo objeto: nunca existem
+  duas cópias da mesma sessão.
+- A carga fria (SQLite, JSON, contagem de tokens, extras) roda fora do lock do armazém: acessos quentes de
+  outras sessões não esperam; pedidos simultâneos da mesma sessão esperam uma única carga.
+- `stats()` traz hits quentes, cargas frias, despejos, latência p50/p99 de cada caminho e memória estimada.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+from counted_history import CountedChatMessageHistory
+from latency_stats import percentile
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+HISTORY = "historico"  # nome da parte "histórico" nas marcas de sujeira
+
+
+class SessionExtra(ABC):
+    """
+    Dado de longo prazo de uma sessão guardado ao lado do histórico (mesma carga, despejo e gravação em lote).
+
+    Subclasses definem `name`, criam as próprias tabelas e (de)serializam o objeto. O objeto devolvido por `load`
+    precisa expor `on_change`, como o histórico: o SessionStore o liga para marcar a parte como suja.
+    `save` roda na thread de gravação, dentro da transação do lote; o que ele devolve volta em `saved`, chamado
+    só depois do commit (ex: avançar a marca do que já está no banco).
+    """
+
+    name = ""
+
+    @abstractmethod
+    def create_tables(self, db: sqlite3.Connection):
+        ...
+
+    @abstractmethod
+    def load(self, db: sqlite3.Connection, session_id: str) -> Any:
+        """Objeto da sessão a partir do banco (vazio se a sessão não tem dados gravados)."""
+
+    @abstractmethod
+    def save(self, db: sqlite3.Connection, session_id: str, value: Any) -> Any:
+        ...
+
+    def saved(self, session_id: str, value: Any, token: Any):
+        """Chamado depois do commit do lote com o retorno de `save`."""
+
+
+class _Session:
+    __slots__ = ("history", "extras", "dirty", "__weakref__")
+
+    def __init__(self, history: CountedChatMessageHistory, extras: Dict[str, Any]):
+        self.history = history
+        self.extras = extras
+        self.dirty: Set[str] = set()  # partes alteradas desde a última gravação
+
+
+class SessionStore:
+    """
+    Históricos de chat por sessão com limite de memória e persistência em SQLite.
+
+    Args:
+        path: Arquivo SQLite (":memory:" para testes).
+        max_sessions: Sessões mantidas em memória.
+        idle_ttl: Segundos sem acesso até a sessão sair da memória (`None` desativa).
+        flush_interval: Intervalo máximo entre gravações em lote (s).
+        flush_batch: Número de sessões sujas que antecipa a gravação.
+        history_factory: Cria o histórico vazio (precisa expor `on_change`, como CountedChatMessageHistory).
+        extras: Dados de longo prazo gravados e despejados junto do histórico (ver `SessionExtra`).
+    """
+
+    def __init__(
+        self,
+        path: str = "sessoes.sqlite3",
+        max_sessions: int = 1_000,
+        idle_ttl: Optional[float] = 1800,
+        flush_interval: float = 0.5,
+        flush_batch: int = 100,
+        history_factory: Callable[..., CountedChatMessageHistory] = CountedChatMessageHistory,
+        extras: Sequence[SessionExtra] = (),
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.history_factory = history_factory
+        self.extras = {extra.name: extra for extra in extras}
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessoes (session_id TEXT PRIMARY KEY, mensagens TEXT NOT NULL, atualizado_em REAL)"
+        )
+        for extra in self.extras.values():
+            extra.create_tables(self._db)
+        self._db.commit()
+        self._db_lock = threading.Lock()
+
+        self._lock = threading.RLock()
+        # session_id -> (sessão, último acesso), em ordem de uso (LRU no início)
+        self._hot: "OrderedDict[str, List]" = OrderedDict()
+        self._dirty: Dict[str, _Session] = {}
+        self._flushing: Dict[str, _Session] = {}  # lote sendo gravado agora
+        # Toda sessão ainda referenciada (quente, na fila de gravação ou segura por quem a usa): um despejo
+        # seguido de novo acesso devolve o mesmo objeto em vez de recarregar uma cópia do SQLite
+        self._live: "weakref.WeakValueDictionary[str, _Session]" = weakref.WeakValueDictionary()
+        self._loading: Dict[str, Future] = {}  # cargas frias em andamento (fora do lock)
+
+        self.hot_hits = 0
+        self.cold_loads = 0
+        self.new_sessions = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.flushed_sessions = 0
+        self._hot_latencies: Deque[float] = deque(maxlen=10_000)
+        self._cold_latencies: Deque[float] = deque(maxlen=10_000)
+
+        self._flush_now = threading.Event()
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-store-flush", daemon=True)
+        self._flusher.start()
+
+    def get(self, session_id: str) -> CountedChatMessageHistory:
+        return self._session(session_id).history
+
+    def get_extra(self, session_id: str, name: str) -> Any:
+        """Dado de longo prazo `name` da sessão (carregado junto do histórico)."""
+        return self._session(session_id, measure=False).extras[name]
+
+    def _session(self, session_id: str, measure: bool = True) -> _Session:
+        start_time = time.perf_counter()
+        with self._lock:
+            now = time.monotonic()
+            entry = self._hot.get(session_id)
+            if entry is not None:
+                entry[1] = now
+                self._hot.move_to_end(session_id)
+                if measure:
+                    self.hot_hits += 1
+                    self._hot_latencies.append(time.perf_counter() - start_time)
+                return entry[0]
+
+            # Despejada mas ainda em uso ou não gravada: o objeto vivo é a cópia mais recente
+            session = self._live.get(session_id)
+            if session is not None:
+                self._insert(session_id, session, now, start_time)
+                return session
+
+            loading = self._loading.get(session_id)
+            if loading is None:
+                loading = self._loading[session_id] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return loading.result()
+
+        try:
+            session, found = self._load(session_id)
+        except BaseException as exc:
+            with self._lock:
+                del self._loading[session_id]
+            loading.set_exception(exc)
+            raise
+        with self._lock:
+            del self._loading[session_id]
+            if found:
+                self.cold_loads += 1
+            else:
+                self.new_sessions += 1
+            self._live[session_id] = session
+            self._insert(session_id, session, time.monotonic(), start_time)
+        loading.set_result(session)
+        return session
+
+    def _insert(self, session_id: str, session: _Session, now: float, start_time: float):
+        """Põe a sessão na camada quente (chamar com `_lock`)."""
+        self._hot[session_id] = [session, now]
+        self._evict(now)
+        self._cold_latencies.append(time.perf_counter() - start_time)
+
+    async def aget(self, session_id: str) -> CountedChatMessageHistory:
+        """`get` sem bloquear o event loop: só a carga fria (SQLite) vai para uma thread."""
+        with self._lock:
+            hot = session_id in self._hot
+        if hot:
+            return self.get(session_id)
+        return await asyncio.to_thread(self.get, session_id)
+
+    def _load(self, session_id: str) -> Tuple[_Session, bool]:
+        """(sessão, se havia dados gravados) a partir do SQLite; roda fora do `_lock`."""
+        with self._db_lock:
+            row = self._db.execute("SELECT mensagens FROM sessoes WHERE session_id = ?", (session_id,)).fetchone()
+            extras = {name: extra.load(self._db, session_id) for name, extra in self.extras.items()}
+        history = self.history_factory()
+        if row is not None:
+            history.add_messages(messages_from_dict(json.loads(row[0])))
+        session = _Session(history, extras)
+        # Os callbacks só são ligados depois da carga, para a recarga não marcar a sessão como suja
+        history.on_change = lambda: self._mark_dirty(session_id, session, HISTORY)
+        for name, value in extras.items():
+            value.on_change = lambda name=name: self._mark_dirty(session_id, session, name)
+        return session, row is not None
+
+    def _evict(self, now: float):
+        while len(self._hot) > self.max_sessions:
+            self._hot.popitem(last=False)
+            self.evictions += 1
+        if self.idle_ttl is not None:
+            while self._hot:
+                session_id, (_, last_access) = next(iter(self._hot.items()))
+                if now - last_access <= self.idle_ttl:
+                    break
+                del self._hot[session_id]
+                self.evictions += 1
+
+    def _mark_dirty(self, session_id: str, session: _Session, part: str):
+        with self._lock:
+            session.dirty.add(part)
+            self._dirty[session_id] = session
+            if len(self._dirty) >= self.flush_batch:
+                self._flush_now.set()
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._flush_now.wait(self.flush_interval)
+            self._flush_now.clear()
+            self.flush()
+
+    def flush(self):
+        """Grava todas as sessões sujas (só as partes alteradas) em uma transação."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._flushing = dirty
+            parts = {session_id: session.dirty for session_id, session in dirty.items()}
+            for session in dirty.values():
+                session.dirty = set()
+        if not dirty:
+            return
+        now = time.time()
+        rows = [
+            (session_id, json.dumps(messages_to_dict(session.history.messages), ensure_ascii=False), now)
+            for session_id, session in dirty.items()
+            if HISTORY in parts[session_id]
+        ]
+        with self._db_lock:
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO sessoes (session_id, mensagens, atualizado_em) VALUES (?, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET mensagens = excluded.mensagens, "
+                    "atualizado_em = excluded.atualizado_em",
+                    rows,
+                )
+                saved = [
+                    (self.extras[name], session_id, session.extras[name],
+                     self.extras[name].save(self._db, session_id, session.extras[name]))
+                    for session_id, session in dirty.items()
+                    for name in parts[session_id] - {HISTORY}
+                ]
+            # Depois do commit, ainda sob `_db_lock`: só o que foi de fato gravado conta como gravado
+            for extra, session_id, value, token in saved:
+                extra.saved(session_id, value, token)
+        with self._lock:
+            self._flushing = {}
+        self.flushes += 1
+        self.flushed_sessions += len(dirty)
+
+    def close(self):
+        self._stop.set()
+        self._flush_now.set()
+        self._flusher.join()
+        self.flush()
+        with self._db_lock:
+            self._db.close()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            histories = [session.history for session, _ in self._hot.values()]
+            hot_latencies = list(self._hot_latencies)
+            cold_latencies = list(self._cold_latencies)
+            pending = len(self._dirty)
+        rss_peak = None
+        if resource is not None:
+            # ru_maxrss: KiB no Linux
+            rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return {
+            "sessoes_em_memoria": len(histories),
+            "mensagens_em_memoria": sum(len(h) for h in histories),
+            "tokens_em_memoria": sum(h.total_tokens for h in histories),
+            "rss_pico_bytes": rss_peak,
+            "hot_hits": self.hot_hits,
+            "cold_loads": self.cold_loads,
+            "new_sessions": self.new_sessions,
+            "evictions": self.evictions,
+            "pendentes_gravacao": pending,
+            "flushes": self.flushes,
+            "sessoes_gravadas": self.flushed_sessions,
+            "hot_p50_ms": percentile(hot_latencies, 50) * 1000,
+            "hot_p99_ms": percentile(hot_latencies, 99) * 1000,
+            "cold_p50_ms": percentile(cold_latencies, 50) * 1000,
+            "cold_p99_ms": percentile(cold_latencies, 99) * 1000,
+        }
+
+
+def print_stats(stats: Dict[str, float]):
+    print("--- Sessões ---")
+    print(f"Em memória: {stats['sessoes_em_memoria']} sessões, {stats['mensagens_em_memoria']} mensagens, "
+          f"{stats['tokens_em_memoria']} tokens"
+          + (f" | RSS pico: {stats['rss_pico_bytes'] / 1024 / 1024:.1f} MB" if stats["rss_pico_bytes"] else ""))
+    print(f"Quentes: {stats['hot_hits']} (p50 {stats['hot_p50_ms']:.3f}ms, p99 {stats['hot_p99_ms']:.3f}ms) | "
+          f"frias: {stats['cold_loads']} + {stats['new_sessions']} novas "
+          f"(p50 {stats['cold_p50_ms']:.3f}ms, p99 {stats['cold_p99_ms']:.3f}ms)")
+    print(f"Despejos: {stats['evictions']} | gravações em lote: {stats['flushes']} "
+          f"({stats['sessoes_gravadas']} sessões, {stats['pendentes_gravacao']} pendentes)")
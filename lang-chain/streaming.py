@@ -0,0 +1,41 @@
+"""
+Consumo do stream de respostas do chat com medição do TTFT.
+
+Os chunks são impressos à medida que chegam e somados na resposta completa (AIMessageChunk). O TTFT é o tempo
+até o primeiro chunk com texto (o primeiro chunk do servidor costuma vir vazio, só com o papel), medido a partir
+de `start_time` (ex: o início do turno, incluindo o que roda antes da chamada ao modelo).
+"""
+
+import time
+from typing import AsyncIterator, Iterator, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+
+
+def consume_stream(chunks: Iterator[BaseMessage], start_time: float, verbose: bool = True) -> Tuple[Optional[BaseMessage], float]:
+    """Junta os chunks (imprimindo o texto se `verbose`); retorna (resposta, TTFT em segundos)."""
+    response, ttft = None, None
+    for chunk in chunks:
+        if ttft is None and chunk.content:
+            ttft = time.perf_counter() - start_time
+        if verbose:
+            print(chunk.content, end="", flush=True)
+        response = chunk if response is None else response + chunk
+    if verbose:
+        print()
+    return response, ttft if ttft is not None else time.perf_counter() - start_time
+
+
+async def aconsume_stream(chunks: AsyncIterator[BaseMessage], start_time: float,
+                          verbose: bool = True) -> Tuple[Optional[BaseMessage], float]:
+    """Versão assíncrona de `consume_stream`."""
+    response, ttft = None, None
+    async for chunk in chunks:
+        if ttft is None and chunk.content:
+            ttft = time.perf_counter() - start_time
+        if verbose:
+            print(chunk.content, end="", flush=True)
+        response = chunk if response is None else response + chunk
+    if verbose:
+        print()
+    return response, ttft if ttft is not None else time.perf_counter() - start_time
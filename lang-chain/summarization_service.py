@@ -0,0 +1,209 @@
+"""
+Serviço de sumarização compartilhado entre sessões.
+
+Em vez de cada sessão montar e invocar a própria chain, os pedidos de compactação entram em uma fila de
+prioridade atendida por `max_concurrency` trabalhadores em um único event loop (em uma thread): no máximo
+`max_concurrency` chamadas simultâneas ao servidor, e cada trabalhador pega o próximo job assim que a sua
+chamada termina.
+
+- Prioridade: quem tem mais tokens acima do alvo (maior custo extra de prefill por turno) sai primeiro;
+  empates saem na ordem de chegada. A prioridade é decidida a cada vaga que abre.
+- `submit` pode ser chamado de qualquer thread e devolve um `concurrent.futures.Future`. O `on_result`
+  (ex: gravar o resumo no histórico) roda em um pool separado, para não bloquear o event loop. Ele deve ser
+  só uma troca rápida em memória: uma chamada ao LLM de continuação entra como um novo job.
+- Cada job pode trazer a própria chain (ex: fusão de resumos): a mesma fila, prioridade e limite de
+  `max_concurrency` valem para todas as chamadas de sumarização.
+- `close()` cancela os Futures dos jobs que não terminaram (na fila ou em andamento): ninguém fica esperando
+  um `result()` que nunca chega.
+- `stats()`: profundidade da fila (atual e máxima), jobs em andamento, erros e latência dos jobs
+  (espera na fila e total).
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional
+
+from langchain_core.runnables import Runnable
+
+from latency_stats import percentile
+
+
+@dataclass(order=True)
+class _Job:
+    sort_key: float  # -prioridade: a PriorityQueue entrega o menor primeiro
+    seq: int
+    key: str = field(compare=False)
+    inputs: Dict[str, Any] = field(compare=False)
+    on_result: Optional[Callable[[Any], None]] = field(compare=False)
+    future: Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    chain: Optional[Runnable] = field(compare=False, default=None)  # None: a chain do serviço
+
+
+class SummarizationService:
+    """
+    Fila de prioridade + trabalhadores assíncronos para uma chain de sumarização construída uma única vez.
+
+    Args:
+        chain: Runnable de sumarização (ex: `summary_prompt | llm`).
+        max_concurrency: Chamadas simultâneas ao servidor (número de trabalhadores).
+        finish_workers: Threads que executam os `on_result`.
+    """
+
+    def __init__(self, chain: Runnable, max_concurrency: int = 4, finish_workers: int = 2):
+        self.chain = chain
+        self.max_concurrency = max_concurrency
+
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._depth = 0
+        self.max_depth = 0
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.cancelled = 0
+        self._wait_latencies: Deque[float] = deque(maxlen=10_000)
+        self._job_latencies: Deque[float] = deque(maxlen=10_000)
+
+        self._finisher = ThreadPoolExecutor(max_workers=finish_workers, thread_name_prefix="sumarizacao-fim")
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sumarizacao-servico", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        # A fila é criada dentro do loop que a usa
+        self._queue: "asyncio.PriorityQueue[_Job]" = asyncio.PriorityQueue()
+        self._workers = [self._loop.create_task(self._work()) for _ in range(self.max_concurrency)]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def submit(
+        self,
+        key: str,
+        inputs: Dict[str, Any],
+        priority: float = 0.0,
+        on_result: Optional[Callable[[Any], None]] = None,
+        chain: Optional[Runnable] = None,
+    ) -> Future:
+        """
+        Enfileira um job (thread-safe); o Future resolve depois que `on_result` terminou.
+
+        `chain` substitui a chain do serviço só neste job (ex: fusão de resumos, com outro prompt).
+        """
+        job = _Job(-priority, next(self._seq), key, inputs, on_result, Future(), time.perf_counter(), chain)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Serviço de sumarização encerrado")
+            self.submitted += 1
+            self._depth += 1
+            self.max_depth = max(self.max_depth, self._depth)
+            # Ainda sob o lock: um `close` concorrente só drena a fila depois deste put
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job.future
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            with self._lock:
+                self._depth -= 1
+                self.in_flight += 1
+            started_at = time.perf_counter()
+            try:
+                result = await (job.chain or self.chain).ainvoke(job.inputs)
+            except asyncio.CancelledError:
+                # `close` durante a chamada: o Future é resolvido como cancelado
+                self._cancel(job)
+                raise
+            except Exception as exc:
+                result = exc
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+            self._finisher.submit(self._finish, job, result, started_at)
+
+    def _finish(self, job: _Job, result: Any, started_at: float):
+        try:
+            if isinstance(result, BaseException):
+                raise result
+            if job.on_result is not None:
+                job.on_result(result)
+        except BaseException as exc:
+            with self._lock:
+                self.errors += 1
+            job.future.set_exception(exc)
+        else:
+            job.future.set_result(result)
+        finally:
+            with self._lock:
+                self.completed += 1
+                self._wait_latencies.append(started_at - job.enqueued_at)
+                self._job_latencies.append(time.perf_counter() - job.enqueued_at)
+
+    def _cancel(self, job: _Job):
+        job.future.cancel()
+        with self._lock:
+            self.cancelled += 1
+
+    @property
+    def depth(self) -> int:
+        """Jobs na fila que ainda não foram pegos por um trabalhador."""
+        return self._depth
+
+    def close(self):
+        """
+        Para os trabalhadores e cancela os Futures dos jobs que não terminaram (na fila ou em andamento).
+
+        Espera os `on_result` já iniciados; `submit` depois do `close` levanta RuntimeError.
+        """
+        with self._lock:
+            self._closed = True
+        asyncio.run_coroutine_threadsafe(self._stop_workers(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._finisher.shutdown(wait=True)
+
+    async def _stop_workers(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        while not self._queue.empty():
+            self._cancel(self._queue.get_nowait())
+            with self._lock:
+                self._depth -= 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            wait_latencies = list(self._wait_latencies)
+            job_latencies = list(self._job_latencies)
+            return {
+                "fila_atual": self._depth,
+                "fila_maxima": self.max_depth,
+                "em_andamento": self.in_flight,
+                "enviados": self.submitted,
+                "concluidos": self.completed,
+                "erros": self.errors,
+                "cancelados": self.cancelled,
+                "espera_p50_s": percentile(wait_latencies, 50),
+                "espera_p99_s": percentile(wait_latencies, 99),
+                "job_p50_s": percentile(job_latencies, 50),
+                "job_p99_s": percentile(job_latencies, 99),
+            }
+
+
+def print_stats(stats: Dict[str, float]):
+    print("--- Serviço de sumarização ---")
+    print(f"Fila: {stats['fila_atual']} (máx {stats['fila_maxima']}) | em andamento: {stats['em_andamento']} | "
+          f"jobs: {stats['concluidos']}/{stats['enviados']} ({stats['erros']} erros, {stats['cancelados']} cancelados)")
+    print(f"Espera na fila: p50 {stats['espera_p50_s']:.2f}s, p99 {stats['espera_p99_s']:.2f}s | "
+          f"job: p50 {stats['job_p50_s']:.2f}s, p99 {stats['job_p99_s']:.2f}s")
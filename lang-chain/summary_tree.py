@@ -0,0 +1,248 @@
+"""
+Memória hierárquica de resumos para conversas muito longas.
+
+- Cada trecho compactado do histórico vira uma folha (nível 0) com o resumo só daquele trecho; nenhum
+  resumo anterior é reenviado ao modelo.
+- Quando um nível passa de `fanout` nós, os `fanout` mais antigos são fundidos em um nó do nível acima
+  (e assim por diante). A folha entra só em memória (`add_leaf`); as fusões, que chamam o LLM, ficam para
+  depois (`merge_overflow`, ou `next_merge` + `apply_merge` quando o chamador agenda a chamada). Cada trecho passa por no máximo uma fusão por nível: o custo de sumarização cresce
+  com log(trechos), e a árvore guarda no máximo `fanout + 1` nós por nível.
+- A cada turno, `retrieve(query)` devolve só os `top_k` nós mais similares à pergunta (cosseno dos embeddings)
+  mais a folha mais recente, em ordem cronológica: o bloco de memória no prompt tem tamanho limitado.
+- `SummaryTreeExtra` grava a árvore no SQLite do SessionStore (tabela `arvores_resumo`, uma linha por sessão):
+  o histórico compactado não guarda mais os resumos, então a árvore é carregada e despejada junto dele.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from embeddings import encode
+from session_store import SessionExtra
+from token_counter import count_tokens
+
+
+@dataclass
+class SummaryNode:
+    text: str
+    level: int
+    first_chunk: int  # primeiro trecho coberto (contado desde o início da conversa)
+    last_chunk: int
+    tokens: int
+    embedding: np.ndarray
+
+
+class SummaryTree:
+    """
+    Árvore de resumos de uma sessão.
+
+    Args:
+        merge_summaries: Funde textos de resumos (em ordem cronológica) em um único resumo (chamada ao LLM).
+        fanout: Nós por nível antes de uma fusão.
+        encode_fn: Gera os embeddings normalizados de uma lista de textos.
+    """
+
+    def __init__(
+        self,
+        merge_summaries: Callable[[List[str]], str],
+        fanout: int = 4,
+        encode_fn: Callable[[List[str]], np.ndarray] = encode,
+    ):
+        if fanout < 2:
+            raise ValueError("fanout deve ser pelo menos 2")
+        self.merge_summaries = merge_summaries
+        self.fanout = fanout
+        self.encode_fn = encode_fn
+        self.levels: List[List[SummaryNode]] = []
+        self.chunks = 0
+        self.merges = 0
+        self.retrieve_seconds = 0.0
+        self.retrievals = 0
+        self._lock = threading.Lock()  # leitura/troca dos níveis (rápido); o LLM nunca é chamado com ele
+        # Chamado após cada alteração (ex: o SessionStore marca a árvore para gravação)
+        self.on_change: Optional[Callable[[], None]] = None
+
+    def _node(self, text: str, level: int, first_chunk: int, last_chunk: int) -> SummaryNode:
+        return SummaryNode(text, level, first_chunk, last_chunk, count_tokens(text), self.encode_fn([text])[0])
+
+    def add_leaf(self, text: str, embedding: Optional[np.ndarray] = None):
+        """
+        Acrescenta o resumo de um trecho como folha, sem fundir níveis (ver `merge_overflow`).
+
+        `embedding` permite calcular o embedding antes, fora do lock do chamador: a inserção fica só em memória.
+        """
+        if embedding is None:
+            embedding = self.encode_fn([text])[0]
+        tokens = count_tokens(text)
+        with self._lock:
+            if not self.levels:
+                self.levels.append([])
+            self.levels[0].append(SummaryNode(text, 0, self.chunks, self.chunks, tokens, embedding))
+            self.chunks += 1
+        self._changed()
+
+    def next_merge(self) -> Optional[List[SummaryNode]]:
+        """Os `fanout` nós mais antigos do primeiro nível que passou de `fanout` nós, ou None."""
+        with self._lock:
+            for level in self.levels:
+                if len(level) > self.fanout:
+                    return level[: self.fanout]
+        return None
+
+    def apply_merge(self, group: List[SummaryNode], text: str) -> bool:
+        """
+        Troca o grupo de `next_merge` pelo nó fundido `text` no nível acima.
+
+        Retorna False (e descarta a fusão) se o grupo mudou desde `next_merge` (ex: `clear` ou outra fusão).
+        """
+        merged = self._node(text, group[0].level + 1, group[0].first_chunk, group[-1].last_chunk)
+        with self._lock:
+            level = group[0].level
+            current = self.levels[level][: len(group)] if level < len(self.levels) else []
+            if len(current) != len(group) or any(a is not b for a, b in zip(current, group)):
+                return False
+            del self.levels[level][: len(group)]
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            self.levels[level + 1].append(merged)
+            self.merges += 1
+        self._changed()
+        return True
+
+    def merge_overflow(self):
+        """Funde os níveis que passaram de `fanout` nós, chamando `merge_summaries` (LLM) a cada fusão."""
+        while True:
+            group = self.next_merge()
+            if group is None:
+                return
+            # Fusão fora do lock: os turnos continuam recuperando os nós atuais enquanto o LLM responde
+            self.apply_merge(group, self.merge_summaries([node.text for node in group]))
+
+    def nodes(self) -> List[SummaryNode]:
+        with self._lock:
+            return [node for level in self.levels for node in level]
+
+    def snapshot(self) -> Tuple[List[SummaryNode], int, int]:
+        """(nós, trechos, fusões) lidos de uma vez, para gravar a árvore."""
+        with self._lock:
+            return [node for level in self.levels for node in level], self.chunks, self.merges
+
+    def retrieve(self, query: str, top_k: int = 3, query_embedding: Optional[np.ndarray] = None) -> List[SummaryNode]:
+        """
+        Nós mais relevantes para `query` + a folha mais recente, do trecho mais antigo ao mais recente.
+
+        `query_embedding` evita recalcular o embedding da pergunta quando o chamador já o tem.
+        """
+        start_time = time.perf_counter()
+        with self._lock:
+            nodes = [node for level in self.levels for node in level]
+            latest = self.levels[0][-1] if self.levels and self.levels[0] else None
+        if len(nodes) <= top_k + 1:
+            selected = nodes
+        else:
+            if query_embedding is None:
+                query_embedding = self.encode_fn([query])[0]
+            scores = np.stack([node.embedding for node in nodes]) @ query_embedding
+            selected = [nodes[i] for i in np.argsort(-scores)[:top_k]]
+            if latest is not None and all(node is not latest for node in selected):
+                # A folha mais recente dá a continuidade com a janela de mensagens do histórico
+                selected.append(latest)
+        self.retrieve_seconds += time.perf_counter() - start_time
+        self.retrievals += 1
+        return sorted(selected, key=lambda node: (node.first_chunk, -node.level))
+
+    def restore(self, nodes: List[SummaryNode], chunks: int, merges: int):
+        """Recoloca nós gravados (ex: carga fria da sessão), sem chamar o LLM nem recalcular embeddings."""
+        with self._lock:
+            self.levels = [[] for _ in range(max((node.level for node in nodes), default=-1) + 1)]
+            for node in nodes:
+                self.levels[node.level].append(node)
+            self.chunks = chunks
+            self.merges = merges
+
+    def clear(self):
+        with self._lock:
+            self.levels.clear()
+            self.chunks = self.merges = self.retrievals = 0
+            self.retrieve_seconds = 0.0
+        self._changed()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            per_level = [len(level) for level in self.levels]
+            tokens = sum(node.tokens for level in self.levels for node in level)
+        return {
+            "trechos": self.chunks,
+            "fusoes": self.merges,
+            # Chamadas de sumarização: uma por trecho (folha) + uma por fusão
+            "chamadas_sumarizacao": self.chunks + self.merges,
+            "nos_por_nivel": per_level,
+            "tokens_na_arvore": tokens,
+            "recuperacao_media_ms": self.retrieve_seconds / self.retrievals * 1000 if self.retrievals else 0.0,
+        }
+
+
+class SummaryTreeExtra(SessionExtra):
+    """
+    Persistência da árvore de cada sessão no SessionStore.
+
+    Uma linha por sessão: os nós (texto, nível, trechos, tokens) em JSON e os embeddings empilhados em float32,
+    na mesma ordem. A árvore tem no máximo `fanout + 1` nós por nível, então regravá-la inteira a cada
+    compactação é barato.
+
+    Args:
+        tree_factory: Cria uma árvore vazia (com a função de fusão e o fanout do chamador).
+    """
+
+    name = "arvore_resumos"
+
+    def __init__(self, tree_factory: Callable[[], SummaryTree]):
+        self.tree_factory = tree_factory
+
+    def create_tables(self, db: sqlite3.Connection):
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS arvores_resumo "
+            "(session_id TEXT PRIMARY KEY, dados TEXT NOT NULL, embeddings BLOB NOT NULL)"
+        )
+
+    def load(self, db: sqlite3.Connection, session_id: str) -> SummaryTree:
+        tree = self.tree_factory()
+        row = db.execute("SELECT dados, embeddings FROM arvores_resumo WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return tree
+        data = json.loads(row[0])
+        embeddings = np.frombuffer(row[1], dtype="float32")
+        if data["nodes"]:
+            embeddings = embeddings.reshape(len(data["nodes"]), -1)
+        nodes = [SummaryNode(**fields, embedding=embedding) for fields, embedding in zip(data["nodes"], embeddings)]
+        tree.restore(nodes, data["chunks"], data["merges"])
+        return tree
+
+    def save(self, db: sqlite3.Connection, session_id: str, tree: SummaryTree):
+        nodes, chunks, merges = tree.snapshot()
+        if not nodes:
+            db.execute("DELETE FROM arvores_resumo WHERE session_id = ?", (session_id,))
+            return
+        data = {
+            "chunks": chunks,
+            "merges": merges,
+            "nodes": [
+                {"text": n.text, "level": n.level, "first_chunk": n.first_chunk, "last_chunk": n.last_chunk, "tokens": n.tokens}
+                for n in nodes
+            ],
+        }
+        embeddings = np.stack([node.embedding for node in nodes]).astype("float32").tobytes()
+        db.execute(
+            "INSERT INTO arvores_resumo (session_id, dados, embeddings) VALUES (?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET dados = excluded.dados, embeddings = excluded.embeddings",
+            (session_id, json.dumps(data, ensure_ascii=False), embeddings),
+        )
@@ -0,0 +1,33 @@
+"""
+Contagem local e rápida de tokens para o orçamento do histórico.
+
+Usa o tiktoken (dependência do langchain-openai) com o encoding o200k_base, o mesmo vocabulário base do
+gpt-oss; para modelos com outro tokenizer o valor é uma aproximação, suficiente para decidir quando compactar.
+"""
+
+from functools import lru_cache
+
+import tiktoken
+from langchain_core.messages import BaseMessage
+
+ENCODING = "o200k_base"
+TOKENS_PER_MESSAGE = 4  # role e delimitadores do chat template
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> tiktoken.Encoding:
+    return tiktoken.get_encoding(ENCODING)
+
+
+def count_tokens(text: str) -> int:
+    return len(_encoding().encode(text, disallowed_special=()))
+
+
+def message_text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in message.content)
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    return count_tokens(message_text(message)) + TOKENS_PER_MESSAGE
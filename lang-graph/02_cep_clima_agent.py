@@ -9,25 +9,18 @@ import re
 import requests
 
 # LangGraph / LangChain imports
-from langchain.chat_models import init_chat_model
 from langchain_core.tools import tool
 from langgraph.prebuilt import create_react_agent
 
+from cliente_llm import chat_openai
+
 # ---------- Configurações ----------
-LM_STUDIO_BASE = "http://localhost:1234/v1"  # ajuste se necessário
-LM_STUDIO_API_KEY = "lm-studio"  # pode ser qualquer string para LM Studio compatível
+# URL e chave do LM Studio vêm de LMSTUDIO_BASE_URL / LMSTUDIO_API_KEY (padrão: http://localhost:1234/v1)
 MODEL_NAME = "openai/gpt-oss-20b"  # conforme solicitado
 # ------------------------------------
 
-# Inicializa o LLM via LangChain helper (usa a API compatível OpenAI do LM Studio).
-# init_chat_model padroniza a criação de modelos (aceita base_url para provedores compatíveis).
-llm = init_chat_model(
-    model=MODEL_NAME,
-    model_provider="openai",
-    base_url=LM_STUDIO_BASE,
-    api_key=LM_STUDIO_API_KEY,
-    temperature=0.0,
-)
+# Inicializa o LLM com o cliente compartilhado (API compatível OpenAI do LM Studio, pool keep-alive e retry).
+llm = chat_openai(MODEL_NAME, "lmstudio", temperature=0.0)
 
 # ---------- Tools / Funções expostas ao agente ----------
 
@@ -3,15 +3,12 @@ from typing import List, TypedDict
 import requests
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph
 
+from cliente_llm import chat_openai
+
 # Config for LM Studio
-llm = ChatOpenAI(
-    base_url="http://localhost:1234/v1",
-    model="openai/gpt-oss-20b",
-    temperature=0.7
-)
+llm = chat_openai("openai/gpt-oss-20b", "lmstudio", temperature=0.7)
 
 # Types for our state
 class AgentState(TypedDict):
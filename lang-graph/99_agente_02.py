@@ -2,10 +2,11 @@ from typing import Annotated, Sequence, TypedDict, Union
 from langgraph.graph import StateGraph, END
 import json
 import requests
-from openai import OpenAI
+
+from cliente_llm import obter_cliente
 
 # Configuração do cliente OpenAI
-client = OpenAI()
+client = obter_cliente("openai")
 
 # Tipos de mensagens
 class Message(TypedDict):
@@ -1,26 +1,19 @@
 import os
-from openai import OpenAI
 from openai.types.chat import ChatCompletionUserMessageParam
 
-print(".:: Open AI Playground ::.")
-
-# OpenAI
-# LLM_PROVIDER_API_KEY = os.getenv("OPENAI_API_KEY")
-
-# AWS Bedrock
-LLM_PROVIDER_BASE_URL = os.getenv("AWS_BEDROCK_BASE_URL")
-LLM_PROVIDER_API_KEY = os.getenv("AWS_BEARER_TOKEN_BEDROCK")
-# LLM_PROVIDER_BASE_URL = "https://bedrock-runtime.us-east-1.api.aws/v1"
+from cliente_llm import CacheRespostas, MedidorTokens, obter_cliente
+from cliente_llm.cache_respostas import resumo_estatisticas
 
-# Lite LLM (localhost)
-# LLM_PROVIDER_BASE_URL = "http://0.0.0.0:4000"
-
-# Microsoft Foundry
-# LLM_PROVIDER_BASE_URL = os.getenv("AZURE_FOUNDRY_BASE_URL")
-# LLM_PROVIDER_API_KEY = os.getenv("AZURE_FOUNDRY_API_KEY")
-# MODEL = "Kimi-K2.5" # deployment name
+print(".:: Open AI Playground ::.")
 
-client = OpenAI(api_key=LLM_PROVIDER_API_KEY, base_url=LLM_PROVIDER_BASE_URL)
+# Provedor escolhido por LLM_PROVIDER: bedrock, openai, foundry, litellm ou lmstudio.
+# Sem LLM_PROVIDER, vale o comportamento original deste script: AWS Bedrock quando AWS_BEDROCK_BASE_URL
+# está definida, senão a API da OpenAI (OPENAI_API_KEY).
+# URLs e chaves vêm das variáveis de ambiente de cada provedor (ver cliente_llm/provedores.py):
+# - AWS Bedrock: AWS_BEDROCK_BASE_URL (ex: https://bedrock-runtime.us-east-1.api.aws/v1), AWS_BEARER_TOKEN_BEDROCK
+# - Microsoft Foundry: AZURE_FOUNDRY_BASE_URL, AZURE_FOUNDRY_API_KEY (MODEL = nome do deployment, ex: "Kimi-K2.5")
+# - Lite LLM (localhost): http://0.0.0.0:4000
+client = obter_cliente(os.getenv("LLM_PROVIDER") or ("bedrock" if os.getenv("AWS_BEDROCK_BASE_URL") else "openai"))
 
 MODEL = "openai.gpt-oss-20b"
 # MODEL = "openai.gpt-oss-120b"
@@ -41,19 +34,38 @@ MODEL = "openai.gpt-oss-20b"
 # )
 # print(response.output_text)
 
-response = client.chat.completions.create(
+# Cache de respostas: perguntas repetidas (após normalização) não voltam ao LLM.
+# limiar_semantico (ex: 0.92) também reaproveita perguntas parecidas (requer sentence-transformers).
+cache = CacheRespostas(ttl_segundos=3600, limiar_semantico=None)
+
+# Contabilidade de tokens: só as chamadas que chegam ao provedor (misses do cache) passam pelo medidor
+medidor = MedidorTokens()
+client_medido = medidor.envolver(client)
+
+response = cache.completar(
+    client_medido,
     model=MODEL,
     messages=[ChatCompletionUserMessageParam(role="user", content="Qual a capital do Brasil?")]
     # Evite parâmetros como 'response_format' se o erro persistir
 )
 print(response.choices[0].message.content)
 
+# A mesma pergunta com outra grafia é servida pelo cache (não chega ao medidor)
+cache.completar(client_medido, model=MODEL, messages=[ChatCompletionUserMessageParam(role="user", content="qual a capital do  brasil?")])
+
 print()
 print("Usage tokens")
 print("------------")
-print(f"prompt_tokens: {response.usage.prompt_tokens}")
-print(f"completion_tokens: {response.usage.completion_tokens}")
-print(f"total_tokens: {response.usage.total_tokens}")
+uso = medidor.resumo()["modelos"][MODEL]
+print(f"requisicoes: {uso['requisicoes']}")
+print(f"prompt_tokens: {uso['prompt']}")
+print(f"completion_tokens: {uso['completion']} (raciocínio: {uso['raciocinio']})")
+print(f"total_tokens: {uso['prompt'] + uso['completion']}")
+print()
+print("Cache de respostas")
+print("------------------")
+for linha in resumo_estatisticas(cache.estatisticas()):
+    print(linha)
 
 # output
 # A capital do Brasil é Brasília.
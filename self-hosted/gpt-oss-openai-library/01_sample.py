@@ -1,9 +1,10 @@
-from openai import OpenAI
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
 
+from cliente_llm import obter_cliente
+
 print(".:: self-hosted / gpt-oss-openai-library / 01_sample.py ::.")
 
-client = OpenAI(base_url="http://localhost:1234/v1")
+client = obter_cliente("lmstudio")
 
 response = client.chat.completions.create(
     model="openai/gpt-oss-20b",
@@ -1,8 +1,8 @@
-from openai import OpenAI
+from cliente_llm import obter_cliente
 
 print(".:: self-hosted / gpt-oss-openai-library / 02_tools_websearch.py ::.")
 
-client = OpenAI(base_url="http://localhost:1234/v1")
+client = obter_cliente("lmstudio")
 
 response = client.responses.create(
     model="openai/gpt-oss-20b",
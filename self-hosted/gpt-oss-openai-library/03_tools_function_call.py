@@ -1,8 +1,8 @@
-from openai import OpenAI
+from cliente_llm import obter_cliente
 
 print(".:: self-hosted / gpt-oss-openai-library / 03_tools_function_call.py ::.")
 
-client = OpenAI(base_url="http://localhost:1234/v1")
+client = obter_cliente("lmstudio")
 
 def get_weather(location):
     return f"{location}: Temperatura atual é 30º (Fake function call)."
@@ -1,7 +1,7 @@
-from openai import OpenAI
+from cliente_llm import obter_cliente
 
 # Connect to LM Studio
-client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
+client = obter_cliente("lmstudio")
 
 # Define a simple function
 def say_hello(name: str) -> str:
@@ -0,0 +1,296 @@
+"""
+Analisador léxico para português (PT-BR) usado pela busca BM25.
+
+Pipeline: casefold -> remoção de acentos -> tokenização -> stopwords -> stemmer estilo RSLP.
+
+- A remoção de acentos usa uma tabela de `str.translate` pré-calculada, aplicada ao corpus inteiro de uma vez.
+- A tokenização usa uma única regex compilada.
+- Os radicais são memoizados: em um corpus real o vocabulário é muito menor que o número de tokens,
+  então cada palavra distinta passa pelo stemmer apenas uma vez.
+
+O stemmer segue os passos do RSLP (Removedor de Sufixos da Língua Portuguesa, Orengo & Huyck 2001):
+plural, feminino, advérbio, aumentativo/diminutivo, sufixo nominal, sufixo verbal e vogal temática.
+As regras operam sobre o texto já sem acentos e cobrem os sufixos mais frequentes, não a tabela completa.
+"""
+
+import re
+import time
+import unicodedata
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# Separador usado para processar o corpus inteiro como uma única string
+_SEPARADOR_DOCS = "\x00"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _criar_tabela_sem_acentos() -> Dict[int, str]:
+    """Mapeia caracteres latinos acentuados para a letra base (ex: 'ç' -> 'c', 'ã' -> 'a')."""
+    tabela = {}
+    for codigo in range(0xC0, 0x250):
+        caractere = chr(codigo)
+        base = unicodedata.normalize("NFKD", caractere)[0]
+        if base != caractere and base.isascii():
+            tabela[codigo] = base
+    return tabela
+
+
+_TABELA_SEM_ACENTOS = _criar_tabela_sem_acentos()
+
+
+def remover_acentos(texto: str) -> str:
+    """Remove acentos de um texto (ex: "Atualização" -> "Atualizacao")."""
+    return texto.translate(_TABELA_SEM_ACENTOS)
+
+
+STOPWORDS_PT: FrozenSet[str] = frozenset(
+    remover_acentos(palavra)
+    for palavra in """
+    a ao aos aquela aquelas aquele aqueles aquilo as até com como da das de dela delas dele deles depois
+    do dos e ela elas ele eles em entre era eram essa essas esse esses esta estas este estes eu foi foram
+    há isso isto já la lhe lhes mais mas me mesmo meu meus minha minhas muito na nas nem no nos nós nossa
+    nossas nosso nossos num numa o os ou para pela pelas pelo pelos por qual quando que quem se sem ser
+    seu seus só sua suas também te tem têm teu teus tu tua tuas um uma umas uns você vocês vos à às é
+    está estão ser são sou vai
+    """.split()
+)
+
+
+# Regras: (sufixo, tamanho mínimo do radical, substituição, exceções)
+_Regra = Tuple[str, int, str, FrozenSet[str]]
+
+
+def _regras(*regras: tuple) -> List[_Regra]:
+    """Converte as regras para `_Regra`; a tupla de exceções é opcional."""
+    convertidas = []
+    for regra in regras:
+        sufixo, tamanho_minimo, substituicao = regra[:3]
+        excecoes = regra[3] if len(regra) > 3 else ()
+        convertidas.append((sufixo, tamanho_minimo, substituicao, frozenset(excecoes)))
+    return convertidas
+
+
+_REGRAS_PLURAL = _regras(
+    ("ns", 1, "m"),
+    ("oes", 3, "ao"),
+    ("aes", 1, "ao", ("maes",)),
+    ("ais", 1, "al", ("cais", "mais")),
+    ("eis", 2, "el"),
+    ("ois", 2, "ol"),
+    ("is", 2, "il", ("lapis", "cais", "mais", "crucis", "biquinis", "pois", "depois", "dois", "leis")),
+    ("les", 3, "l"),
+    ("res", 3, "r"),
+    ("s", 2, "", ("alias", "pires", "lapis", "cais", "mais", "mas", "menos", "ferias", "fezes", "pesames",
+                  "crucis", "gas", "atras", "moises", "atraves", "conves", "pais", "apos", "ambas", "ambos",
+                  "messias")),
+)
+
+_REGRAS_FEMININO = _regras(
+    ("ona", 3, "ao"),
+    ("ora", 3, "or"),
+    ("inha", 3, "inho"),
+    ("esa", 3, "es"),
+    ("osa", 3, "oso"),
+    ("iaca", 3, "iaco"),
+    ("ica", 3, "ico"),
+    ("ada", 2, "ado"),
+    ("ida", 3, "ido"),
+    ("ima", 3, "imo"),
+    ("iva", 3, "ivo"),
+    ("eira", 3, "eiro"),
+)
+
+_REGRAS_ADVERBIO = _regras(
+    ("mente", 4, "", ("experimente",)),
+)
+
+_REGRAS_AUMENTATIVO = _regras(
+    ("dissimo", 5, ""),
+    ("abilissimo", 5, ""),
+    ("issimo", 3, ""),
+    ("esimo", 3, ""),
+    ("errimo", 4, ""),
+    ("zinho", 2, ""),
+    ("quinho", 4, "c"),
+    ("uinho", 4, ""),
+    ("adinho", 3, ""),
+    ("inho", 3, "", ("caminho", "cominho")),
+    ("alhao", 4, ""),
+    ("uca", 4, ""),
+    ("aca", 4, ""),
+    ("zao", 2, ""),
+)
+
+_REGRAS_NOMINAL = _regras(
+    ("encialista", 4, ""),
+    ("alista", 5, ""),
+    ("agem", 3, "", ("coragem", "chantagem", "vantagem", "carruagem")),
+    ("iamento", 4, ""),
+    ("amento", 3, "", ("firmamento", "fundamento", "departamento")),
+    ("imento", 3, ""),
+    ("mento", 6, "", ("firmamento", "elemento", "complemento", "instrumento", "departamento")),
+    ("alizado", 4, ""),
+    ("atizado", 4, ""),
+    ("izado", 5, "", ("organizado", "pulverizado")),
+    ("ativo", 4, "", ("pejorativo", "relativo")),
+    ("tivo", 4, "", ("relativo",)),
+    ("ivo", 4, "", ("passivo", "possessivo", "pejorativo", "positivo")),
+    ("ado", 2, "", ("grado",)),
+    ("ido", 3, "", ("candido", "consolido", "rapido", "decido", "timido", "duvido", "marido")),
+    ("ador", 3, ""),
+    ("edor", 3, ""),
+    ("idor", 4, "", ("ouvidor",)),
+    ("atoria", 5, ""),
+    ("tor", 3, "", ("benfeitor", "leitor", "editor", "pastor", "produtor", "promotor", "consultor")),
+    ("or", 2, "", ("motor", "melhor", "redor", "rigor", "sensor", "tambor", "tumor", "assessor", "benfeitor",
+                   "pastor", "terior", "favor", "autor")),
+    ("abilidade", 5, ""),
+    ("icionista", 4, ""),
+    ("cionista", 5, ""),
+    ("ionista", 5, ""),
+    ("ionar", 5, ""),
+    ("ional", 4, ""),
+    ("encia", 3, ""),
+    ("ancia", 4, "", ("ambulancia",)),
+    ("edouro", 3, ""),
+    ("queiro", 3, "c"),
+    ("adeiro", 4, "", ("desfiladeiro",)),
+    ("eiro", 3, "", ("desfiladeiro", "pioneiro", "mosteiro")),
+    ("uoso", 3, ""),
+    ("oso", 3, "", ("precioso",)),
+    ("alizacao", 5, ""),
+    ("atizacao", 5, ""),
+    ("tizacao", 5, ""),
+    ("izacao", 5, "", ("organizacao",)),
+    ("acao", 3, "", ("equacao", "relacao")),
+    ("icao", 3, "", ("eleicao",)),
+    ("ucao", 3, ""),
+    ("ario", 3, "", ("voluntario", "salario", "aniversario", "diario", "lionario", "armario")),
+    ("atorio", 3, ""),
+    ("rio", 5, "", ("voluntario", "salario", "aniversario", "diario", "compulsorio", "lionario", "proprio",
+                    "sterio", "armario")),
+    ("eria", 4, ""),
+    ("ismo", 3, "", ("cinismo",)),
+    ("ista", 4, "", ("artista", "conquista")),
+    ("idade", 4, "", ("autoridade", "comunidade")),
+    ("ante", 2, "", ("gigante", "elefante", "adiante", "possante", "instante", "restaurante")),
+    ("ivel", 5, "", ("movel",)),
+    ("avel", 2, "", ("afavel", "razoavel", "potavel", "vulneravel")),
+    ("al", 4, "", ("afinal", "animal", "estatal", "bissexual", "desleal", "fiscal", "formal", "pessoal",
+                   "liberal", "postal", "virtual", "visual", "pontual", "sideral", "sucursal")),
+    ("ico", 4, "", ("tico", "publico", "explico")),
+    ("ica", 4, "", ("unica",)),
+    ("ez", 4, ""),
+    ("eza", 3, ""),
+    ("ezia", 3, ""),
+    ("esco", 4, ""),
+)
+
+_REGRAS_VERBAL = _regras(
+    ("ariamos", 2, ""), ("eriamos", 2, ""), ("iriamos", 3, ""), ("assemos", 2, ""), ("essemos", 2, ""),
+    ("issemos", 3, ""), ("aremos", 2, ""), ("eremos", 2, ""), ("iremos", 3, ""), ("avamos", 2, ""),
+    ("ariam", 2, ""), ("eriam", 2, ""), ("iriam", 3, ""), ("assem", 2, ""), ("essem", 2, ""), ("issem", 3, ""),
+    ("ando", 2, ""), ("endo", 3, ""), ("indo", 3, ""), ("ondo", 3, ""), ("aram", 2, ""), ("eram", 3, ""),
+    ("iram", 3, ""), ("avam", 2, ""), ("aria", 2, ""), ("eria", 2, ""), ("iria", 3, ""), ("asse", 2, ""),
+    ("esse", 2, ""), ("isse", 3, ""), ("amos", 2, ""), ("emos", 2, ""), ("imos", 3, ""),
+    ("ada", 2, ""), ("ida", 3, ""), ("ado", 2, ""), ("ido", 3, ""), ("ava", 2, ""), ("ara", 2, ""),
+    ("era", 3, ""), ("ira", 3, ""), ("ais", 2, ""), ("eis", 2, ""), ("ias", 3, ""), ("ei", 3, ""),
+    ("am", 2, ""), ("em", 2, ""), ("ar", 2, ""), ("er", 2, ""), ("ir", 3, ""), ("as", 2, ""), ("es", 3, ""),
+    ("is", 3, ""), ("eu", 3, ""), ("iu", 3, ""), ("ou", 3, ""), ("ia", 3, ""),
+)
+
+_REGRAS_VOGAL = _regras(
+    ("a", 3, ""),
+    ("e", 3, ""),
+    ("o", 3, ""),
+)
+
+
+def _aplicar_regras(palavra: str, regras: List[_Regra]) -> Tuple[str, bool]:
+    """Aplica a primeira regra cujo sufixo casa com a palavra. Retorna (palavra, houve_remocao)."""
+    for sufixo, tamanho_minimo, substituicao, excecoes in regras:
+        if palavra.endswith(sufixo) and len(palavra) - len(sufixo) >= tamanho_minimo:
+            if palavra in excecoes:
+                return palavra, False
+            return palavra[: len(palavra) - len(sufixo)] + substituicao, True
+    return palavra, False
+
+
+def stem_rslp(palavra: str) -> str:
+    """Reduz uma palavra (minúscula e sem acentos) ao radical, no estilo do RSLP."""
+    if palavra.endswith("s"):
+        palavra, _ = _aplicar_regras(palavra, _REGRAS_PLURAL)
+    if palavra.endswith("a"):
+        palavra, _ = _aplicar_regras(palavra, _REGRAS_FEMININO)
+    palavra, _ = _aplicar_regras(palavra, _REGRAS_ADVERBIO)
+    palavra, _ = _aplicar_regras(palavra, _REGRAS_AUMENTATIVO)
+
+    palavra, removido = _aplicar_regras(palavra, _REGRAS_NOMINAL)
+    if not removido:
+        palavra, removido = _aplicar_regras(palavra, _REGRAS_VERBAL)
+    if not removido:
+        palavra, _ = _aplicar_regras(palavra, _REGRAS_VOGAL)
+    return palavra
+
+
+class AnalisadorPT:
+    """
+    Pipeline de análise léxica para PT-BR com stemming memoizado.
+
+    Args:
+        stopwords: Conjunto de stopwords (já sem acentos). `None` usa `STOPWORDS_PT`.
+        usar_stemmer: Aplica o stemmer estilo RSLP nos tokens.
+    """
+
+    def __init__(self, stopwords: Optional[Iterable[str]] = None, usar_stemmer: bool = True):
+        self.stopwords = frozenset(STOPWORDS_PT if stopwords is None else stopwords)
+        self.usar_stemmer = usar_stemmer
+        self._radicais: Dict[str, str] = {}
+        self.ultimo_throughput = 0.0  # docs/s da última chamada a analisar_corpus
+
+    def analisar(self, texto: str) -> List[str]:
+        """Analisa um único texto (ex: a query)."""
+        return self._tokens_para_termos(_TOKEN_RE.findall(remover_acentos(texto.casefold())))
+
+    def analisar_corpus(self, documentos: List[str]) -> List[List[str]]:
+        """
+        Analisa o corpus inteiro em lote.
+
+        Casefold e remoção de acentos são feitos uma única vez sobre o corpus concatenado,
+        e o throughput (docs/s) fica disponível em `ultimo_throughput`.
+        """
+        if not documentos:
+            self.ultimo_throughput = 0.0
+            return []
+
+        inicio = time.perf_counter()
+
+        corpus = remover_acentos(_SEPARADOR_DOCS.join(documentos).casefold())
+        termos = [self._tokens_para_termos(_TOKEN_RE.findall(doc)) for doc in corpus.split(_SEPARADOR_DOCS)]
+
+        duracao = time.perf_counter() - inicio
+        self.ultimo_throughput = len(documentos) / duracao if duracao > 0 else float("inf")
+        return termos
+
+    def radical(self, token: str) -> str:
+        """Retorna o radical memoizado de um token."""
+        radical = self._radicais.get(token)
+        if radical is None:
+            radical = self._radicais[token] = stem_rslp(token)
+        return radical
+
+    def _tokens_para_termos(self, tokens: List[str]) -> List[str]:
+        stopwords = self.stopwords
+        if not self.usar_stemmer:
+            return [t for t in tokens if t not in stopwords]
+
+        radicais = self._radicais
+        termos = []
+        for token in tokens:
+            if token in stopwords:
+                continue
+            radical = radicais.get(token)
+            if radical is None:
+                radical = radicais[token] = stem_rslp(token)
+            termos.append(radical)
+        return termos
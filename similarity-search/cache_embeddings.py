@@ -0,0 +1,141 @@
+"""
+Cache LRU/TTL de embeddings de queries.
+
+Em produção as mesmas perguntas se repetem muito ("Como posso resetar minha senha?"),
+e cada chamada a `model.encode` custa o forward completo do modelo. Este cache fica na
+frente do encoder e devolve o embedding já calculado quando a mesma query (normalizada)
+chega novamente para o mesmo modelo.
+
+- Chave: (nome do modelo, texto normalizado da query).
+- Memória limitada por número de entradas e por bytes dos vetores armazenados.
+- Expiração opcional por TTL.
+- Estatísticas de hit rate e latência economizada.
+"""
+
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+
+def normalizar_query(texto: str) -> str:
+    """Normaliza a query para uso como chave (NFC, casefold e espaços colapsados)."""
+    texto = unicodedata.normalize("NFC", texto)
+    return re.sub(r"\s+", " ", texto).strip().casefold()
+
+
+class CacheEmbeddingsQuery:
+    """
+    Cache LRU de embeddings de query com limite de memória e TTL opcional.
+
+    Args:
+        max_entradas: Número máximo de embeddings armazenados.
+        max_bytes: Limite de memória (soma de `nbytes` dos vetores armazenados).
+        ttl_segundos: Tempo de vida de cada entrada. `None` desativa a expiração.
+        relogio: Função de tempo (injetável para testes/replay).
+    """
+
+    def __init__(
+        self,
+        max_entradas: int = 10_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_segundos: Optional[float] = None,
+        relogio: Callable[[], float] = time.perf_counter,
+    ):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.ttl_segundos = ttl_segundos
+        self._relogio = relogio
+        self._entradas: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, float]]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.expirados = 0
+        self.despejados = 0
+        self._tempo_encode_misses = 0.0
+        self._tempo_lookup_hits = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def obter_ou_codificar(self, model, modelo_nome: str, query: str) -> np.ndarray:
+        """
+        Retorna o embedding (1-D) da query, consultando o cache antes do encoder.
+
+        O array retornado é somente leitura; quem precisar alterá-lo (ex: `faiss.normalize_L2`)
+        deve trabalhar sobre uma cópia (`astype` já copia).
+        """
+        inicio = self._relogio()
+        chave = (modelo_nome, normalizar_query(query))
+
+        entrada = self._entradas.get(chave)
+        if entrada is not None:
+            embedding, criado_em = entrada
+            if self.ttl_segundos is None or inicio - criado_em <= self.ttl_segundos:
+                self._entradas.move_to_end(chave)
+                self.hits += 1
+                self._tempo_lookup_hits += self._relogio() - inicio
+                return embedding
+            self._remover(chave)
+            self.expirados += 1
+
+        embedding = np.asarray(model.encode(query))
+        embedding.flags.writeable = False
+        fim = self._relogio()
+        self.misses += 1
+        self._tempo_encode_misses += fim - inicio
+
+        self._inserir(chave, embedding, fim)
+        return embedding
+
+    def limpar(self):
+        """Remove todas as entradas e zera as estatísticas."""
+        self._entradas.clear()
+        self._bytes = 0
+        self.hits = self.misses = self.expirados = self.despejados = 0
+        self._tempo_encode_misses = self._tempo_lookup_hits = 0.0
+
+    def estatisticas(self) -> Dict[str, float]:
+        """
+        Retorna hit rate, ocupação e latência economizada.
+
+        A latência economizada é estimada como `hits * tempo médio de encode dos misses`,
+        descontando o tempo gasto nos lookups que acertaram.
+        """
+        total = self.hits + self.misses
+        tempo_medio_encode = self._tempo_encode_misses / self.misses if self.misses else 0.0
+        tempo_economizado = max(0.0, self.hits * tempo_medio_encode - self._tempo_lookup_hits)
+        return {
+            "requisicoes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "expirados": self.expirados,
+            "despejados": self.despejados,
+            "entradas": len(self._entradas),
+            "bytes": self._bytes,
+            "tempo_medio_encode": tempo_medio_encode,
+            "tempo_economizado": tempo_economizado,
+        }
+
+    def _inserir(self, chave: Tuple[str, str], embedding: np.ndarray, criado_em: float):
+        if chave in self._entradas:
+            self._remover(chave)
+        if embedding.nbytes > self.max_bytes:
+            return
+
+        self._entradas[chave] = (embedding, criado_em)
+        self._bytes += embedding.nbytes
+
+        while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+            chave_antiga = next(iter(self._entradas))
+            self._remover(chave_antiga)
+            self.despejados += 1
+
+    def _remover(self, chave: Tuple[str, str]):
+        embedding, _ = self._entradas.pop(chave)
+        self._bytes -= embedding.nbytes
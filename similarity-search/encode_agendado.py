@@ -0,0 +1,110 @@
+"""
+Encode do corpus com agrupamento por tamanho (length bucketing) e batch adaptativo.
+
+`model.encode(base_conhecimento)` usa batch fixo (32). Em um corpus que mistura passagens curtas e longas,
+cada batch é preenchido (padding) até o maior texto dele, e o custo do forward é proporcional a
+`tamanho do batch x maior texto`. Aqui os textos são:
+
+1. tokenizados uma vez para obter o tamanho real em tokens;
+2. ordenados por tamanho, para que cada batch tenha textos de tamanho parecido;
+3. agrupados com um orçamento de tokens por batch (`batch x maior texto <= orcamento_tokens`),
+   ou seja, batches grandes de textos curtos e batches pequenos de textos longos;
+4. devolvidos na ordem original.
+"""
+
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def tamanhos_em_tokens(model, textos: List[str]) -> List[int]:
+    """Tamanho de cada texto em tokens, já truncado no `max_seq_length` do modelo."""
+    input_ids = model.tokenizer(
+        textos,
+        add_special_tokens=True,
+        truncation=True,
+        max_length=model.max_seq_length,
+    )["input_ids"]
+    return [len(ids) for ids in input_ids]
+
+
+def planejar_batches(tamanhos: List[int], orcamento_tokens: int, max_batch: int) -> List[List[int]]:
+    """
+    Agrupa os índices dos textos em batches ordenados por tamanho respeitando o orçamento de tokens.
+
+    Como os índices estão em ordem crescente de tamanho, o último texto adicionado é o maior do batch.
+    """
+    ordem = sorted(range(len(tamanhos)), key=tamanhos.__getitem__)
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for idx in ordem:
+        tamanho_com_novo = (len(batch) + 1) * tamanhos[idx]
+        if batch and (tamanho_com_novo > orcamento_tokens or len(batch) >= max_batch):
+            batches.append(batch)
+            batch = []
+        batch.append(idx)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def estatisticas_padding(tamanhos: List[int], batches: List[List[int]]) -> Tuple[int, int]:
+    """Retorna (tokens reais, tokens processados com padding) para o plano de batches."""
+    tokens_reais = sum(tamanhos)
+    tokens_com_padding = sum(len(batch) * max(tamanhos[i] for i in batch) for batch in batches)
+    return tokens_reais, tokens_com_padding
+
+
+def codificar_corpus_agendado(
+    model,
+    textos: List[str],
+    orcamento_tokens: int = 16_384,
+    max_batch: int = 256,
+) -> Tuple[np.ndarray, Dict]:
+    """
+    Gera os embeddings do corpus com batches agrupados por tamanho, na ordem original dos textos.
+
+    Returns:
+        (embeddings float32 [n_textos, dim], estatísticas com tokens/s, padding e número de batches)
+    """
+    inicio = time.perf_counter()
+
+    tamanhos = tamanhos_em_tokens(model, textos)
+    batches = planejar_batches(tamanhos, orcamento_tokens, max_batch)
+
+    embeddings = None
+    for batch in batches:
+        vetores = model.encode([textos[i] for i in batch], batch_size=len(batch), convert_to_numpy=True)
+        if embeddings is None:
+            embeddings = np.empty((len(textos), vetores.shape[1]), dtype=np.float32)
+        embeddings[batch] = vetores
+
+    duracao = time.perf_counter() - inicio
+    tokens_reais, tokens_com_padding = estatisticas_padding(tamanhos, batches)
+    return embeddings, {
+        "textos": len(textos),
+        "batches": len(batches),
+        "tokens": tokens_reais,
+        "tokens_com_padding": tokens_com_padding,
+        "padding_ratio": 1 - tokens_reais / tokens_com_padding if tokens_com_padding else 0.0,
+        "tempo": duracao,
+        "tokens_por_segundo": tokens_reais / duracao if duracao > 0 else 0.0,
+    }
+
+
+def estatisticas_batch_fixo(model, textos: List[str], batch_size: int = 32) -> Dict:
+    """
+    Padding do encode padrão do sentence-transformers (batch fixo, textos ordenados por tamanho em caracteres),
+    para comparação com o plano agendado.
+    """
+    tamanhos = tamanhos_em_tokens(model, textos)
+    ordem = sorted(range(len(textos)), key=lambda i: -len(textos[i]))
+    batches = [ordem[i:i + batch_size] for i in range(0, len(ordem), batch_size)]
+    tokens_reais, tokens_com_padding = estatisticas_padding(tamanhos, batches)
+    return {
+        "batches": len(batches),
+        "tokens": tokens_reais,
+        "tokens_com_padding": tokens_com_padding,
+        "padding_ratio": 1 - tokens_reais / tokens_com_padding if tokens_com_padding else 0.0,
+    }
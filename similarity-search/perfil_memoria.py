@@ -0,0 +1,121 @@
+"""
+Instrumentação opcional de memória por fase do teste de similaridade.
+
+Para cada fase (carregar modelo, encode do corpus, construção do índice, queries) registra:
+- pico (acima do início da fase) e saldo de alocações Python (tracemalloc) e as linhas que mais alocaram;
+- pico de RSS do processo (inclui memória nativa: PyTorch, FAISS, ChromaDB);
+- variação de RSS da fase (quando o SO permite ler o RSS atual).
+
+O tracemalloc deixa as alocações Python bem mais lentas, então com o perfil habilitado
+os tempos medidos ficam inflados; use-o para dimensionar memória, não para comparar latência.
+"""
+
+import os
+import sys
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_TAMANHO_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_pico_bytes() -> Optional[int]:
+    """Pico de RSS do processo desde o início (high-water mark)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return pico if sys.platform == "darwin" else pico * 1024
+
+
+def rss_atual_bytes() -> Optional[int]:
+    """RSS atual do processo (disponível apenas em sistemas com /proc)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _TAMANHO_PAGINA
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class PerfilMemoria:
+    """
+    Coleta métricas de memória por fase. Quando desabilitado, todas as chamadas são no-op.
+
+    Uso:
+        perfil = PerfilMemoria(habilitado=True)
+        with perfil.fase("encode_corpus"):
+            embeddings = model.encode(base)
+        perfil.registrar_tamanho_indice(embeddings.nbytes)
+        perfil.resultado()
+    """
+
+    def __init__(self, habilitado: bool = False, top_alocacoes: int = 3):
+        self.habilitado = habilitado
+        self.top_alocacoes = top_alocacoes
+        self.fases: Dict[str, Dict] = {}
+        self.tamanho_indice: Optional[int] = None
+        self._fase_atual: Optional[str] = None
+        self._inicio: Dict = {}
+
+    @contextmanager
+    def fase(self, nome: str):
+        """Mede a memória do bloco como a fase `nome`."""
+        self.iniciar_fase(nome)
+        try:
+            yield
+        finally:
+            self.finalizar_fase()
+
+    def iniciar_fase(self, nome: str):
+        if not self.habilitado:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        self._fase_atual = nome
+        self._inicio = {
+            "snapshot": self._snapshot() if self.top_alocacoes else None,
+            "rss": rss_atual_bytes(),
+        }
+        self._inicio["alocado"] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    def finalizar_fase(self):
+        if not self.habilitado or self._fase_atual is None:
+            return
+        alocado, pico = tracemalloc.get_traced_memory()
+        rss = rss_atual_bytes()
+
+        top: List[str] = []
+        if self._inicio["snapshot"] is not None:
+            diferencas = self._snapshot().compare_to(self._inicio["snapshot"], "lineno")
+            top = [str(d) for d in diferencas[: self.top_alocacoes]]
+
+        self.fases[self._fase_atual] = {
+            "pico_tracemalloc": pico - self._inicio["alocado"],
+            "saldo_tracemalloc": alocado - self._inicio["alocado"],
+            "rss_pico": rss_pico_bytes(),
+            "rss_delta": rss - self._inicio["rss"] if rss is not None and self._inicio["rss"] is not None else None,
+            "top_alocacoes": top,
+        }
+        self._fase_atual = None
+        self._inicio = {}
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    def registrar_tamanho_indice(self, n_bytes: Optional[int]):
+        if self.habilitado:
+            self.tamanho_indice = n_bytes
+
+    def resultado(self) -> Optional[Dict]:
+        """Retorna as métricas coletadas (ou `None` quando desabilitado)."""
+        if not self.habilitado:
+            return None
+        return {"fases": self.fases, "tamanho_indice": self.tamanho_indice}
@@ -1,6 +1,12 @@
 from rank_bm25 import BM25Okapi
 import re
 
+from analisador_pt import AnalisadorPT
+
+# True: remove acentos, stopwords e aplica stemmer (ex: "credencial" e "credenciais" viram o mesmo termo).
+# False: tokenize simples (os resultados comentados ao final foram gerados com ele).
+USAR_ANALISADOR_PT = True
+
 # 1. Dados e Tokenização
 base_conhecimento = [
     "Instruções para alterar sua credencial de acesso.",
@@ -18,7 +24,13 @@ base_conhecimento = [
 def tokenize(text):
     return re.sub(r'[^\w\s]', '', text.lower()).split()
 
-tokenized_corpus = [tokenize(doc) for doc in base_conhecimento]
+if USAR_ANALISADOR_PT:
+    analisador = AnalisadorPT()
+    tokenize = analisador.analisar
+    tokenized_corpus = analisador.analisar_corpus(base_conhecimento)
+    print(f"Analisador PT-BR: {analisador.ultimo_throughput:,.0f} docs/s")
+else:
+    tokenized_corpus = [tokenize(doc) for doc in base_conhecimento]
 
 # 2. Inicializar o Algoritmo
 bm25 = BM25Okapi(tokenized_corpus)
@@ -41,6 +53,8 @@ for i, doc in enumerate(top_n):
     print(f"Top {i+1}: {doc} (Score: {doc_scores[base_conhecimento.index(doc)]:.4f})")
 
 
+# Resultados com tokenize simples (USAR_ANALISADOR_PT = False)
+
 # query = "Esqueci minha credencial de acesso"
 # Top 1: Instruções para alterar sua credencial de acesso. (Score: 3.3185) <----- Útil 1
 # Top 2: Como resetar minha senha? (Score: 1.9992) <----- Útil 2
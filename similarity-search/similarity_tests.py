@@ -10,7 +10,9 @@ import json
 import os
 import re
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+import numpy as np
 
 # Algoritmos baseados em embeddings
 from sentence_transformers import SentenceTransformer, util
@@ -20,6 +22,11 @@ import chromadb
 # BM25
 from rank_bm25 import BM25Okapi
 
+from analisador_pt import AnalisadorPT
+from cache_embeddings import CacheEmbeddingsQuery
+from encode_agendado import codificar_corpus_agendado, estatisticas_batch_fixo
+from perfil_memoria import PerfilMemoria
+
 # Cache para modelos SentenceTransformer
 _model_cache: Dict[str, SentenceTransformer] = {}
 
@@ -48,6 +55,39 @@ ALGORITMOS_EMBEDDING = [
     "chromadb",
 ]
 
+# BM25 também é executado com o analisador PT-BR (sem acentos, stopwords e stemmer RSLP),
+# além do tokenize simples, para comparar a qualidade lexical.
+BM25_COM_ANALISADOR_PT = True
+
+# Executa também a implementação anterior do cosseno (util.cos_sim por query) para comparar a latência.
+COMPARAR_COSINE_LEGADO = True
+
+# Encode do corpus agrupado por tamanho em tokens, com batch adaptativo limitado por um orçamento de tokens
+# (batch x maior texto do batch). Reduz o padding em corpus com textos curtos e longos misturados.
+USAR_ENCODE_AGENDADO = True
+ENCODE_ORCAMENTO_TOKENS = 16_384
+ENCODE_MAX_BATCH = 256
+
+# Compara o encode padrão (batch fixo de 32) com o encode agendado: tokens/s e padding.
+COMPARAR_ENCODE_CORPUS = True
+
+# Perfil de memória por fase (tracemalloc, pico de RSS e tamanho do índice).
+# Opcional: o tracemalloc deixa o Python mais lento e infla os tempos medidos.
+PERFILAR_MEMORIA = False
+
+# Cache LRU/TTL de embeddings das queries na frente do model.encode.
+# Desligado por padrão no comparativo: todos os algoritmos de um mesmo modelo usam as mesmas queries,
+# então apenas o primeiro algoritmo pagaria o encode e o tempo entre eles deixaria de ser comparável.
+USAR_CACHE_QUERIES = False
+CACHE_QUERIES_MAX_ENTRADAS = 10_000
+CACHE_QUERIES_TTL_SEGUNDOS: Optional[float] = None
+
+# Replay de queries com distribuição Zipf (simula repetição de perguntas em produção)
+# para medir o ganho do cache de embeddings.
+EXECUTAR_REPLAY_ZIPF = True
+REPLAY_ZIPF_REQUISICOES = 200
+REPLAY_ZIPF_EXPOENTE = 1.1
+
 # =============================================================================
 # FUNÇÕES AUXILIARES
 # =============================================================================
@@ -122,6 +162,29 @@ def obter_modelo(modelo_nome: str) -> SentenceTransformer:
     return _model_cache[modelo_nome]
 
 
+_cache_queries = CacheEmbeddingsQuery(
+    max_entradas=CACHE_QUERIES_MAX_ENTRADAS,
+    ttl_segundos=CACHE_QUERIES_TTL_SEGUNDOS,
+)
+
+
+def codificar_corpus(model: SentenceTransformer, base_conhecimento: List[str]) -> np.ndarray:
+    """Gera os embeddings da base de conhecimento, com o encode agendado quando `USAR_ENCODE_AGENDADO` está ativo."""
+    if USAR_ENCODE_AGENDADO:
+        embeddings, _ = codificar_corpus_agendado(
+            model, base_conhecimento, ENCODE_ORCAMENTO_TOKENS, ENCODE_MAX_BATCH
+        )
+        return embeddings
+    return model.encode(base_conhecimento)
+
+
+def codificar_query(model: SentenceTransformer, modelo_nome: str, query: str) -> np.ndarray:
+    """Gera o embedding (1-D) de uma query, passando pelo cache quando `USAR_CACHE_QUERIES` está ativo."""
+    if USAR_CACHE_QUERIES:
+        return _cache_queries.obter_ou_codificar(model, modelo_nome, query)
+    return model.encode(query)
+
+
 def calcular_ranks_uteis(
     resultados_ordenados: List[str],
     respostas_uteis_indices: List[int],
@@ -148,21 +211,45 @@ def calcular_ranks_uteis(
 
 
 def run_bm25(
-    base_conhecimento: List[str], queries: List[str], respostas_uteis: List[List[int]]
+    base_conhecimento: List[str],
+    queries: List[str],
+    respostas_uteis: List[List[int]],
+    analisador: Optional[AnalisadorPT] = None,
 ) -> Dict:
-    """Executa testes com BM25 (algoritmo lexical, não usa embeddings)."""
+    """
+    Executa testes com BM25 (algoritmo lexical, não usa embeddings).
+
+    Sem `analisador`, usa o `tokenize` simples; com ele, o corpus é analisado em lote
+    (remoção de acentos, stopwords e stemmer).
+    """
     resultados = []
     documentos_ordenados_por_query = []
+    perfil = PerfilMemoria(PERFILAR_MEMORIA)
 
     # Tokenização do corpus (setup - não conta no tempo)
-    tokenized_corpus = [tokenize(doc) for doc in base_conhecimento]
-    bm25 = BM25Okapi(tokenized_corpus)
+    perfil.iniciar_fase("encode_corpus")
+    inicio_indexacao = time.perf_counter()
+    if analisador:
+        tokenized_corpus = analisador.analisar_corpus(base_conhecimento)
+        tokenize_query = analisador.analisar
+    else:
+        tokenized_corpus = [tokenize(doc) for doc in base_conhecimento]
+        tokenize_query = tokenize
+    tempo_tokenizacao = time.perf_counter() - inicio_indexacao
+    perfil.finalizar_fase()
+    with perfil.fase("construir_indice"):
+        bm25 = BM25Okapi(tokenized_corpus)
+    tempo_indexacao = time.perf_counter() - inicio_indexacao
+    if perfil.habilitado:
+        # Índice Python puro: o saldo do tracemalloc na construção é o tamanho do índice
+        perfil.registrar_tamanho_indice(perfil.fases["construir_indice"]["saldo_tracemalloc"])
 
     # Medição apenas da execução das queries
+    perfil.iniciar_fase("queries")
     start_time = time.time()
 
     for query_idx, query in enumerate(queries):
-        tokenized_query = tokenize(query)
+        tokenized_query = tokenize_query(query)
         top_n = bm25.get_top_n(tokenized_query, base_conhecimento, n=len(base_conhecimento))
 
         ranks_uteis = calcular_ranks_uteis(top_n, respostas_uteis[query_idx], base_conhecimento)
@@ -170,35 +257,116 @@ def run_bm25(
         documentos_ordenados_por_query.append(top_n)
 
     end_time = time.time()
+    perfil.finalizar_fase()
 
     return {
-        "algoritmo": "BM25",
+        "algoritmo": "BM25 + Analisador PT-BR" if analisador else "BM25",
         "modelo": "N/A (lexical)",
         "ranks_por_query": resultados,
         "documentos_ordenados_por_query": documentos_ordenados_por_query,
         "tempo_total": end_time - start_time,
+        "memoria": perfil.resultado(),
+        "indexacao": {
+            "documentos": len(base_conhecimento),
+            "tempo_tokenizacao": tempo_tokenizacao,
+            "tempo_indexacao": tempo_indexacao,
+            "docs_por_segundo": len(base_conhecimento) / tempo_tokenizacao if tempo_tokenizacao else 0,
+        },
     }
 
 
+def normalizar_l2(matriz: np.ndarray) -> np.ndarray:
+    """Normaliza as linhas da matriz (norma L2 = 1) e retorna um array float32 contíguo."""
+    matriz = np.ascontiguousarray(matriz, dtype=np.float32)
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    return matriz / np.maximum(normas, 1e-12)
+
+
 def run_cosine(
     base_conhecimento: List[str],
     queries: List[str],
     respostas_uteis: List[List[int]],
     modelo_nome: str,
 ) -> Dict:
-    """Executa testes com Similaridade de Cosseno (sentence-transformers)."""
+    """
+    Executa testes com Similaridade de Cosseno (sentence-transformers + NumPy).
+
+    A base é normalizada uma única vez no setup; com vetores unitários o cosseno é o produto interno,
+    então todas as queries são pontuadas com uma única multiplicação de matrizes e ordenadas com `argsort`.
+    """
     resultados = []
     documentos_ordenados_por_query = []
+    perfil = PerfilMemoria(PERFILAR_MEMORIA)
+
+    # Setup - carregar modelo, gerar embeddings e normalizar a base (não conta no tempo)
+    with perfil.fase("carregar_modelo"):
+        model = obter_modelo(modelo_nome)
+    with perfil.fase("encode_corpus"):
+        embeddings_base = codificar_corpus(model, base_conhecimento)
+    with perfil.fase("construir_indice"):
+        embeddings_base = normalizar_l2(embeddings_base)
+    perfil.registrar_tamanho_indice(embeddings_base.nbytes)
+
+    # Medição apenas da execução das queries
+    perfil.iniciar_fase("queries")
+    start_time = time.time()
+
+    embeddings_queries = normalizar_l2(np.stack([codificar_query(model, modelo_nome, q) for q in queries]))
+    scores = embeddings_queries @ embeddings_base.T
+
+    # Ordenar por score (maior para menor)
+    indices_ordenados_por_query = np.argsort(-scores, axis=1, kind="stable").tolist()
+
+    for query_idx, indices_ordenados in enumerate(indices_ordenados_por_query):
+        resultados_ordenados = [base_conhecimento[i] for i in indices_ordenados]
+
+        ranks_uteis = calcular_ranks_uteis(
+            resultados_ordenados, respostas_uteis[query_idx], base_conhecimento
+        )
+        resultados.append(ranks_uteis)
+        documentos_ordenados_por_query.append(resultados_ordenados)
+
+    end_time = time.time()
+    perfil.finalizar_fase()
+
+    return {
+        "algoritmo": "Cosine Similarity",
+        "modelo": modelo_nome,
+        "ranks_por_query": resultados,
+        "documentos_ordenados_por_query": documentos_ordenados_por_query,
+        "tempo_total": end_time - start_time,
+        "memoria": perfil.resultado(),
+    }
+
+
+def run_cosine_util(
+    base_conhecimento: List[str],
+    queries: List[str],
+    respostas_uteis: List[List[int]],
+    modelo_nome: str,
+) -> Dict:
+    """
+    Implementação anterior do cosseno, mantida para comparação de latência com `run_cosine`.
+
+    Usa `util.cos_sim` por query (re-normaliza a base inteira a cada chamada) e ordena com `.item()`.
+    """
+    resultados = []
+    documentos_ordenados_por_query = []
+    perfil = PerfilMemoria(PERFILAR_MEMORIA)
 
     # Setup - carregar modelo e gerar embeddings (não conta no tempo)
-    model = obter_modelo(modelo_nome)
-    embeddings_base = model.encode(base_conhecimento)
+    with perfil.fase("carregar_modelo"):
+        model = obter_modelo(modelo_nome)
+    with perfil.fase("encode_corpus"):
+        embeddings_base = codificar_corpus(model, base_conhecimento)
+    perfil.registrar_tamanho_indice(embeddings_base.nbytes)
 
     # Medição apenas da execução das queries
+    perfil.iniciar_fase("queries")
     start_time = time.time()
 
     for query_idx, query in enumerate(queries):
-        embedding_query = model.encode(query)
+        embedding_query = codificar_query(model, modelo_nome, query)
         scores = util.cos_sim(embedding_query, embeddings_base)[0]
 
         # Ordenar por score (maior para menor)
@@ -214,13 +382,15 @@ def run_cosine(
         documentos_ordenados_por_query.append(resultados_ordenados)
 
     end_time = time.time()
+    perfil.finalizar_fase()
 
     return {
-        "algoritmo": "Cosine Similarity",
+        "algoritmo": "Cosine Similarity (util.cos_sim)",
         "modelo": modelo_nome,
         "ranks_por_query": resultados,
         "documentos_ordenados_por_query": documentos_ordenados_por_query,
         "tempo_total": end_time - start_time,
+        "memoria": perfil.resultado(),
     }
 
 
@@ -233,21 +403,28 @@ def run_faiss_cosine(
     """Executa testes com FAISS usando Similaridade de Cosseno (IndexFlatIP)."""
     resultados = []
     documentos_ordenados_por_query = []
+    perfil = PerfilMemoria(PERFILAR_MEMORIA)
 
     # Setup - carregar modelo, gerar embeddings e criar índice (não conta no tempo)
-    model = obter_modelo(modelo_nome)
-    embeddings = model.encode(base_conhecimento).astype("float32")
-    faiss.normalize_L2(embeddings)
+    with perfil.fase("carregar_modelo"):
+        model = obter_modelo(modelo_nome)
+    with perfil.fase("encode_corpus"):
+        embeddings = codificar_corpus(model, base_conhecimento).astype("float32")
 
-    d = embeddings.shape[1]
-    index = faiss.IndexFlatIP(d)
-    index.add(embeddings)
+    with perfil.fase("construir_indice"):
+        faiss.normalize_L2(embeddings)
+
+        d = embeddings.shape[1]
+        index = faiss.IndexFlatIP(d)
+        index.add(embeddings)
+    perfil.registrar_tamanho_indice(index.ntotal * index.d * embeddings.itemsize)
 
     # Medição apenas da execução das queries
+    perfil.iniciar_fase("queries")
     start_time = time.time()
 
     for query_idx, query in enumerate(queries):
-        query_embedding = model.encode([query]).astype("float32")
+        query_embedding = codificar_query(model, modelo_nome, query).astype("float32").reshape(1, -1)
         faiss.normalize_L2(query_embedding)
 
         k = len(base_conhecimento)
@@ -261,6 +438,7 @@ def run_faiss_cosine(
         documentos_ordenados_por_query.append(resultados_ordenados)
 
     end_time = time.time()
+    perfil.finalizar_fase()
 
     return {
         "algoritmo": "FAISS Cosine",
@@ -268,6 +446,7 @@ def run_faiss_cosine(
         "ranks_por_query": resultados,
         "documentos_ordenados_por_query": documentos_ordenados_por_query,
         "tempo_total": end_time - start_time,
+        "memoria": perfil.resultado(),
     }
 
 
@@ -280,20 +459,26 @@ def run_faiss_euclidean(
     """Executa testes com FAISS usando Distância Euclidiana (IndexFlatL2)."""
     resultados = []
     documentos_ordenados_por_query = []
+    perfil = PerfilMemoria(PERFILAR_MEMORIA)
 
     # Setup - carregar modelo, gerar embeddings e criar índice (não conta no tempo)
-    model = obter_modelo(modelo_nome)
-    embeddings = model.encode(base_conhecimento).astype("float32")
+    with perfil.fase("carregar_modelo"):
+        model = obter_modelo(modelo_nome)
+    with perfil.fase("encode_corpus"):
+        embeddings = codificar_corpus(model, base_conhecimento).astype("float32")
 
-    d = embeddings.shape[1]
-    index = faiss.IndexFlatL2(d)
-    index.add(embeddings)
+    with perfil.fase("construir_indice"):
+        d = embeddings.shape[1]
+        index = faiss.IndexFlatL2(d)
+        index.add(embeddings)
+    perfil.registrar_tamanho_indice(index.ntotal * index.d * embeddings.itemsize)
 
     # Medição apenas da execução das queries
+    perfil.iniciar_fase("queries")
     start_time = time.time()
 
     for query_idx, query in enumerate(queries):
-        query_embedding = model.encode([query]).astype("float32")
+        query_embedding = codificar_query(model, modelo_nome, query).astype("float32").reshape(1, -1)
 
         k = len(base_conhecimento)
         distancias, indices = index.search(query_embedding, k)
@@ -306,6 +491,7 @@ def run_faiss_euclidean(
         documentos_ordenados_por_query.append(resultados_ordenados)
 
     end_time = time.time()
+    perfil.finalizar_fase()
 
     return {
         "algoritmo": "FAISS Euclidean",
@@ -313,6 +499,7 @@ def run_faiss_euclidean(
         "ranks_por_query": resultados,
         "documentos_ordenados_por_query": documentos_ordenados_por_query,
         "tempo_total": end_time - start_time,
+        "memoria": perfil.resultado(),
     }
 
 
@@ -325,23 +512,31 @@ def run_chromadb(
     """Executa testes com ChromaDB (usa similaridade de cosseno internamente)."""
     resultados = []
     documentos_ordenados_por_query = []
+    perfil = PerfilMemoria(PERFILAR_MEMORIA)
 
     # Setup - criar cliente, coleção e adicionar documentos (não conta no tempo)
     client = chromadb.Client()
     collection_name = normalizar_nome_colecao(f"teste_collection_{modelo_nome}")
     collection = client.create_collection(name=collection_name)
 
-    model = obter_modelo(modelo_nome)
-    embeddings = model.encode(base_conhecimento).tolist()
+    with perfil.fase("carregar_modelo"):
+        model = obter_modelo(modelo_nome)
+    with perfil.fase("encode_corpus"):
+        embeddings = codificar_corpus(model, base_conhecimento).tolist()
 
-    ids = [f"id{i}" for i in range(len(base_conhecimento))]
-    collection.add(embeddings=embeddings, documents=base_conhecimento, ids=ids)
+    with perfil.fase("construir_indice"):
+        ids = [f"id{i}" for i in range(len(base_conhecimento))]
+        collection.add(embeddings=embeddings, documents=base_conhecimento, ids=ids)
+    if perfil.habilitado:
+        # O índice HNSW do ChromaDB é nativo (invisível ao tracemalloc): usa a variação de RSS da construção
+        perfil.registrar_tamanho_indice(perfil.fases["construir_indice"]["rss_delta"])
 
     # Medição apenas da execução das queries
+    perfil.iniciar_fase("queries")
     start_time = time.time()
 
     for query_idx, query in enumerate(queries):
-        query_embedding = model.encode([query]).tolist()
+        query_embedding = [codificar_query(model, modelo_nome, query).tolist()]
 
         results = collection.query(
             query_embeddings=query_embedding,
@@ -356,6 +551,7 @@ def run_chromadb(
         documentos_ordenados_por_query.append(resultados_ordenados)
 
     end_time = time.time()
+    perfil.finalizar_fase()
 
     return {
         "algoritmo": "ChromaDB",
@@ -363,9 +559,79 @@ def run_chromadb(
         "ranks_por_query": resultados,
         "documentos_ordenados_por_query": documentos_ordenados_por_query,
         "tempo_total": end_time - start_time,
+        "memoria": perfil.resultado(),
     }
 
 
+# =============================================================================
+# REPLAY ZIPF (CACHE DE EMBEDDINGS)
+# =============================================================================
+
+
+def gerar_replay_zipf(queries: List[str], n_requisicoes: int, expoente: float, seed: int = 42) -> List[str]:
+    """
+    Gera uma sequência de requisições onde a query de rank k aparece com probabilidade ∝ 1/k^expoente.
+
+    Simula o tráfego de produção: poucas perguntas muito repetidas e uma cauda longa de perguntas raras.
+    """
+    rng = np.random.default_rng(seed)
+    pesos = 1.0 / np.arange(1, len(queries) + 1) ** expoente
+    indices = rng.choice(len(queries), size=n_requisicoes, p=pesos / pesos.sum())
+    return [queries[i] for i in indices]
+
+
+def run_replay_zipf(queries: List[str], modelo_nome: str) -> Dict:
+    """Reproduz o replay Zipf com e sem cache de embeddings e compara o tempo de encode."""
+    model = obter_modelo(modelo_nome)
+    requisicoes = gerar_replay_zipf(queries, REPLAY_ZIPF_REQUISICOES, REPLAY_ZIPF_EXPOENTE)
+
+    start_time = time.time()
+    for query in requisicoes:
+        model.encode(query)
+    tempo_sem_cache = time.time() - start_time
+
+    cache = CacheEmbeddingsQuery(
+        max_entradas=CACHE_QUERIES_MAX_ENTRADAS,
+        ttl_segundos=CACHE_QUERIES_TTL_SEGUNDOS,
+    )
+    start_time = time.time()
+    for query in requisicoes:
+        cache.obter_ou_codificar(model, modelo_nome, query)
+    tempo_com_cache = time.time() - start_time
+
+    return {
+        "modelo": modelo_nome,
+        "requisicoes": len(requisicoes),
+        "queries_distintas": len(set(requisicoes)),
+        "tempo_sem_cache": tempo_sem_cache,
+        "tempo_com_cache": tempo_com_cache,
+        "cache": cache.estatisticas(),
+    }
+
+
+# =============================================================================
+# ENCODE DO CORPUS
+# =============================================================================
+
+
+def run_encode_corpus(base_conhecimento: List[str], modelo_nome: str) -> Dict:
+    """Compara o encode padrão do corpus (batch fixo) com o encode agendado por tamanho."""
+    model = obter_modelo(modelo_nome)
+
+    start_time = time.time()
+    model.encode(base_conhecimento)
+    tempo_padrao = time.time() - start_time
+    padrao = estatisticas_batch_fixo(model, base_conhecimento)
+    padrao["tempo"] = tempo_padrao
+    padrao["tokens_por_segundo"] = padrao["tokens"] / tempo_padrao if tempo_padrao else 0
+
+    _, agendado = codificar_corpus_agendado(
+        model, base_conhecimento, ENCODE_ORCAMENTO_TOKENS, ENCODE_MAX_BATCH
+    )
+
+    return {"modelo": modelo_nome, "padrao": padrao, "agendado": agendado}
+
+
 # =============================================================================
 # EXECUÇÃO DOS TESTES
 # =============================================================================
@@ -384,6 +650,11 @@ def executar_todos_testes(dataset: Dict) -> List[Dict]:
     resultado_bm25 = run_bm25(base_conhecimento, queries, respostas_uteis)
     todos_resultados.append(resultado_bm25)
 
+    if BM25_COM_ANALISADOR_PT:
+        print("Executando BM25 com analisador PT-BR...")
+        resultado_bm25_pt = run_bm25(base_conhecimento, queries, respostas_uteis, AnalisadorPT())
+        todos_resultados.append(resultado_bm25_pt)
+
     # 2. Algoritmos baseados em embeddings
     for modelo in MODELOS:
         print(f"\nExecutando com modelo: {modelo}")
@@ -392,6 +663,8 @@ def executar_todos_testes(dataset: Dict) -> List[Dict]:
             print(f"  -> {algo}...")
 
             if algo == "cosine":
+                if COMPARAR_COSINE_LEGADO:
+                    todos_resultados.append(run_cosine_util(base_conhecimento, queries, respostas_uteis, modelo))
                 resultado = run_cosine(base_conhecimento, queries, respostas_uteis, modelo)
             elif algo == "faiss_cosine":
                 resultado = run_faiss_cosine(base_conhecimento, queries, respostas_uteis, modelo)
@@ -405,6 +678,24 @@ def executar_todos_testes(dataset: Dict) -> List[Dict]:
     return todos_resultados
 
 
+def executar_comparacao_encode(dataset: Dict) -> List[Dict]:
+    """Compara o encode padrão e o agendado da base de conhecimento para cada modelo."""
+    resultados_encode = []
+    for modelo in MODELOS:
+        print(f"\nComparando encode do corpus com modelo: {modelo}")
+        resultados_encode.append(run_encode_corpus(dataset["base_conhecimento"], modelo))
+    return resultados_encode
+
+
+def executar_replay_zipf(dataset: Dict) -> List[Dict]:
+    """Executa o replay Zipf de queries para cada modelo de embeddings."""
+    resultados_replay = []
+    for modelo in MODELOS:
+        print(f"\nReplay Zipf ({REPLAY_ZIPF_REQUISICOES} requisições) com modelo: {modelo}")
+        resultados_replay.append(run_replay_zipf(dataset["queries"], modelo))
+    return resultados_replay
+
+
 # =============================================================================
 # GERAÇÃO DO RELATÓRIO
 # =============================================================================
@@ -417,12 +708,21 @@ def calcular_rank_medio(ranks: List[int]) -> float:
     return sum(ranks) / len(ranks)
 
 
+def formatar_mb(n_bytes: Optional[int]) -> str:
+    """Formata bytes em MB para o relatório ("N/A" quando a métrica não está disponível)."""
+    if n_bytes is None:
+        return "N/A"
+    return f"{n_bytes / (1024 * 1024):.2f}"
+
+
 def gerar_relatorio(
     dataset_nome: str,
     resultados: List[Dict],
     queries: List[str],
     base_conhecimento: List[str],
     respostas_uteis: List[List[int]],
+    resultados_replay: Optional[List[Dict]] = None,
+    resultados_encode: Optional[List[Dict]] = None,
 ) -> str:
     """Gera o relatório em Markdown com tabela de resultados."""
     linhas = []
@@ -509,6 +809,135 @@ def gerar_relatorio(
 
     linhas.append("")
 
+    # Memória por fase (somente quando PERFILAR_MEMORIA está ativo)
+    resultados_memoria = [res for res in resultados if res.get("memoria")]
+    if resultados_memoria:
+        fases = ["carregar_modelo", "encode_corpus", "construir_indice", "queries"]
+        linhas.append("## Memória por Fase\n")
+        linhas.append("")
+        linhas.append(
+            "Pico de alocações Python (tracemalloc, MB) de cada fase, pico de RSS do processo ao final "
+            "das queries e tamanho do índice. Com o perfil habilitado os tempos do relatório ficam inflados."
+        )
+        linhas.append("")
+        linhas.append(
+            "| Modelo | Algoritmo | Carregar Modelo (MB) | Encode Corpus (MB) | Construir Índice (MB) "
+            "| Queries (MB) | Pico RSS (MB) | Tamanho do Índice (MB) |"
+        )
+        linhas.append(
+            "|--------|-----------|----------------------|--------------------|-----------------------"
+            "|--------------|---------------|------------------------|"
+        )
+        for res in resultados_memoria:
+            memoria = res["memoria"]
+            linha = f"| {res['modelo']} | {res['algoritmo']} | "
+            for fase in fases:
+                metricas = memoria["fases"].get(fase)
+                linha += f"{formatar_mb(metricas['pico_tracemalloc'])} | " if metricas else "- | "
+            rss_pico = memoria["fases"].get("queries", {}).get("rss_pico")
+            linha += f"{formatar_mb(rss_pico)} | {formatar_mb(memoria['tamanho_indice'])} |"
+            linhas.append(linha)
+        linhas.append("")
+
+        # Maiores alocações de cada fase (diferença de snapshots do tracemalloc)
+        linhas.append("### Maiores Alocações por Fase\n")
+        linhas.append("")
+        linhas.append("| Modelo | Algoritmo | Fase | Alocação |")
+        linhas.append("|--------|-----------|------|----------|")
+        for res in resultados_memoria:
+            for fase in fases:
+                metricas = res["memoria"]["fases"].get(fase)
+                for alocacao in (metricas or {}).get("top_alocacoes", []):
+                    alocacao = alocacao.replace("|", "\\|")
+                    linhas.append(f"| {res['modelo']} | {res['algoritmo']} | {fase} | `{alocacao}` |")
+        linhas.append("")
+
+    # Latência por query do cosseno: util.cos_sim por query (antes) x GEMM único (depois)
+    resultados_cosine_util = {r["modelo"]: r for r in resultados if r["algoritmo"] == "Cosine Similarity (util.cos_sim)"}
+    if resultados_cosine_util and queries:
+        linhas.append("## Cosine: util.cos_sim x GEMM\n")
+        linhas.append("")
+        linhas.append("| Modelo | Antes - util.cos_sim (ms/query) | Depois - GEMM (ms/query) | Speedup |")
+        linhas.append("|--------|---------------------------------|--------------------------|---------|")
+        for res in resultados:
+            if res["algoritmo"] != "Cosine Similarity" or res["modelo"] not in resultados_cosine_util:
+                continue
+            antes = resultados_cosine_util[res["modelo"]]["tempo_total"] / len(queries) * 1000
+            depois = res["tempo_total"] / len(queries) * 1000
+            speedup = antes / depois if depois else 0
+            linhas.append(f"| {res['modelo']} | {antes:.3f} | {depois:.3f} | {speedup:.1f}x |")
+        linhas.append("")
+
+    # Indexação lexical (tokenização + construção do índice BM25)
+    resultados_lexicais = [res for res in resultados if "indexacao" in res]
+    if resultados_lexicais:
+        linhas.append("## Indexação Lexical\n")
+        linhas.append("")
+        linhas.append("| Algoritmo | Documentos | Tokenização (s) | Indexação Total (s) | Throughput (docs/s) |")
+        linhas.append("|-----------|------------|-----------------|---------------------|---------------------|")
+        for res in resultados_lexicais:
+            idx = res["indexacao"]
+            linhas.append(
+                f"| {res['algoritmo']} | {idx['documentos']} | {idx['tempo_tokenizacao']:.4f} | "
+                f"{idx['tempo_indexacao']:.4f} | {idx['docs_por_segundo']:,.0f} |"
+            )
+        linhas.append("")
+
+    # Encode do corpus: batch fixo x agendado por tamanho
+    if resultados_encode:
+        linhas.append("## Encode do Corpus\n")
+        linhas.append("")
+        linhas.append(
+            f"Encode padrão (batch fixo de 32) x encode agendado por tamanho "
+            f"(orçamento de {ENCODE_ORCAMENTO_TOKENS} tokens por batch, máximo {ENCODE_MAX_BATCH} textos)."
+        )
+        linhas.append("")
+        linhas.append(
+            "| Modelo | Tokens | Padrão (s) | Padrão (tokens/s) | Padrão Padding | Agendado (s) "
+            "| Agendado (tokens/s) | Agendado Padding | Batches | Speedup |"
+        )
+        linhas.append(
+            "|--------|--------|------------|-------------------|----------------|--------------"
+            "|---------------------|------------------|---------|---------|"
+        )
+        for enc in resultados_encode:
+            padrao, agendado = enc["padrao"], enc["agendado"]
+            speedup = padrao["tempo"] / agendado["tempo"] if agendado["tempo"] else 0
+            linhas.append(
+                f"| {enc['modelo']} | {agendado['tokens']} | {padrao['tempo']:.3f} | "
+                f"{padrao['tokens_por_segundo']:,.0f} | {padrao['padding_ratio']:.1%} | {agendado['tempo']:.3f} | "
+                f"{agendado['tokens_por_segundo']:,.0f} | {agendado['padding_ratio']:.1%} | "
+                f"{agendado['batches']} | {speedup:.2f}x |"
+            )
+        linhas.append("")
+
+    # Replay Zipf com cache de embeddings das queries
+    if resultados_replay:
+        linhas.append("## Cache de Embeddings de Query (Replay Zipf)\n")
+        linhas.append("")
+        linhas.append(
+            f"Replay de **{REPLAY_ZIPF_REQUISICOES}** requisições sorteadas das queries do dataset "
+            f"com distribuição Zipf (expoente {REPLAY_ZIPF_EXPOENTE})."
+        )
+        linhas.append("")
+        linhas.append(
+            "| Modelo | Requisições | Queries Distintas | Hit Rate | Sem Cache (s) | Com Cache (s) "
+            "| Latência Economizada (s) | Speedup |"
+        )
+        linhas.append(
+            "|--------|-------------|-------------------|----------|---------------|---------------"
+            "|--------------------------|---------|"
+        )
+        for rep in resultados_replay:
+            stats = rep["cache"]
+            speedup = rep["tempo_sem_cache"] / rep["tempo_com_cache"] if rep["tempo_com_cache"] else 0
+            linhas.append(
+                f"| {rep['modelo']} | {rep['requisicoes']} | {rep['queries_distintas']} | "
+                f"{stats['hit_rate']:.1%} | {rep['tempo_sem_cache']:.3f} | {rep['tempo_com_cache']:.3f} | "
+                f"{stats['tempo_economizado']:.3f} | {speedup:.1f}x |"
+            )
+        linhas.append("")
+
     # Conclusão
     linhas.append("## Conclusão\n")
     linhas.append("")
@@ -616,6 +1045,8 @@ if __name__ == "__main__":
     print("=" * 60)
 
     resultados = executar_todos_testes(dataset)
+    resultados_replay = executar_replay_zipf(dataset) if EXECUTAR_REPLAY_ZIPF else None
+    resultados_encode = executar_comparacao_encode(dataset) if COMPARAR_ENCODE_CORPUS else None
 
     # Gerar relatório
     print("\n" + "=" * 60)
@@ -628,6 +1059,8 @@ if __name__ == "__main__":
         dataset["queries"],
         dataset["base_conhecimento"],
         dataset["respostas_uteis"],
+        resultados_replay,
+        resultados_encode,
     )
     salvar_relatorio(DATASET_FILE, relatorio)
 